@@ -0,0 +1,258 @@
+"""
+APIの共通レイヤー（レスポンスキャッシュ・メトリクス・圧縮・ページング）
+Shared response cache, metrics, compression and pagination applied to every
+generated endpoint
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import gzip
+import math
+import os
+import threading
+import time
+
+from data_sources import TokenBucket
+
+DEFAULT_PAGE_LIMIT = 1000
+MAX_PAGE_LIMIT = 10000
+COMPRESSION_MIN_BYTES = 1024
+
+# 高コストなエンドポイントの受け付け制御（環境変数で変更可）
+CLIENT_RATE = float(os.environ.get('JAPAN_ENV_CLIENT_RATE', '0.5'))  # クライアントごとの毎秒リクエスト数
+CLIENT_BURST = float(os.environ.get('JAPAN_ENV_CLIENT_BURST', '5'))
+MAX_CONCURRENT = int(os.environ.get('JAPAN_ENV_MAX_CONCURRENT', '4'))
+MAX_QUEUE = int(os.environ.get('JAPAN_ENV_MAX_QUEUE', '8'))
+QUEUE_TIMEOUT = float(os.environ.get('JAPAN_ENV_QUEUE_TIMEOUT', '5'))
+
+# Retry-After の上限（秒）。レート0のトークンバケットは待ち時間が無限大になる
+MAX_RETRY_AFTER = 3600
+
+
+class ResponseCache:
+    """TTL付きのレスポンスペイロードキャッシュ（LRU）"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        # キー -> (期限, 保存時刻, 値)（いずれも time.monotonic() 基準）
+        self._entries: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            # 期限切れのエントリは get_stale() 用にLRUで追い出されるまで残す
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """期限切れでも最後に保存した値を返す（負荷制限時の代替応答用）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[2]
+
+    def info(self, key: Hashable) -> Optional[Dict]:
+        """エントリの経過時間と残り有効期間（ヒット・ミスの集計には含めない）"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        return {
+            'age_seconds': round(now - entry[1], 1),
+            'expires_in': round(entry[0] - now, 1),
+            'fresh': entry[0] >= now
+        }
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        with self._lock:
+            now = time.monotonic()
+            self._entries[key] = (now + ttl, now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+class Rejected(Exception):
+    """受け付け制御で拒否されたリクエスト（retry_after 秒後に再試行可能）"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = min(retry_after, MAX_RETRY_AFTER)
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    高コストなエンドポイントの受け付け制御
+    クライアントごとのトークンバケットと、全体の同時実行数の上限・待ち行列の上限を持つ
+    """
+
+    def __init__(self, client_rate: float = CLIENT_RATE, client_burst: float = CLIENT_BURST,
+                 max_concurrent: int = MAX_CONCURRENT, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT, max_clients: int = 10000):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {'rate_limited': 0, 'queue_full': 0, 'queue_timeout': 0}
+
+    def _bucket(self, client: str) -> TokenBucket:
+        with self._condition:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            return bucket
+
+    @contextmanager
+    def admit(self, client: str):
+        """
+        実行枠を確保して処理させる（拒否する場合は Rejected）
+        """
+        wait = self._bucket(client).try_acquire()
+        if wait > 0:
+            with self._condition:
+                self.rejected['rate_limited'] += 1
+            raise Rejected('rate_limited', wait)
+
+        deadline = time.monotonic() + self.queue_timeout
+        with self._condition:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self.rejected['queue_full'] += 1
+                    raise Rejected('queue_full', self.queue_timeout)
+                self._waiting += 1
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected['queue_timeout'] += 1
+                            raise Rejected('queue_timeout', self.queue_timeout)
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+            self.admitted += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify()
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'clients': len(self._buckets)
+            }
+
+
+class Metrics:
+    """エンドポイントごとのリクエスト数・エラー数・応答時間"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict] = {}
+
+    def record(self, route: str, status: int, seconds: float, cached: bool = False):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'requests': 0, 'errors': 0, 'cache_hits': 0, 'total_seconds': 0.0, 'max_seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if status >= 500:
+                stats['errors'] += 1
+            if cached:
+                stats['cache_hits'] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                route: {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'cache_hits': stats['cache_hits'],
+                    'avg_ms': round(stats['total_seconds'] / stats['requests'] * 1000, 2),
+                    'max_ms': round(stats['max_seconds'] * 1000, 2)
+                }
+                for route, stats in self._routes.items()
+            }
+
+
+def paginate(data: List, args) -> Tuple[List, Optional[Dict]]:
+    """
+    limit/offset クエリでリストを切り出す（指定が無ければそのまま）
+    """
+    if 'limit' not in args and 'offset' not in args:
+        return data, None
+
+    limit = min(max(int(args.get('limit', DEFAULT_PAGE_LIMIT)), 0), MAX_PAGE_LIMIT)
+    offset = max(int(args.get('offset', 0)), 0)
+    return data[offset:offset + limit], {'total': len(data), 'limit': limit, 'offset': offset}
+
+
+def compress_response(response, accept_encoding: str, min_bytes: int = COMPRESSION_MIN_BYTES):
+    """
+    クライアントがgzipを受け付ける場合にJSON応答を圧縮
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in (accept_encoding or '').lower()
+            or not (response.mimetype or '').endswith('json')):
+        return response
+
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+
+    response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Length'] = str(len(response.get_data()))
+    response.vary.add('Accept-Encoding')
+    return response
@@ -1,38 +1,34 @@
+"""
+日本の環境データAPI（Flaskアプリケーションファクトリ）
+Flask application factory; the /api/japan/* dataset routes are generated from
+a declarative table of fetcher methods and share the cache, metrics,
+compression and pagination layers
+"""
+
 try:
-    from flask import Flask, jsonify, request
+    from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
     from flask_cors import CORS
     HAS_FLASK = True
 except ImportError:
     HAS_FLASK = False
-    print("Flask not available. Please install Flask to run the web server.")
 
-import json
-try:
-    import numpy as np
-    HAS_NUMPY = True
-except ImportError:
-    HAS_NUMPY = False
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import gzip
+import time
 
-try:
-    import pandas as pd
-    HAS_PANDAS = True
-except ImportError:
-    HAS_PANDAS = False
-
-from datetime import datetime, timedelta
-from japan_environmental_data import JapanEnvironmentalDataFetcher
-
-if HAS_FLASK:
-    app = Flask(__name__)
-    CORS(app)
-else:
-    app = None
-
-# 日本環境データフェッチャーのインスタンス
-japan_data_fetcher = JapanEnvironmentalDataFetcher()
+from api_layers import AdmissionController, Metrics, Rejected, ResponseCache, compress_response, paginate
+from health import HealthMonitor
+from japan_environmental_data import DATASET_SOURCES, JapanEnvironmentalDataFetcher
+from live_feed import AirQualityBroadcaster
+from profiling import PROFILE_HEADER, Profiler, span
+from serialization import FastJSONProvider
+from snapshot_bundle import SnapshotBundler
+import dataset_join
+import uncertainty
 
 # サンプル環境データ
-sample_environmental_data = [
+SAMPLE_ENVIRONMENTAL_DATA = [
     {
         "id": 1,
         "date": "2024-01-01",
@@ -62,323 +58,513 @@ sample_environmental_data = [
     }
 ]
 
-# Only define routes if Flask is available
-if HAS_FLASK and app:
-    @app.route('/api/environmental-data', methods=['GET'])
-def get_environmental_data():
-    location = request.args.get('location')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    filtered_data = sample_environmental_data.copy()
-    
-    if location:
-        filtered_data = [data for data in filtered_data if data['location'].lower() == location.lower()]
-    
-    if start_date:
-        filtered_data = [data for data in filtered_data if data['date'] >= start_date]
-    
-    if end_date:
-        filtered_data = [data for data in filtered_data if data['date'] <= end_date]
-    
-    return jsonify({
-        'status': 'success',
-        'data': filtered_data,
-        'count': len(filtered_data)
-    })
-
-@app.route('/api/environmental-data/statistics', methods=['GET'])
-def get_statistics():
-    if HAS_PANDAS:
-        df = pd.DataFrame(sample_environmental_data)
-    else:
-        # Manual calculation without pandas
-        df = sample_environmental_data
-    
-    if HAS_PANDAS:
-        stats = {
-            'temperature': {
-                'avg': float(df['temperature'].mean()),
-                'min': float(df['temperature'].min()),
-                'max': float(df['temperature'].max())
-            },
-            'humidity': {
-                'avg': float(df['humidity'].mean()),
-                'min': float(df['humidity'].min()),
-                'max': float(df['humidity'].max())
-            },
-            'air_quality_index': {
-                'avg': float(df['air_quality_index'].mean()),
-                'min': int(df['air_quality_index'].min()),
-                'max': int(df['air_quality_index'].max())
-            },
-            'co2_level': {
-                'avg': float(df['co2_level'].mean()),
-                'min': float(df['co2_level'].min()),
-                'max': float(df['co2_level'].max())
-            }
-        }
-    else:
-        # Manual calculation without pandas
-        temps = [d['temperature'] for d in df]
-        humids = [d['humidity'] for d in df]
-        aqis = [d['air_quality_index'] for d in df]
-        co2s = [d['co2_level'] for d in df]
-        
-        stats = {
-            'temperature': {
-                'avg': sum(temps) / len(temps),
-                'min': min(temps),
-                'max': max(temps)
-            },
-            'humidity': {
-                'avg': sum(humids) / len(humids),
-                'min': min(humids),
-                'max': max(humids)
-            },
-            'air_quality_index': {
-                'avg': sum(aqis) / len(aqis),
-                'min': min(aqis),
-                'max': max(aqis)
-            },
-            'co2_level': {
-                'avg': sum(co2s) / len(co2s),
-                'min': min(co2s),
-                'max': max(co2s)
-            }
-        }
-    
-    return jsonify({
-        'status': 'success',
-        'statistics': stats
-    })
-
-@app.route('/api/locations', methods=['GET'])
-def get_locations():
-    locations = list(set([data['location'] for data in sample_environmental_data]))
-    return jsonify({
-        'status': 'success',
-        'locations': locations
-    })
-
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
-    })
-
-# 日本の環境問題データ用の新しいエンドポイント
-
-@app.route('/api/japan/air-quality', methods=['GET'])
-def get_japan_air_quality():
-    """日本の大気質データを取得"""
+STATISTICS_FIELDS = ['temperature', 'humidity', 'air_quality_index', 'co2_level']
+
+
+class Param:
+    """クエリパラメータの定義"""
+
+    __slots__ = ('name', 'type', 'default', 'required', 'kwarg')
+
+    def __init__(self, name: str, type: Callable = str, default=None, required: bool = False,
+                 kwarg: Optional[str] = None):
+        self.name = name
+        self.type = type
+        self.default = default
+        self.required = required
+        self.kwarg = kwarg
+
+
+class DatasetRoute:
+    """
+    /api/japan/<path> のルート定義
+    fetcher のメソッドを呼び出し、結果を payload_key に入れて返す
+    """
+
+    __slots__ = ('path', 'method', 'params', 'payload_key', 'echo', 'timestamp_key', 'cache_ttl', 'costly',
+                 'http_methods', 'inputs', 'description')
+
+    def __init__(self, path: str, method: str, params: Sequence[Param] = (), payload_key: str = 'data',
+                 echo: Sequence[str] = (), timestamp_key: Optional[str] = None, cache_ttl: float = 60.0,
+                 costly: Union[bool, Callable[[Dict], bool]] = False, http_methods: Sequence[str] = ('GET',),
+                 inputs: Sequence[str] = (), description: str = ''):
+        self.path = path
+        self.method = method
+        self.params = tuple(params)
+        self.payload_key = payload_key
+        self.echo = tuple(echo)
+        self.timestamp_key = timestamp_key
+        self.cache_ttl = cache_ttl
+        # キャッシュに無い場合の計算を受け付け制御の対象にする（引数によって決まる場合は関数）
+        self.costly = costly
+        # POST ではJSON本文の値がクエリパラメータより優先される
+        self.http_methods = tuple(http_methods)
+        # 参照するデータセット（DATASET_SOURCES のキー、readiness でデータの経過時間を報告する）
+        self.inputs = tuple(inputs)
+        self.description = description
+
+    @property
+    def endpoint(self) -> str:
+        return 'japan_' + self.path.replace('/', '_').replace('-', '_')
+
+    def is_costly(self, kwargs: Dict) -> bool:
+        return self.costly(kwargs) if callable(self.costly) else self.costly
+
+    def cache_key(self, kwargs: Dict) -> tuple:
+        return (self.path, tuple(sorted(kwargs.items())))
+
+    def parse(self, args) -> Dict:
+        """
+        クエリパラメータを fetcher メソッドの引数に変換（不正な値は ValueError）
+        """
+        kwargs = {}
+        for param in self.params:
+            raw = args.get(param.name)
+            if raw is None:
+                if param.required:
+                    raise ValueError(f"{param.name} is required")
+                value = param.default
+            else:
+                value = param.type(raw)
+
+            if isinstance(value, dict) and param.kwarg is None:
+                kwargs.update(value)
+            else:
+                kwargs[param.kwarg or param.name] = value
+        return kwargs
+
+
+def _parse_bbox(value: str) -> Dict:
     try:
-        prefecture = request.args.get('prefecture', 'Tokyo')
-        data = japan_data_fetcher.get_air_quality_data(prefecture)
-        
-        return jsonify({
-            'status': 'success',
-            'data': data,
-            'count': len(data),
-            'prefecture': prefecture
-        })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
+        min_lon, min_lat, max_lon, max_lat = [float(v) for v in value.split(',')]
+    except ValueError:
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    return {'min_lat': min_lat, 'min_lon': min_lon, 'max_lat': max_lat, 'max_lon': max_lon}
+
+
+def _parse_flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
 
-@app.route('/api/japan/climate', methods=['GET'])
-def get_japan_climate_data():
-    """日本の気候変動データを取得"""
+
+def _parse_mixes(value) -> Tuple[Tuple[float, ...], ...]:
+    """
+    電源構成比の行列（JSONの配列、またはクエリの "32,37,7,6,18;10,20,0,10,60" 形式）
+    """
+    if isinstance(value, str):
+        rows = [row.split(',') for row in value.split(';') if row.strip()]
+    elif isinstance(value, list) and all(isinstance(row, list) for row in value):
+        rows = value
+    else:
+        raise ValueError('mixes must be rows of numeric shares')
     try:
-        data = japan_data_fetcher.get_climate_data()
-        
+        return tuple(tuple(float(share) for share in row) for row in rows)
+    except (TypeError, ValueError):
+        raise ValueError('mixes must be rows of numeric shares')
+
+
+def _parse_samples(value) -> int:
+    samples = int(value)
+    if samples not in uncertainty.SAMPLE_CHOICES:
+        raise ValueError(f"samples must be one of {', '.join(map(str, uncertainty.SAMPLE_CHOICES))}")
+    return samples
+
+
+def _bands_requested(kwargs: Dict) -> bool:
+    return kwargs.get('bands', False)
+
+
+# 模擬データの不確実性の幅（bands=1 で平均と百分位を返す。計算は受け付け制御の対象）
+BAND_PARAMS = [Param('bands', _parse_flag, default=False),
+               Param('samples', _parse_samples, default=uncertainty.DEFAULT_SAMPLES)]
+
+# 日本の環境データのエンドポイント
+JAPAN_DATASETS = [
+    DatasetRoute('air-quality', 'get_air_quality_data',
+                 params=[Param('prefecture', default='Tokyo')], echo=['prefecture'],
+                 inputs=['air_quality'], description='大気質データ'),
+    DatasetRoute('air-quality/bbox', 'get_air_quality_in_bbox',
+                 params=[Param('bbox', _parse_bbox, required=True)],
+                 inputs=['stations'], description='範囲内の観測局の最新測定値'),
+    DatasetRoute('stations/nearby', 'find_stations_near',
+                 params=[Param('lat', float, required=True, kwarg='latitude'),
+                         Param('lon', float, required=True, kwarg='longitude'),
+                         Param('radius_km', float, default=10.0)],
+                 inputs=['stations'], description='指定地点から半径内の観測局'),
+    DatasetRoute('climate', 'get_climate_data', params=BAND_PARAMS, inputs=['climate'],
+                 costly=_bands_requested, description='気候変動データ'),
+    DatasetRoute('pollution', 'get_pollution_data', params=BAND_PARAMS, inputs=['pollution'],
+                 costly=_bands_requested, description='汚染データ'),
+    DatasetRoute('biodiversity', 'get_biodiversity_data', params=BAND_PARAMS, inputs=['biodiversity'],
+                 costly=_bands_requested, description='生物多様性データ'),
+    DatasetRoute('energy-emissions', 'get_energy_emissions_data', inputs=['energy_mix'],
+                 description='エネルギー・排出データ'),
+    DatasetRoute('query', 'query',
+                 params=[Param('dataset', default='air-quality'), Param('prefecture', kwarg='location'),
+                         Param('parameter'), Param('from', kwarg='date_from'), Param('to', kwarg='date_to'),
+                         Param('field'), Param('value_gt', float), Param('value_gte', float),
+                         Param('value_lt', float), Param('value_lte', float),
+                         Param('explain', _parse_flag, default=False)],
+                 costly=True, description='条件を組み合わせたデータセット横断の検索'),
+    DatasetRoute('cross-dataset', 'get_cross_dataset_metrics', cache_ttl=600.0, costly=True,
+                 inputs=['air_quality', 'climate', 'pollution'],
+                 description='都道府県・日付で結合したデータセット間の相関と人口あたりの指標'),
+    DatasetRoute('energy-scenarios', 'get_energy_scenarios',
+                 params=[Param('mixes', _parse_mixes), Param('samples', int, default=0), Param('seed', int, default=0),
+                         Param('target_year', int, default=2050), Param('demand_growth', float, default=0.0),
+                         Param('top', int, default=20), Param('trajectories', _parse_flag, default=False)],
+                 cache_ttl=600.0, costly=True, http_methods=('GET', 'POST'), inputs=['energy_mix'],
+                 description='エネルギー構成シナリオの排出量・排出係数・再エネ比率の一括計算'),
+    DatasetRoute('comprehensive-report', 'get_comprehensive_environmental_report',
+                 payload_key='report', costly=True,
+                 inputs=['air_quality', 'climate', 'pollution', 'biodiversity', 'energy_mix'],
+                 description='包括的レポート'),
+    DatasetRoute('environmental-problems', 'get_environmental_problems',
+                 timestamp_key='last_updated', cache_ttl=3600.0, description='環境問題概要')
+]
+
+
+def _calculate_statistics(data: List[Dict]) -> Dict:
+    stats = {}
+    for field in STATISTICS_FIELDS:
+        values = [d[field] for d in data]
+        stats[field] = {
+            'avg': sum(values) / len(values),
+            'min': min(values),
+            'max': max(values)
+        }
+    return stats
+
+
+def create_app(fetcher: Optional[JapanEnvironmentalDataFetcher] = None, start_background: bool = True):
+    """Create Flask app if possible"""
+    if not HAS_FLASK:
+        return None
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app)
+
+    japan_data_fetcher = fetcher or JapanEnvironmentalDataFetcher()
+    air_quality_feed = AirQualityBroadcaster(japan_data_fetcher)
+    response_cache = ResponseCache()
+    metrics = Metrics()
+    profiler = Profiler()
+    admission = AdmissionController()
+    snapshot_bundler = SnapshotBundler(japan_data_fetcher)
+    health = HealthMonitor(japan_data_fetcher.scheduler, response_cache, admission, background=start_background,
+                           inputs={route.path: {dataset: DATASET_SOURCES[dataset] for dataset in route.inputs}
+                                   for route in JAPAN_DATASETS})
+
+    if start_background:
+        snapshot_bundler.start()
+        japan_data_fetcher.scheduler.start()
+        # 既定の条件のリクエストを先に計算し、キャッシュが温まるまで ready にしない
+        health.warm_up(_warm_up_tasks(japan_data_fetcher, response_cache))
+
+    app.extensions['japan_data_fetcher'] = japan_data_fetcher
+    app.extensions['response_cache'] = response_cache
+    app.extensions['metrics'] = metrics
+    app.extensions['profiler'] = profiler
+    app.extensions['admission'] = admission
+    app.extensions['snapshot_bundler'] = snapshot_bundler
+    app.extensions['health'] = health
+
+    @app.before_request
+    def start_timer():
+        g.started = time.perf_counter()
+        g.cache_hit = False
+        if profiler.should_profile(request.headers):
+            g.profile = profiler.begin(request.path)
+
+    @app.after_request
+    def finish_request(response):
+        with span('compress'):
+            response = compress_response(response, request.headers.get('Accept-Encoding', ''))
+        token = g.pop('profile', None)
+        if token is not None:
+            profile = profiler.finish(token, response.status_code)
+            if PROFILE_HEADER in request.headers:
+                response.headers['Server-Timing'] = profile.server_timing()
+        if request.endpoint and hasattr(g, 'started'):
+            metrics.record(request.endpoint, response.status_code,
+                           time.perf_counter() - g.started, g.get('cache_hit', False))
+        return response
+
+    @app.teardown_request
+    def finish_profile(error=None):
+        # 例外で after_request が呼ばれなかった場合もプロファイルを閉じる
+        token = g.pop('profile', None)
+        if token is not None:
+            profiler.finish(token, 500)
+
+    @app.route('/api/health', methods=['GET'])
+    @app.route('/api/health/ready', methods=['GET'])
+    def health_check():
+        ready, report = health.readiness()
+        response = jsonify(report)
+        response.status_code = 200 if ready else 503
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.route('/api/health/live', methods=['GET'])
+    def liveness_check():
+        alive, report = health.liveness()
+        response = jsonify(report)
+        response.status_code = 200 if alive else 503
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.route('/api/environmental-data', methods=['GET'])
+    def get_environmental_data():
+        location = request.args.get('location')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+
+        filtered_data = SAMPLE_ENVIRONMENTAL_DATA.copy()
+
+        if location:
+            filtered_data = [data for data in filtered_data if data['location'].lower() == location.lower()]
+
+        if start_date:
+            filtered_data = [data for data in filtered_data if data['date'] >= start_date]
+
+        if end_date:
+            filtered_data = [data for data in filtered_data if data['date'] <= end_date]
+
         return jsonify({
             'status': 'success',
-            'data': data,
-            'count': len(data)
+            'data': filtered_data,
+            'count': len(filtered_data)
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
 
-@app.route('/api/japan/pollution', methods=['GET'])
-def get_japan_pollution_data():
-    """日本の汚染データを取得"""
-    try:
-        data = japan_data_fetcher.get_pollution_data()
-        
+    @app.route('/api/environmental-data/statistics', methods=['GET'])
+    def get_statistics():
         return jsonify({
             'status': 'success',
-            'data': data,
-            'count': len(data)
+            'statistics': _calculate_statistics(SAMPLE_ENVIRONMENTAL_DATA)
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
 
-@app.route('/api/japan/biodiversity', methods=['GET'])
-def get_japan_biodiversity_data():
-    """日本の生物多様性データを取得"""
-    try:
-        data = japan_data_fetcher.get_biodiversity_data()
-        
+    @app.route('/api/locations', methods=['GET'])
+    def get_locations():
+        locations = list(set([data['location'] for data in SAMPLE_ENVIRONMENTAL_DATA]))
         return jsonify({
             'status': 'success',
-            'data': data,
-            'count': len(data)
+            'locations': locations
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
 
-@app.route('/api/japan/energy-emissions', methods=['GET'])
-def get_japan_energy_emissions():
-    """日本のエネルギーとCO2排出データを取得"""
-    try:
-        data = japan_data_fetcher.get_energy_emissions_data()
-        
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
         return jsonify({
             'status': 'success',
-            'data': data,
-            'count': len(data)
+            'routes': metrics.snapshot(),
+            'cache': response_cache.stats(),
+            'admission': admission.stats(),
+            'sources': japan_data_fetcher.scheduler.status()
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
 
-@app.route('/api/japan/comprehensive-report', methods=['GET'])
-def get_japan_comprehensive_report():
-    """日本の包括的環境レポートを取得"""
-    try:
-        report = japan_data_fetcher.get_comprehensive_environmental_report()
-        
+    # 日本の環境データのエンドポイント（ルート表から生成）
+    for route in JAPAN_DATASETS:
+        app.add_url_rule(
+            f"/api/japan/{route.path}", endpoint=route.endpoint,
+            view_func=_dataset_view(route, japan_data_fetcher, response_cache, admission),
+            methods=list(route.http_methods)
+        )
+
+    @app.route('/api/japan/air-quality/stream', methods=['GET'])
+    def stream_japan_air_quality():
+        # 取得ループは都道府県ごとに1つのため、既知の都道府県以外は受け付けない
+        prefecture = dataset_join.canonical_prefecture(request.args.get('prefecture', 'Tokyo'))
+        if prefecture not in dataset_join.PREFECTURES:
+            return jsonify({
+                'status': 'error',
+                'message': f"unknown prefecture: {request.args.get('prefecture')}"
+            }), 400
+
+        return Response(
+            stream_with_context(air_quality_feed.stream(dataset_join.prefecture_city(prefecture))),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.route('/api/admin/profiles', methods=['GET'])
+    def get_profiles():
         return jsonify({
             'status': 'success',
-            'report': report
+            'sample_rate': profiler.sample_rate,
+            'profiled_requests': profiler.profiled,
+            'slowest': profiler.slowest()
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
 
-@app.route('/api/japan/environmental-problems', methods=['GET'])
-def get_japan_environmental_problems():
-    """日本の環境問題の概要を取得"""
-    try:
-        problems = {
-            'major_issues': [
-                {
-                    'issue': '大気汚染',
-                    'description': '都市部でのPM2.5やNO2による大気汚染が健康に影響',
-                    'severity': 'high',
-                    'affected_areas': ['東京', '大阪', '名古屋'],
-                    'trend': 'improving'
-                },
-                {
-                    'issue': '気候変動',
-                    'description': '地球温暖化による異常気象の増加と生態系への影響',
-                    'severity': 'critical',
-                    'affected_areas': ['全国'],
-                    'trend': 'worsening'
-                },
-                {
-                    'issue': '海洋汚染',
-                    'description': 'プラスチック廃棄物と工業排水による海洋環境の悪化',
-                    'severity': 'high',
-                    'affected_areas': ['沿岸地域'],
-                    'trend': 'stable'
-                },
-                {
-                    'issue': '森林減少',
-                    'description': '都市開発と林業の変化による森林面積の減少',
-                    'severity': 'medium',
-                    'affected_areas': ['本州', '九州'],
-                    'trend': 'stable'
-                },
-                {
-                    'issue': '生物多様性の損失',
-                    'description': '絶滅危惧種の増加と生態系の破綻',
-                    'severity': 'high',
-                    'affected_areas': ['全国', '特に沖縄'],
-                    'trend': 'worsening'
-                },
-                {
-                    'issue': '廃棄物問題',
-                    'description': '産業廃棄物と一般廃棄物の処理能力不足',
-                    'severity': 'medium',
-                    'affected_areas': ['都市部'],
-                    'trend': 'improving'
-                }
-            ],
-            'government_initiatives': [
-                'カーボンニュートラル2050年目標',
-                '再生可能エネルギーの導入促進',
-                '循環型社会の構築',
-                '生物多様性国家戦略',
-                '大気汚染防止法の強化'
-            ],
-            'international_commitments': [
-                'パリ協定（温室効果ガス削減）',
-                '生物多様性条約',
-                'SDGs（持続可能な開発目標）',
-                'バーゼル条約（有害廃棄物規制）'
-            ]
-        }
-        
-        return jsonify({
+    @app.route('/api/japan/snapshot/manifest', methods=['GET'])
+    def get_snapshot_manifest():
+        manifest = snapshot_bundler.manifest()
+        response = jsonify({
             'status': 'success',
-            'data': problems,
-            'last_updated': datetime.now().isoformat()
+            'manifest': manifest
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
+        # 版が変わらなければ 304 で応答できるよう毎回再検証させる
+        response.set_etag(manifest['version'])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    @app.route('/api/japan/snapshot/<version>', methods=['GET'])
+    def get_snapshot_bundle(version):
+        path = snapshot_bundler.path(version)
+        if path is None:
+            return jsonify({
+                'status': 'error',
+                'message': f"snapshot {version} not found"
+            }), 404
+
+        if 'gzip' in request.headers.get('Accept-Encoding', '').lower():
+            response = send_file(path, mimetype='application/json', etag=version, conditional=True)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            with open(path, 'rb') as f:
+                response = Response(gzip.decompress(f.read()), mimetype='application/json')
+            response.set_etag(version)
+        # 版ごとに内容が固定なので長期間キャッシュさせる
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return app
+
+
+def _load(route: DatasetRoute, fetcher: JapanEnvironmentalDataFetcher, cache: ResponseCache, kwargs: Dict):
+    with span('fetch'):
+        data = getattr(fetcher, route.method)(**kwargs)
+    # エラーを含むレポートはキャッシュしない
+    if not (isinstance(data, dict) and 'error' in data):
+        cache.set(route.cache_key(kwargs), data, route.cache_ttl)
+    return data
+
+
+def _warm_up_tasks(fetcher: JapanEnvironmentalDataFetcher, cache: ResponseCache) -> Dict:
+    """
+    必須パラメータの無いルートの既定の条件（パラメータ無しのリクエスト）をキャッシュに入れるタスク
+    """
+    tasks = {}
+    for route in JAPAN_DATASETS:
+        if any(param.required for param in route.params):
+            continue
+        kwargs = route.parse({})
+        tasks[route.path] = (route.cache_key(kwargs),
+                             lambda route=route, kwargs=kwargs: _load(route, fetcher, cache, kwargs))
+    return tasks
+
+
+def _dataset_view(route: DatasetRoute, fetcher: JapanEnvironmentalDataFetcher, cache: ResponseCache,
+                  admission: AdmissionController):
+
+    def view():
+        try:
+            args = request.args
+            if request.method == 'POST':
+                body = request.get_json(silent=True)
+                if not isinstance(body, dict):
+                    raise ValueError('request body must be a JSON object')
+                args = {**request.args.to_dict(), **body}
+            kwargs = route.parse(args)
+        except (TypeError, ValueError) as e:
+            # JSON本文の値は文字列以外（リストなど）の場合もある
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+        try:
+            key = route.cache_key(kwargs)
+            data = cache.get(key)
+            stale = False
+            if data is not None:
+                g.cache_hit = True
+            elif route.is_costly(kwargs):
+                try:
+                    with admission.admit(request.remote_addr or 'unknown'):
+                        # 待機中に他のリクエストが計算した結果があればそれを使う
+                        data = cache.get(key)
+                        if data is None:
+                            data = _load(route, fetcher, cache, kwargs)
+                except Rejected as e:
+                    # 負荷制限時は最後に計算できた結果を返し、それも無ければ503
+                    data = cache.get_stale(key)
+                    if data is None:
+                        response = jsonify({
+                            'status': 'error',
+                            'message': f"Service busy ({e.reason}), retry later"
+                        })
+                        response.status_code = 503 if e.reason != 'rate_limited' else 429
+                        response.headers['Retry-After'] = e.retry_after_header
+                        return response
+                    stale = True
+            else:
+                data = _load(route, fetcher, cache, kwargs)
+
+            payload = {'status': 'success'}
+            if isinstance(data, list):
+                try:
+                    data, page = paginate(data, request.args)
+                except ValueError:
+                    return jsonify({
+                        'status': 'error',
+                        'message': 'limit and offset must be integers'
+                    }), 400
+                payload[route.payload_key] = data
+                payload['count'] = len(data)
+                if page is not None:
+                    payload['pagination'] = page
+            else:
+                payload[route.payload_key] = data
+
+            if stale:
+                payload['stale'] = True
+            for name in route.echo:
+                payload[name] = request.args.get(name, next(p.default for p in route.params if p.name == name))
+            if route.timestamp_key:
+                payload[route.timestamp_key] = datetime.now().isoformat()
+
+            with span('serialize'):
+                response = jsonify(payload)
+            if stale:
+                response.headers['Warning'] = '110 - "Response is Stale"'
+            return response
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 500
+
+    view.__doc__ = route.description
+    return view
+
 
 if __name__ == '__main__':
-    if HAS_FLASK and app:
+    if HAS_FLASK:
+        app = create_app()
         app.run(debug=True, host='0.0.0.0', port=5000)
     else:
         print("Flask is not available. Please install Flask and Flask-CORS to run the web server.")
         print("You can install them with: pip install Flask Flask-CORS")
         print("\nTesting the Japan Environmental Data functionality directly...")
-        
+
         # Test the data fetcher directly
         fetcher = JapanEnvironmentalDataFetcher()
         print("\n🇯🇵 Japan Environmental Data Test Results:")
-        
-        # Test air quality
-        air_data = fetcher.get_air_quality_data("Tokyo")
-        print(f"✅ Air Quality Data: {len(air_data)} records")
-        
-        # Test climate
-        climate_data = fetcher.get_climate_data()
-        print(f"✅ Climate Data: {len(climate_data)} records")
-        
-        # Test pollution
-        pollution_data = fetcher.get_pollution_data()
-        print(f"✅ Pollution Data: {len(pollution_data)} records")
-        
-        # Test biodiversity
-        bio_data = fetcher.get_biodiversity_data()
-        print(f"✅ Biodiversity Data: {len(bio_data)} records")
-        
-        # Test energy
-        energy_data = fetcher.get_energy_emissions_data()
-        print(f"✅ Energy Data: {len(energy_data)} records")
-        
+
+        for route in JAPAN_DATASETS:
+            if route.params and any(param.required for param in route.params):
+                continue
+            data = getattr(fetcher, route.method)()
+            if isinstance(data, list):
+                print(f"✅ {route.description}: {len(data)} records")
+
         print("\n🎉 All Japan Environmental Data functions are working!")
-        print("Install Flask dependencies to access the web interface.")
\ No newline at end of file
+        print("Install Flask dependencies to access the web interface.")
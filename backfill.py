@@ -0,0 +1,275 @@
+"""
+大気質・気候データの履歴のバックフィル
+Splits a date range into chunks per prefecture and parameter, fetches them
+in parallel within the upstream rate limits, writes them to the local store
+and checkpoints finished chunks so an interrupted run can be resumed
+
+    python3 backfill.py air_quality --from 2023-01-01 --to 2024-01-01 \
+        --prefectures Tokyo,Osaka --parameters pm25,no2 --workers 4
+"""
+
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+from data_sources import (
+    HistoryTruncated, HistoryUnsupported, SourceUnavailable, TokenBucket, build_default_registry
+)
+from local_store import DEFAULT_STORE_PATH, LocalStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_DAYS = 7
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 2
+
+# データセット -> (データソース名, ストアへの書き込み)
+BACKFILL_DATASETS = {
+    'air_quality': ('openaq', LocalStore.insert_measurements),
+    'climate': ('jma_climate', LocalStore.insert_climate)
+}
+
+
+class Chunk:
+    """1回の取得単位（地域・項目・期間 [start, end)）"""
+
+    __slots__ = ('location', 'parameter', 'start', 'end')
+
+    def __init__(self, location: Optional[str], parameter: Optional[str], start: str, end: str):
+        self.location = location
+        self.parameter = parameter
+        self.start = start
+        self.end = end
+
+    @property
+    def id(self) -> str:
+        return f"{self.location or '*'}|{self.parameter or '*'}|{self.start}|{self.end}"
+
+    def split(self) -> Optional[List['Chunk']]:
+        """期間を日単位で半分に分ける（1日の取得単位は分けられないため None）"""
+        start = datetime.strptime(self.start, '%Y-%m-%d')
+        days = (datetime.strptime(self.end, '%Y-%m-%d') - start).days
+        if days <= 1:
+            return None
+        middle = (start + timedelta(days=days // 2)).strftime('%Y-%m-%d')
+        return [Chunk(self.location, self.parameter, self.start, middle),
+                Chunk(self.location, self.parameter, middle, self.end)]
+
+    def params(self) -> Dict:
+        params = {}
+        if self.location:
+            params['location'] = self.location
+        if self.parameter:
+            params['parameter'] = self.parameter
+        return params
+
+
+def plan_chunks(date_from: str, date_to: str, locations: Sequence[Optional[str]],
+                parameters: Sequence[Optional[str]], chunk_days: int = DEFAULT_CHUNK_DAYS) -> List[Chunk]:
+    """
+    期間を chunk_days 日ごとに分割し、地域・項目と組み合わせた取得単位を作る
+    """
+    start = datetime.strptime(date_from, '%Y-%m-%d')
+    end = datetime.strptime(date_to, '%Y-%m-%d')
+    if end <= start:
+        raise ValueError('--to must be after --from')
+
+    chunks = []
+    while start < end:
+        chunk_end = min(start + timedelta(days=chunk_days), end)
+        for location in locations:
+            for parameter in parameters:
+                chunks.append(Chunk(location, parameter, start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+        start = chunk_end
+    return chunks
+
+
+class Checkpoint:
+    """
+    完了した取得単位の記録（1行に1つの取得単位を追記するジャーナル）
+    中断時に書きかけの行は一致する取得単位が無いため、その単位は再取得される
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.completed = {line.strip() for line in f if line.strip()}
+        self._journal = None
+
+    def done(self, chunk_id: str):
+        with self._lock:
+            self.completed.add(chunk_id)
+            if self._journal is None:
+                self._journal = open(self.path, 'a', encoding='utf-8')
+            self._journal.write(chunk_id + '\n')
+            self._journal.flush()
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+def backfill(dataset: str, chunks: List[Chunk], store: LocalStore, checkpoint: Checkpoint,
+             registry=None, workers: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES) -> Dict:
+    """
+    取得単位を並列に処理してストアに書き込み、処理結果の集計を返す
+    上流へのリクエストはデータソースのレート制限と同時実行数の範囲に抑える
+    """
+    source_name, insert = BACKFILL_DATASETS[dataset]
+    if registry is None:
+        registry = build_default_registry(_session(), store=store)
+    if source_name not in registry:
+        raise ValueError(f"data source {source_name} is not configured")
+    source = registry.get(source_name)
+
+    limiter = TokenBucket(source.rate_limit, source.burst)
+    semaphore = threading.BoundedSemaphore(source.max_concurrency)
+
+    def throttle():
+        limiter.acquire()
+
+    def fetch(chunk: Chunk) -> List[Dict]:
+        for attempt in range(retries + 1):
+            try:
+                with semaphore:
+                    return source.validate(source.conform(
+                        source.fetch_history(chunk.start, chunk.end, throttle, **chunk.params())
+                    ))
+            except HistoryTruncated:
+                # ページ数の上限に収まらない期間は半分ずつ取得し直す（1日でも収まらなければ失敗とし、完了にしない）
+                halves = chunk.split()
+                if halves is None:
+                    raise
+                logger.info(f"{chunk.id}: too many rows, splitting into {halves[0].id} and {halves[1].id}")
+                return [row for half in halves for row in fetch(half)]
+            except HistoryUnsupported:
+                # 履歴に対応していないソースは再試行しても失敗する
+                raise
+            except (SourceUnavailable, OSError):
+                # 上流の一時的な失敗（接続エラーを含む）は間隔を空けて再試行
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def run(chunk: Chunk) -> int:
+        rows = fetch(chunk)
+        if rows:
+            insert(store, rows)
+        checkpoint.done(chunk.id)
+        return len(rows)
+
+    pending = [chunk for chunk in chunks if chunk.id not in checkpoint.completed]
+    report = {
+        'chunks': len(chunks),
+        'skipped': len(chunks) - len(pending),
+        'completed': 0,
+        'failed': 0,
+        'rows': 0
+    }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+        futures = {executor.submit(run, chunk): chunk for chunk in pending}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                rows = future.result()
+            except HistoryUnsupported:
+                # 残りの取得単位も同じ理由で失敗するため打ち切る
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            except Exception as e:
+                report['failed'] += 1
+                logger.error(f"{chunk.id}: {e}")
+                continue
+            report['completed'] += 1
+            report['rows'] += rows
+            elapsed = time.perf_counter() - started
+            logger.info(f"{chunk.id}: {rows} rows ({report['completed'] + report['skipped']}/{len(chunks)} chunks, "
+                        f"{report['rows'] / elapsed if elapsed else 0:,.0f} rows/s)")
+
+    seconds = time.perf_counter() - started
+    report['seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round(report['rows'] / seconds, 1) if seconds else 0.0
+    return report
+
+
+def _session():
+    if not HAS_REQUESTS:
+        return None
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'Japan Environmental Data Analysis System/1.0'})
+    return session
+
+
+def _split(value: Optional[str]) -> List[Optional[str]]:
+    items = [item.strip() for item in (value or '').split(',') if item.strip()]
+    return items or [None]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='大気質・気候データの履歴をローカルストアにバックフィルする')
+    parser.add_argument('dataset', choices=sorted(BACKFILL_DATASETS), help='対象のデータセット')
+    parser.add_argument('--from', dest='date_from', required=True, help='開始日（YYYY-MM-DD）')
+    parser.add_argument('--to', dest='date_to', required=True, help='終了日（YYYY-MM-DD、この日を含まない）')
+    parser.add_argument('--prefectures', default='Tokyo', help='カンマ区切りの都道府県・都市（大気質のみ）')
+    parser.add_argument('--parameters', default='', help='カンマ区切りの項目（例: pm25,no2、省略時は全項目）')
+    parser.add_argument('--chunk-days', type=int, default=DEFAULT_CHUNK_DAYS, help='1回に取得する日数')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='並列数')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='取得失敗時の再試行回数')
+    parser.add_argument('--checkpoint', default=None, help='チェックポイントファイルのパス')
+    parser.add_argument('--restart', action='store_true', help='チェックポイントを無視して最初から取得する')
+    parser.add_argument('--store', default=None, help='ローカルストアのパス')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = LocalStore(args.store)
+    checkpoint_path = args.checkpoint or os.path.join(
+        os.path.dirname(args.store or DEFAULT_STORE_PATH), f"backfill_{args.dataset}.checkpoint"
+    )
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
+
+    if args.dataset == 'air_quality':
+        locations, parameters = _split(args.prefectures), _split(args.parameters)
+    else:
+        locations, parameters = [None], [None]
+
+    checkpoint = Checkpoint(checkpoint_path)
+    try:
+        chunks = plan_chunks(args.date_from, args.date_to, locations, parameters, args.chunk_days)
+        report = backfill(args.dataset, chunks, store, checkpoint, workers=args.workers, retries=args.retries)
+    except (ValueError, HistoryUnsupported) as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        checkpoint.close()
+
+    print(f"{'✅' if not report['failed'] else '⚠️'} {args.dataset}: {report['rows']:,} rows from "
+          f"{report['completed']:,} chunks in {report['seconds']}s ({report['rows_per_second']:,.0f} rows/s, "
+          f"{report['skipped']:,} already done, {report['failed']:,} failed)")
+    if report['failed']:
+        print(f"   Re-run the same command to retry the failed chunks (checkpoint: {checkpoint_path})")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+JSONシリアライザのマイクロベンチマーク
+Compares Flask's default stdlib JSON provider with the serialization
+module on the comprehensive report and a NumPy-heavy payload
+
+    python3 benchmarks/serialization_benchmark.py [--repeat 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+from japan_environmental_data import JapanEnvironmentalDataFetcher  # noqa: E402
+
+
+def _stdlib_flask(payload):
+    # Flask の DefaultJSONProvider と同じ設定（ensure_ascii・sort_keys）
+    return json.dumps(payload, ensure_ascii=True, sort_keys=True, default=serialization._default).encode('utf-8')
+
+
+def _numpy_payload():
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    rng = np.random.default_rng(0)
+    return {
+        'data': [
+            {
+                'date': f"2024-01-{day % 28 + 1:02d}",
+                'location': '東京都',
+                'value': rng.normal(15, 3),
+                'count': rng.integers(0, 100),
+                'series': rng.normal(0, 1, 24)
+            }
+            for day in range(2000)
+        ]
+    }
+
+
+def _bench(name, payload, repeat):
+    candidates = [('stdlib (Flask default)', _stdlib_flask), ('serialization.dumps', serialization.dumps)]
+    print(f"\n{name}")
+    results = {}
+    for label, dumps in candidates:
+        try:
+            size = len(dumps(payload))
+        except TypeError as e:
+            print(f"  {label:<24} unsupported: {e}")
+            continue
+        seconds = min(timeit.repeat(lambda: dumps(payload), number=repeat, repeat=3)) / repeat
+        results[label] = seconds
+        print(f"  {label:<24} {seconds * 1000:8.3f} ms/payload  {size / 1024:8.1f} KiB")
+    if len(results) == 2:
+        baseline, fast = results.values()
+        print(f"  speedup: {baseline / fast:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSONシリアライザのベンチマーク')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"orjson: {'available' if serialization.HAS_ORJSON else 'not installed (stdlib fallback)'}")
+
+    fetcher = JapanEnvironmentalDataFetcher()
+    report = {'status': 'success', 'report': fetcher.get_comprehensive_environmental_report()}
+    _bench('comprehensive report', report, args.repeat)
+
+    numpy_payload = _numpy_payload()
+    if numpy_payload is not None:
+        # numpyのスカラーと配列はFlaskの既定のエンコーダでは値ごとの変換が必要
+        _bench('NumPy values (2000 rows)', numpy_payload, max(args.repeat // 10, 1))
+
+
+if __name__ == '__main__':
+    main()
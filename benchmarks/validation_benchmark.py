@@ -0,0 +1,57 @@
+"""
+測定値の検証のスループット
+Generates synthetic hourly readings for many stations (half of them in
+ppb, with a few spikes) and times validation.validate_measurements
+
+    python3 benchmarks/validation_benchmark.py [--stations 200] [--hours 1500]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validation  # noqa: E402
+
+
+def _readings(stations, hours, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for station in range(stations):
+        for hour in range(hours):
+            parameter, unit = ('pm25', 'µg/m³') if hour % 2 else ('no2', 'ppb')
+            value = rng.gauss(20, 4) if rng.random() > 0.001 else 400.0
+            rows.append({
+                'date': f"2024-01-01T{hour:05d}",
+                'location': f"station-{station}",
+                'parameter': parameter,
+                'value': value,
+                'unit': unit,
+                'source': 'OpenAQ'
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='測定値の検証のベンチマーク')
+    parser.add_argument('--stations', type=int, default=200)
+    parser.add_argument('--hours', type=int, default=1500)
+    args = parser.parse_args()
+
+    rows = _readings(args.stations, args.hours)
+    print(f"numpy: {'available' if validation.HAS_NUMPY else 'not installed (pure Python)'}")
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        _, report = validation.validate_measurements(rows)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    print(f"{len(rows):,} rows in {best:.3f}s ({len(rows) / best:,.0f} rows/s)")
+    print(f"report: {report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,760 @@
+"""
+日本の環境データソースのプラグイン登録とスケジューリング
+Pluggable registry of upstream data sources with per-source rate limits,
+concurrency budgets and refresh intervals
+"""
+
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from datetime import datetime
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from profiling import span
+import validation
+
+logger = logging.getLogger(__name__)
+
+
+class SourceUnavailable(Exception):
+    """データソースが利用できない場合の例外"""
+
+
+class HistoryUnsupported(Exception):
+    """データソースが履歴の取得に対応していない場合の例外（再試行しても変わらない）"""
+
+
+class HistoryTruncated(Exception):
+    """履歴が取得できるページ数の上限を超え、期間の一部しか取得できなかった場合の例外（期間を分けて取得し直す）"""
+
+
+class TokenBucket:
+    """トークンバケット方式のレート制限"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        トークンを取得できれば0を、できなければ次に取得できるまでの秒数を返す
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float('inf')
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        トークンを取得するまで待機（timeout秒を超える場合はFalse）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class DataSource(ABC):
+    """
+    データソースプラグインの基底クラス
+    サブクラスは更新間隔・レート制限・同時実行数・出力スキーマを宣言し、fetch() を実装する
+    """
+
+    name = ''
+    description = ''
+    refresh_interval = 3600.0  # 秒
+    retry_interval = 60.0  # 取得失敗後の再試行間隔（秒）
+    rate_limit = 1.0  # リクエスト/秒
+    burst = 1
+    max_concurrency = 1
+    timeout = 30.0  # 秒
+    schema: Dict[str, type] = {}
+    default_params: List[Dict] = [{}]  # バックグラウンド更新で取得するパラメータ
+
+    @abstractmethod
+    def fetch(self, **params) -> List[Dict]:
+        """最新のデータを取得（出力スキーマに合わせる前の行）"""
+
+    def fetch_history(self, date_from: str, date_to: str, throttle: Optional[Callable[[], None]] = None,
+                      **params) -> List[Dict]:
+        """
+        期間 [date_from, date_to) の履歴を取得（バックフィル用、対応するソースのみ実装）
+        throttle は上流へのリクエストごとに呼ばれる
+        """
+        raise HistoryUnsupported(f"{self.name} does not provide history")
+
+    def validate(self, rows: List[Dict]) -> List[Dict]:
+        """
+        スキーマに合わせた後の値の検証（単位の正規化や異常値の除外が必要なソースのみ上書き）
+        """
+        return rows
+
+    def conform(self, rows: List[Dict]) -> List[Dict]:
+        """
+        出力スキーマに合わせて型を変換し、必須項目が欠けた行を除外
+        """
+        if not self.schema:
+            return rows
+
+        conformed = []
+        for row in rows:
+            try:
+                item = {key: cast(row[key]) for key, cast in self.schema.items()}
+            except (KeyError, TypeError, ValueError):
+                continue
+            for key, value in row.items():
+                item.setdefault(key, value)
+            conformed.append(item)
+
+        if len(conformed) < len(rows):
+            logger.warning(f"{self.name}: dropped {len(rows) - len(conformed)} rows not matching schema")
+        return conformed
+
+
+class OpenAQSource(DataSource):
+    """OpenAQ API（大気質）"""
+
+    name = 'openaq'
+    description = 'OpenAQ API (Air Quality)'
+    refresh_interval = 900.0
+    rate_limit = 1.0
+    burst = 5
+    max_concurrency = 2
+    schema = {'date': str, 'location': str, 'parameter': str, 'value': float, 'unit': str, 'source': str}
+    default_params = [{'location': 'Tokyo'}]
+
+    url = "https://api.openaq.org/v2/measurements"
+
+    def __init__(self, session=None, limit: int = 20, store=None):
+        self.session = session
+        self.limit = limit
+        # 外れ値の判定の窓を過去の測定値で埋めるためのローカルストア（任意）
+        self.store = store
+
+    def fetch(self, location: str = "Tokyo", **params) -> List[Dict]:
+        if not (HAS_REQUESTS and self.session):
+            raise SourceUnavailable('requests is not installed')
+
+        query = {
+            'country': 'JP',
+            'city': location,
+            'limit': 100,
+            'order_by': 'datetime',
+            'sort': 'desc'
+        }
+        response = self.session.get(self.url, params=query, timeout=self.timeout)
+        if response.status_code != 200:
+            raise SourceUnavailable(f"OpenAQ API request failed: {response.status_code}")
+
+        measurements = response.json().get('results', [])
+
+        processed_data = []
+        for measurement in measurements[:self.limit]:  # 最新20件
+            processed_data.append({
+                'date': measurement.get('date', {}).get('utc', ''),
+                'location': measurement.get('city', location),
+                'station': _station_id(measurement),
+                'parameter': measurement.get('parameter', ''),
+                'value': measurement.get('value'),
+                'unit': measurement.get('unit', ''),
+                'source': 'OpenAQ'
+            })
+
+        return processed_data
+
+    def fetch_history(self, date_from: str, date_to: str, throttle: Optional[Callable[[], None]] = None,
+                      location: str = "Tokyo", parameter: Optional[str] = None, page_size: int = 1000,
+                      max_pages: int = 100, **params) -> List[Dict]:
+        if not (HAS_REQUESTS and self.session):
+            raise SourceUnavailable('requests is not installed')
+
+        rows = []
+        for page in range(1, max_pages + 1):
+            query = {
+                'country': 'JP',
+                'city': location,
+                'date_from': date_from,
+                'date_to': date_to,
+                'limit': page_size,
+                'page': page,
+                'order_by': 'datetime',
+                'sort': 'asc'
+            }
+            if parameter:
+                query['parameter'] = parameter
+            if throttle is not None:
+                throttle()
+            response = self.session.get(self.url, params=query, timeout=self.timeout)
+            if response.status_code != 200:
+                raise SourceUnavailable(f"OpenAQ API request failed: {response.status_code}")
+
+            results = response.json().get('results', [])
+            rows.extend({
+                'date': measurement.get('date', {}).get('utc', ''),
+                'location': location,
+                'station': _station_id(measurement),
+                'parameter': measurement.get('parameter', ''),
+                'value': measurement.get('value'),
+                'unit': measurement.get('unit', ''),
+                'source': 'OpenAQ'
+            } for measurement in results)
+            if len(results) < page_size:
+                return rows
+        # 最後のページまで埋まっている場合は期間の残りを取得できていない
+        raise HistoryTruncated(f"OpenAQ history for {location} from {date_from} to {date_to} "
+                               f"exceeds {max_pages} pages of {page_size} rows")
+
+    def validate(self, rows: List[Dict]) -> List[Dict]:
+        # 同じ都市の複数の観測局を別の系列として扱う
+        rows, report = validation.validate_measurements(
+            rows, station_key='station', history=_stored_history(self.store, rows)
+        )
+        validation.log_report(self.name, report)
+        return rows
+
+
+class OpenAQStationsSource(DataSource):
+    """OpenAQ API（観測局メタデータと最新値）"""
+
+    name = 'openaq_stations'
+    description = 'OpenAQ API (Stations)'
+    refresh_interval = 6 * 3600.0
+    rate_limit = 1.0
+    burst = 5
+    max_concurrency = 1
+    schema = {'station_id': str, 'name': str, 'latitude': float, 'longitude': float}
+
+    url = "https://api.openaq.org/v2/locations"
+
+    def __init__(self, session=None, page_size: int = 1000, max_pages: int = 10, store=None):
+        self.session = session
+        self.page_size = page_size
+        self.max_pages = max_pages
+        # 観測局ごとに1件しかない最新値の判定に使う過去の測定値のローカルストア（任意）
+        self.store = store
+
+    def fetch(self, **params) -> List[Dict]:
+        if not (HAS_REQUESTS and self.session):
+            raise SourceUnavailable('requests is not installed')
+
+        stations = []
+        for page in range(1, self.max_pages + 1):
+            query = {'country': 'JP', 'limit': self.page_size, 'page': page}
+            response = self.session.get(self.url, params=query, timeout=self.timeout)
+            if response.status_code != 200:
+                raise SourceUnavailable(f"OpenAQ API request failed: {response.status_code}")
+
+            results = response.json().get('results', [])
+            for location in results:
+                coordinates = location.get('coordinates') or {}
+                stations.append({
+                    'station_id': str(location.get('id', '')),
+                    'name': location.get('name', ''),
+                    'city': location.get('city') or '',
+                    'latitude': coordinates.get('latitude'),
+                    'longitude': coordinates.get('longitude'),
+                    'latest': [
+                        {
+                            'parameter': parameter.get('parameter', ''),
+                            'value': parameter.get('lastValue'),
+                            'unit': parameter.get('unit', ''),
+                            'date': parameter.get('lastUpdated', '')
+                        }
+                        for parameter in location.get('parameters', [])
+                    ],
+                    'source': 'OpenAQ'
+                })
+            if len(results) < self.page_size:
+                break
+
+        return stations
+
+    def validate(self, rows: List[Dict]) -> List[Dict]:
+        # 観測局ごとの最新値をまとめて検証し、観測局ごとに戻す
+        readings = [
+            dict(reading, station=station['station_id']) for station in rows for reading in station.get('latest') or []
+        ]
+        readings, report = validation.validate_measurements(
+            readings, station_key='station', history=_stored_history(self.store, readings)
+        )
+        validation.log_report(self.name, report)
+        by_station = {}
+        for reading in readings:
+            by_station.setdefault(reading.pop('station'), []).append(reading)
+        return [dict(station, latest=by_station.get(station['station_id'], [])) for station in rows]
+
+
+class JMAClimateSource(DataSource):
+    """気象庁形式の気候データフィード（JSON）"""
+
+    name = 'jma_climate'
+    description = 'Climate feed (JMA format)'
+    refresh_interval = 3 * 3600.0
+    rate_limit = 0.2
+    max_concurrency = 1
+    schema = {'date': str, 'location': str, 'temperature_anomaly': float, 'average_temperature': float}
+
+    def __init__(self, url: str, session=None):
+        self.url = url
+        self.session = session
+
+    def fetch(self, location: Optional[str] = None, **params) -> List[Dict]:
+        if not (HAS_REQUESTS and self.session):
+            raise SourceUnavailable('requests is not installed')
+
+        response = self.session.get(self.url, timeout=self.timeout)
+        if response.status_code != 200:
+            raise SourceUnavailable(f"Climate feed request failed: {response.status_code}")
+
+        payload = response.json()
+        rows = payload.get('data', []) if isinstance(payload, dict) else payload
+        for row in rows:
+            row.setdefault('location', '日本全国')
+            row.setdefault('source', 'Japan Meteorological Agency')
+        return _filter_location(rows, location)
+
+    def fetch_history(self, date_from: str, date_to: str, throttle: Optional[Callable[[], None]] = None,
+                      location: Optional[str] = None, **params) -> List[Dict]:
+        if not (HAS_REQUESTS and self.session):
+            raise SourceUnavailable('requests is not installed')
+
+        if throttle is not None:
+            throttle()
+        response = self.session.get(self.url, params={'date_from': date_from, 'date_to': date_to},
+                                    timeout=self.timeout)
+        if response.status_code != 200:
+            raise SourceUnavailable(f"Climate feed request failed: {response.status_code}")
+
+        payload = response.json()
+        rows = payload.get('data', []) if isinstance(payload, dict) else payload
+        # 期間指定に対応しないフィードでも範囲外の行は使わない
+        rows = [row for row in rows if date_from <= str(row.get('date', ''))[:10] < date_to]
+        for row in rows:
+            row.setdefault('location', '日本全国')
+            row.setdefault('source', 'Japan Meteorological Agency')
+        return _filter_location(rows, location)
+
+
+class METIEnergyCSVSource(DataSource):
+    """経済産業省形式のエネルギー構成CSV"""
+
+    name = 'meti_energy'
+    description = 'Energy mix CSV (METI format)'
+    refresh_interval = 24 * 3600.0
+    rate_limit = 1.0
+    max_concurrency = 1
+    schema = {'energy_source': str, 'generation_percentage': float, 'co2_factor': float}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, **params) -> List[Dict]:
+        if not os.path.exists(self.path):
+            raise SourceUnavailable(f"{self.path} not found")
+
+        with open(self.path, newline='', encoding='utf-8-sig') as f:
+            return list(csv.DictReader(f))
+
+
+class LocalFileSource(DataSource):
+    """ローカルのJSON/CSVファイル"""
+
+    refresh_interval = 60.0
+    rate_limit = 10.0
+    burst = 10
+    max_concurrency = 4
+
+    def __init__(self, name: str, path: str, schema: Optional[Dict[str, type]] = None):
+        self.name = name
+        self.path = path
+        self.description = f"Local file ({os.path.basename(path)})"
+        if schema is not None:
+            self.schema = schema
+
+    def fetch(self, location: Optional[str] = None, **params) -> List[Dict]:
+        if not os.path.exists(self.path):
+            raise SourceUnavailable(f"{self.path} not found")
+
+        with open(self.path, newline='', encoding='utf-8-sig') as f:
+            if self.path.endswith('.csv'):
+                rows = list(csv.DictReader(f))
+            else:
+                payload = json.load(f)
+                rows = payload.get('data', []) if isinstance(payload, dict) else payload
+        return _filter_location(rows, location)
+
+
+def _filter_location(rows: List[Dict], location: Optional[str]) -> List[Dict]:
+    if not location:
+        return rows
+    return [row for row in rows if row.get('location', location) == location]
+
+
+class SourceRegistry:
+    """データソースプラグインの登録簿"""
+
+    def __init__(self):
+        self._sources: Dict[str, DataSource] = {}
+
+    def register(self, source: DataSource) -> DataSource:
+        if not source.name:
+            raise ValueError('data source must declare a name')
+        self._sources[source.name] = source
+        return source
+
+    def get(self, name: str) -> DataSource:
+        return self._sources[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sources
+
+    def __iter__(self):
+        return iter(list(self._sources.values()))
+
+    def names(self) -> List[str]:
+        return list(self._sources)
+
+
+# local_<データセット> ファイルに適用する出力スキーマ（CSVの文字列値を型変換する）
+LOCAL_FILE_SCHEMAS = {
+    'air_quality': OpenAQSource.schema,
+    'climate': JMAClimateSource.schema,
+    'energy_mix': METIEnergyCSVSource.schema,
+    'stations': {'station_id': str, 'name': str, 'city': str, 'latitude': float, 'longitude': float},
+    'pollution': {
+        'date': str, 'location': str, 'industrial_emissions': float, 'water_pollution_index': float,
+        'soil_contamination_sites': int, 'waste_generation_tons': float, 'recycling_rate': float
+    },
+    'biodiversity': {
+        'date': str, 'region': str, 'forest_coverage_percent': float, 'deforestation_rate_annual': float,
+        'endangered_species_count': int
+    }
+}
+
+
+def _station_id(measurement: Dict) -> str:
+    """OpenAQ の測定値の観測局ID（観測局一覧の station_id と同じ値、無ければ観測局名）"""
+    return str(measurement.get('locationId') or measurement.get('location') or '')
+
+
+def _stored_history(store, rows: List[Dict]) -> List[Dict]:
+    """
+    検証する行の観測局・項目ごとに、ストアにある最も古い行より前の直近 OUTLIER_WINDOW 件
+    （外れ値の窓をバッチや取得単位の境界をまたいで引き継ぐ）
+    """
+    if store is None or not rows:
+        return []
+    earliest = {}
+    for row in rows:
+        if not row.get('station'):
+            continue
+        key = (row['station'], row.get('parameter'))
+        date = str(row.get('date') or '')
+        if key not in earliest or date < earliest[key]:
+            earliest[key] = date
+
+    history = []
+    try:
+        for (station, parameter), date in earliest.items():
+            history.extend(store.recent_measurements(station, parameter, date, validation.OUTLIER_WINDOW))
+    except sqlite3.Error as e:
+        # 履歴が読めなくても検証は続ける（窓はバッチ内の値だけになる）
+        logger.warning(f"Could not read measurement history: {e}")
+        return []
+    return history
+
+
+def build_default_registry(session=None, data_dir: Optional[str] = None, store=None) -> SourceRegistry:
+    """
+    環境変数の設定に応じて標準のデータソースを登録
+    store を渡すと大気質の検証でストアの過去の測定値を参照する
+
+    - JMA_CLIMATE_URL: 気候データフィードのURL
+    - METI_ENERGY_CSV: エネルギー構成CSVのパス
+    - JAPAN_ENV_DATA_DIR: local_<ファイル名> として登録するJSON/CSVのディレクトリ
+    """
+    registry = SourceRegistry()
+    registry.register(OpenAQSource(session, store=store))
+    registry.register(OpenAQStationsSource(session, store=store))
+
+    climate_url = os.environ.get('JMA_CLIMATE_URL')
+    if climate_url:
+        registry.register(JMAClimateSource(climate_url, session))
+
+    energy_csv = os.environ.get('METI_ENERGY_CSV')
+    if energy_csv:
+        registry.register(METIEnergyCSVSource(energy_csv))
+
+    data_dir = data_dir or os.environ.get('JAPAN_ENV_DATA_DIR')
+    if data_dir and os.path.isdir(data_dir):
+        for filename in sorted(os.listdir(data_dir)):
+            stem, ext = os.path.splitext(filename)
+            if ext in ('.json', '.csv'):
+                registry.register(LocalFileSource(
+                    f"local_{stem}", os.path.join(data_dir, filename), LOCAL_FILE_SCHEMAS.get(stem)
+                ))
+
+    return registry
+
+
+class _CachedResult:
+    __slots__ = ('rows', 'fetched_at', 'error', 'updated_at')
+
+    def __init__(self, rows: List[Dict], fetched_at: float, error: Optional[str] = None,
+                 updated_at: Optional[float] = None):
+        self.rows = rows
+        self.fetched_at = fetched_at
+        self.error = error
+        # rows を取得した時刻（失敗した取得では前回の値のまま）
+        self.updated_at = fetched_at if updated_at is None and error is None else updated_at
+
+
+class SourceScheduler:
+    """
+    登録されたデータソースを統一的に取得・更新するスケジューラ
+
+    キャッシュが新しければそのまま返し、古ければ古いデータを返しつつ
+    バックグラウンドで更新するため、リクエスト処理が上流の応答を待たない
+    """
+
+    def __init__(self, registry: SourceRegistry, max_workers: int = 4, wait_timeout: float = 10.0,
+                 max_entries: int = 1024):
+        self.registry = registry
+        self.wait_timeout = wait_timeout
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='data-source')
+        self._lock = threading.Lock()
+        self._cache: Dict[tuple, _CachedResult] = {}
+        self._inflight: Dict[tuple, Future] = {}
+        self._limiters: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._listeners: List[Callable[[str, Dict, List[Dict]], None]] = []
+        self._cycle_listeners: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(name: str, params: Dict) -> tuple:
+        return (name, tuple(sorted(params.items())))
+
+    def _budget(self, source: DataSource):
+        with self._lock:
+            if source.name not in self._limiters:
+                self._limiters[source.name] = TokenBucket(source.rate_limit, source.burst)
+                self._semaphores[source.name] = threading.BoundedSemaphore(source.max_concurrency)
+            return self._limiters[source.name], self._semaphores[source.name]
+
+    def add_listener(self, listener: Callable[[str, Dict, List[Dict]], None]):
+        """取得完了時に (ソース名, パラメータ, 行) で呼ばれるコールバックを登録"""
+        self._listeners.append(listener)
+
+    def add_cycle_listener(self, listener: Callable[[], None]):
+        """バックグラウンド更新の1巡（取得の完了待ちまで）ごとに呼ばれるコールバックを登録"""
+        self._cycle_listeners.append(listener)
+
+    def get(self, name: str, **params) -> List[Dict]:
+        """
+        データソースの結果を取得
+        初回のみ取得完了を待ち、以降はキャッシュを返す
+        """
+        source = self.registry.get(name)
+        key = self._key(name, params)
+
+        with self._lock:
+            cached = self._cache.get(key)
+
+        if cached is not None:
+            interval = source.retry_interval if cached.error else source.refresh_interval
+            if time.time() - cached.fetched_at >= interval:
+                self.refresh(name, **params)
+            if cached.rows is not None:
+                return cached.rows
+            raise SourceUnavailable(cached.error)
+
+        with span(f"upstream.{name}"):
+            return self.refresh(name, **params).result(timeout=self.wait_timeout)
+
+    def refresh(self, name: str, **params) -> Future:
+        """データソースの更新をスケジュール（同じ条件の更新は1つにまとめる）"""
+        source = self.registry.get(name)
+        key = self._key(name, params)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self._inflight[key] = Future()
+        self._submit(source, key, params, future, time.monotonic() + source.timeout)
+        return future
+
+    def _submit(self, source: DataSource, key: tuple, params: Dict, future: Future, deadline: float):
+        """
+        レート制限のトークンを得てからワーカーに渡す
+        待機はタイマーで行い、制限中のソースがワーカーを占有しないようにする
+        """
+        limiter, _ = self._budget(source)
+        delay = limiter.try_acquire()
+        if delay == 0:
+            self._executor.submit(self._run, source, key, params, future)
+        elif time.monotonic() + delay > deadline:
+            self._finish(key, future, error=SourceUnavailable(f"{source.name}: rate limit exceeded"))
+        else:
+            timer = threading.Timer(delay, self._submit, args=(source, key, params, future, deadline))
+            timer.daemon = True
+            timer.start()
+
+    def _run(self, source: DataSource, key: tuple, params: Dict, future: Future):
+        _, semaphore = self._budget(source)
+        try:
+            with semaphore:
+                rows = source.validate(source.conform(source.fetch(**params)))
+        except Exception as e:
+            self._finish(key, future, error=e)
+            return
+
+        with self._lock:
+            self._cache[key] = _CachedResult(rows, time.time())
+            self._evict()
+        for listener in self._listeners:
+            try:
+                listener(source.name, params, rows)
+            except Exception as e:
+                logger.error(f"Data source listener failed for {source.name}: {e}")
+        self._finish(key, future, rows=rows)
+
+    def _finish(self, key: tuple, future: Future, rows: Optional[List[Dict]] = None,
+                error: Optional[Exception] = None):
+        with self._lock:
+            if error is not None:
+                previous = self._cache.get(key)
+                # 取得失敗時も前回のデータは保持し、retry_interval の間は再試行しない
+                self._cache[key] = _CachedResult(previous.rows if previous else None, time.time(), str(error),
+                                                 previous.updated_at if previous else None)
+                self._evict()
+            self._inflight.pop(key, None)
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(rows)
+
+    def _evict(self):
+        # パラメータはリクエスト由来のため、古い取得結果から破棄して上限を保つ
+        while len(self._cache) > self.max_entries:
+            oldest = min(self._cache, key=lambda k: self._cache[k].fetched_at)
+            del self._cache[oldest]
+
+    def refresh_due(self) -> List[Future]:
+        """更新間隔を過ぎたデータソースの既定パラメータを更新"""
+        futures = []
+        now = time.time()
+        for source in self.registry:
+            for params in source.default_params:
+                with self._lock:
+                    cached = self._cache.get(self._key(source.name, params))
+                interval = source.retry_interval if cached is not None and cached.error else source.refresh_interval
+                if cached is None or now - cached.fetched_at >= interval:
+                    futures.append(self.refresh(source.name, **params))
+        return futures
+
+    def start(self, poll_interval: float = 30.0):
+        """バックグラウンド更新スレッドを開始"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    futures = self.refresh_due()
+                    if futures:
+                        wait(futures, timeout=self.wait_timeout)
+                    for listener in self._cycle_listeners:
+                        listener()
+                except Exception as e:
+                    logger.error(f"Scheduled refresh failed: {e}")
+                self._stop.wait(poll_interval)
+
+        self._thread = threading.Thread(target=loop, name='data-source-scheduler', daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        """バックグラウンド更新スレッドが動作中か"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def version(self) -> frozenset:
+        """
+        キャッシュ中の取得結果の版（条件ごとの最後に成功した取得の時刻）。いずれかが再取得されると変わる
+        取得の失敗は前回のデータを残すため版を変えない
+        """
+        with self._lock:
+            return frozenset((key, cached.updated_at) for key, cached in self._cache.items()
+                             if cached.updated_at is not None)
+
+    def status(self) -> Dict[str, Dict]:
+        """データソースごとの最終取得時刻・エラー・設定"""
+        now = time.time()
+        result = {}
+        with self._lock:
+            entries = list(self._cache.items())
+            inflight = set(self._inflight)
+
+        for source in self.registry:
+            results = {}
+            for (name, params), cached in entries:
+                if name != source.name:
+                    continue
+                results[json.dumps(dict(params), ensure_ascii=False, sort_keys=True)] = {
+                    'fetched_at': datetime.fromtimestamp(cached.fetched_at).isoformat(),
+                    'age_seconds': round(now - cached.fetched_at, 1),
+                    'data_age_seconds': (round(now - cached.updated_at, 1)
+                                         if cached.updated_at is not None else None),
+                    'rows': len(cached.rows) if cached.rows is not None else None,
+                    'error': cached.error,
+                    'refreshing': (name, params) in inflight,
+                    # バックグラウンド更新の対象か（False はリクエストで指定された条件の取得結果）
+                    'scheduled': dict(params) in source.default_params
+                }
+            result[source.name] = {
+                'description': source.description,
+                'refresh_interval': source.refresh_interval,
+                'rate_limit': source.rate_limit,
+                'max_concurrency': source.max_concurrency,
+                'schema': {key: cast.__name__ for key, cast in source.schema.items()},
+                'results': results
+            }
+        return result
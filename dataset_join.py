@@ -0,0 +1,234 @@
+"""
+データセットの結合（都道府県・日付で揃えた列指向の結合と相関）
+Aligns pollution, population, air-quality and climate data on
+(prefecture, date) and computes correlation matrices and per-capita
+metrics over whole columns
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# 都道府県の正式名 -> (大気質データを問い合わせる都市名, 別名)
+PREFECTURES = {
+    '北海道': ('Sapporo', ['Hokkaido', '札幌']),
+    '宮城県': ('Sendai', ['Miyagi', '仙台']),
+    '東京都': ('Tokyo', ['東京']),
+    '神奈川県': ('Yokohama', ['Kanagawa', '横浜']),
+    '愛知県': ('Nagoya', ['Aichi', '名古屋']),
+    '京都府': ('Kyoto', ['京都']),
+    '大阪府': ('Osaka', ['大阪']),
+    '兵庫県': ('Kobe', ['Hyogo', '神戸']),
+    '広島県': ('Hiroshima', ['広島']),
+    '福岡県': ('Fukuoka', ['福岡']),
+    '沖縄県': ('Naha', ['Okinawa', '那覇'])
+}
+
+_PREFECTURE_LOOKUP = {
+    alias.lower(): prefecture
+    for prefecture, (city, aliases) in PREFECTURES.items()
+    for alias in [prefecture, city] + aliases
+}
+
+# 大気質の項目名を結合後の列名に変換
+AIR_QUALITY_COLUMNS = {'pm25': 'pm25', 'pm10': 'pm10', 'no2': 'no2', 'so2': 'so2', 'o3': 'o3', 'co': 'co'}
+
+# 人口あたりに換算する列（列名 -> (出力列名, 倍率)）
+# 工業排出（industrial_emissions）は無次元の指数のため人口で割らない
+PER_CAPITA_COLUMNS = {
+    'waste_generation_tons': ('waste_kg_per_capita', 1000.0),
+    'soil_contamination_sites': ('soil_contamination_sites_per_million', 1_000_000.0)
+}
+
+# 相関を出す最小の組数（これ未満の相関係数は統計的に意味を持たないため null）
+MIN_PAIRS = 10
+
+
+def canonical_prefecture(name: Optional[str]) -> Optional[str]:
+    """
+    都市名・ローマ字表記を都道府県の正式名に揃える（不明な名前はそのまま返す）
+    """
+    if not name:
+        return None
+    return _PREFECTURE_LOOKUP.get(str(name).strip().lower(), name)
+
+
+def prefecture_city(prefecture: str) -> str:
+    """大気質データソースに問い合わせる都市名（対応が無ければ都道府県名のまま）"""
+    entry = PREFECTURES.get(canonical_prefecture(prefecture))
+    return entry[0] if entry else prefecture
+
+
+class JoinedTable:
+    """
+    (都道府県, 日付) をキーとする列指向の結合結果
+    列は同じ長さのリストで、欠損はNone
+    """
+
+    def __init__(self, keys: Sequence[Tuple[str, str]], columns: Dict[str, List]):
+        self.keys = list(keys)
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def to_dicts(self) -> List[Dict]:
+        names = list(self.columns)
+        rows = []
+        for i, (prefecture, date) in enumerate(self.keys):
+            row = {'prefecture': prefecture, 'date': date}
+            for name in names:
+                value = self.columns[name][i]
+                if value is not None:
+                    row[name] = value
+            rows.append(row)
+        return rows
+
+
+def _key_index(keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    return {key: i for i, key in enumerate(keys)}
+
+
+def join(pollution: List[Dict], population: Dict[str, float], air_quality: List[Dict],
+         climate: List[Dict]) -> JoinedTable:
+    """
+    汚染データを基準に (都道府県, 日付) で結合する
+    大気質は日平均に集計し、全国値の気候データは日付だけで結合する
+    """
+    keys = []
+    pollution_columns: Dict[str, List] = {}
+    for row in pollution:
+        prefecture = canonical_prefecture(row.get('location'))
+        keys.append((prefecture, str(row.get('date', ''))[:10]))
+        for name, value in row.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                pollution_columns.setdefault(name, [])
+    for name in pollution_columns:
+        pollution_columns[name] = [row.get(name) for row in pollution]
+
+    index = _key_index(keys)
+    n = len(keys)
+    columns = {'population': [population.get(prefecture) for prefecture, _ in keys]}
+    columns.update(pollution_columns)
+
+    # 大気質: (都道府県, 日付, 項目) ごとの日平均
+    sums: Dict[Tuple[int, str], List[float]] = {}
+    for row in air_quality:
+        parameter = AIR_QUALITY_COLUMNS.get(str(row.get('parameter', '')).lower().replace('.', ''))
+        value = row.get('value')
+        # 検証で外れ値とされた測定値は平均に含めない
+        if parameter is None or value is None or row.get('quality') == 'outlier':
+            continue
+        i = index.get((canonical_prefecture(row.get('location')), str(row.get('date', ''))[:10]))
+        if i is None:
+            continue
+        total = sums.setdefault((i, parameter), [0.0, 0])
+        total[0] += value
+        total[1] += 1
+    for parameter in sorted({parameter for _, parameter in sums}):
+        column = [None] * n
+        for (i, name), (total, count) in sums.items():
+            if name == parameter:
+                column[i] = round(total / count, 3)
+        columns[parameter] = column
+
+    # 気候（全国値）は日付で結合
+    by_date = {str(row.get('date', ''))[:10]: row for row in climate}
+    for name in ('temperature_anomaly', 'precipitation_change'):
+        columns[name] = [by_date.get(date, {}).get(name) for _, date in keys]
+
+    table = JoinedTable(keys, columns)
+    add_per_capita(table)
+    return table
+
+
+def add_per_capita(table: JoinedTable):
+    """人口あたりの指標を列として追加"""
+    population = table.columns.get('population')
+    if population is None:
+        return
+    for name, (output, scale) in PER_CAPITA_COLUMNS.items():
+        values = table.columns.get(name)
+        if values is None:
+            continue
+        if HAS_NUMPY:
+            numerator = np.array([np.nan if v is None else v for v in values], dtype=float)
+            denominator = np.array([np.nan if not p else p for p in population], dtype=float)
+            result = numerator * scale / denominator
+            table.columns[output] = [None if np.isnan(v) else round(float(v), 4) for v in result]
+        else:
+            table.columns[output] = [
+                round(v * scale / p, 4) if v is not None and p else None for v, p in zip(values, population)
+            ]
+
+
+def correlation_matrix(table: JoinedTable, fields: Optional[Sequence[str]] = None,
+                       min_pairs: int = MIN_PAIRS) -> Dict:
+    """
+    列間のピアソン相関行列（ペアごとに両方の値がある行だけを使う）
+    有効な組が min_pairs 未満の場合は None（組数は pairs で返す）
+    """
+    fields = [
+        name for name in (fields or table.columns)
+        if name in table.columns and any(v is not None for v in table.columns[name])
+    ]
+    if HAS_NUMPY:
+        matrix, counts = _correlation_numpy(table, fields, min_pairs)
+    else:
+        matrix, counts = _correlation_python(table, fields, min_pairs)
+    return {'fields': fields, 'matrix': matrix, 'pairs': counts, 'min_pairs': min_pairs}
+
+
+def _correlation_numpy(table: JoinedTable, fields: Sequence[str], min_pairs: int):
+    data = np.array([[np.nan if v is None else v for v in table.columns[name]] for name in fields], dtype=float)
+    if data.size == 0:
+        return [], []
+    # 列ごとに平均を引いてから積和を取る（定数列は分散0になり相関なし）
+    data = data - np.nanmean(data, axis=1, keepdims=True)
+    valid = ~np.isnan(data)
+    filled = np.where(valid, data, 0.0)
+    mask = valid.astype(float)
+
+    # 全ペアの和・二乗和・積和を行列積でまとめて計算
+    n = mask @ mask.T
+    sum_x = filled @ mask.T
+    sum_y = sum_x.T
+    sum_xx = (filled ** 2) @ mask.T
+    sum_yy = sum_xx.T
+    sum_xy = filled @ filled.T
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = n * sum_xy - sum_x * sum_y
+        variance = (n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+        r = covariance / np.sqrt(variance)
+    r[(n < min_pairs) | ~np.isfinite(r) | (sum_xx <= 1e-12) | (sum_yy <= 1e-12)] = np.nan
+    r = np.clip(r, -1.0, 1.0)
+
+    matrix = [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in r]
+    return matrix, n.astype(int).tolist()
+
+
+def _correlation_python(table: JoinedTable, fields: Sequence[str], min_pairs: int):
+    matrix, counts = [], []
+    for a in fields:
+        matrix_row, count_row = [], []
+        for b in fields:
+            pairs = [(x, y) for x, y in zip(table.columns[a], table.columns[b]) if x is not None and y is not None]
+            count_row.append(len(pairs))
+            if len(pairs) < min_pairs or len({x for x, _ in pairs}) == 1 or len({y for _, y in pairs}) == 1:
+                matrix_row.append(None)
+                continue
+            n = len(pairs)
+            mean_x = sum(x for x, _ in pairs) / n
+            mean_y = sum(y for _, y in pairs) / n
+            covariance = sum((x - mean_x) * (y - mean_y) for x, y in pairs)
+            variance = math.sqrt(sum((x - mean_x) ** 2 for x, _ in pairs) * sum((y - mean_y) ** 2 for _, y in pairs))
+            matrix_row.append(round(max(-1.0, min(1.0, covariance / variance)), 4) if variance else None)
+        matrix.append(matrix_row)
+        counts.append(count_row)
+    return matrix, counts
@@ -56,6 +56,24 @@ export const japanEnvironmentalAPI = {
 
   getEnvironmentalProblems() {
     return apiClient.get('/japan/environmental-problems')
+  },
+
+  // 全データセットのスナップショット（マニフェストは毎回再検証、本体はブラウザキャッシュから）
+  async getSnapshot() {
+    const manifest = await apiClient.get('/japan/snapshot/manifest')
+    const { url } = manifest.data.manifest
+    const bundle = await apiClient.get(url.replace(/^\/api/, ''))
+    return bundle.data
+  },
+
+  // 大気質データの更新を購読（戻り値の関数で購読を終了）
+  subscribeAirQuality(prefecture = 'Tokyo', onMeasurements) {
+    const url = `${API_BASE_URL}/japan/air-quality/stream?prefecture=${encodeURIComponent(prefecture)}`
+    const source = new EventSource(url)
+    const handler = (event) => onMeasurements(JSON.parse(event.data))
+    source.addEventListener('snapshot', handler)
+    source.addEventListener('measurements', handler)
+    return () => source.close()
   }
 }
 
@@ -0,0 +1,193 @@
+"""
+ロードバランサ向けのヘルスチェック（liveness / readiness）とウォームアップ
+Liveness only says whether the worker can serve at all; readiness also
+requires the startup warm-up (pre-populating the response cache for the
+default request of each dataset) to have finished and the admission
+queue to have room. The readiness report includes, per dataset, the age
+of the upstream data it is built from and of its response-cache entry,
+plus upstream source status (for the background-refreshed parameters
+only) and queue depth. Cache entries that expire after warm-up are
+recomputed on the next request and do not affect readiness
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 起動時のウォームアップ（0 で無効、すぐに ready になる）
+WARMUP_ENABLED = os.environ.get('JAPAN_ENV_WARMUP', '1') != '0'
+
+# 最終取得から refresh_interval のこの倍数を過ぎたデータソースは stale とする
+STALE_INTERVALS = 3
+
+
+class HealthMonitor:
+    """
+    ウォームアップの進行とワーカーの状態をまとめて返す
+    """
+
+    def __init__(self, scheduler, cache, admission, background: bool = True,
+                 inputs: Optional[Dict[str, Dict[str, Sequence[str]]]] = None):
+        self.scheduler = scheduler
+        self.cache = cache
+        self.admission = admission
+        # データセット名 -> {参照するデータ: 優先順のデータソース名}（データの経過時間の報告に使う）
+        self.inputs = inputs or {}
+        # バックグラウンド更新を開始したワーカーでは、更新スレッドの停止を liveness の失敗とする
+        self.background = background
+        self.started_at = time.time()
+        self._datasets: Dict[str, Hashable] = {}
+        self._warm_up = {'state': 'skipped', 'completed': 0, 'failed': [], 'seconds': None}
+        self._lock = threading.Lock()
+
+    def warm_up(self, tasks: Dict[str, Tuple[Hashable, Callable[[], None]]], background: bool = True):
+        """
+        データセット名 -> (キャッシュキー, キャッシュを埋める関数) を順に実行する
+        完了するまで readiness は 503 を返す
+        """
+        with self._lock:
+            self._datasets = {name: key for name, (key, _) in tasks.items()}
+            if not WARMUP_ENABLED:
+                return
+            self._warm_up = {'state': 'running', 'completed': 0, 'failed': [], 'seconds': None}
+
+        if background:
+            threading.Thread(target=self._run_warm_up, args=(tasks,), name='warm-up', daemon=True).start()
+        else:
+            self._run_warm_up(tasks)
+
+    def _run_warm_up(self, tasks: Dict[str, Tuple[Hashable, Callable[[], None]]]):
+        started = time.perf_counter()
+        for name, (_, task) in tasks.items():
+            try:
+                task()
+            except Exception as e:
+                # 失敗したデータセットは最初のリクエストで計算される（ready は妨げない）
+                logger.warning(f"Warm-up of {name} failed: {e}")
+                with self._lock:
+                    self._warm_up['failed'].append(name)
+                continue
+            with self._lock:
+                self._warm_up['completed'] += 1
+
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._warm_up['state'] = 'done'
+            self._warm_up['seconds'] = round(seconds, 3)
+        logger.info(f"Warm-up finished in {seconds:.2f}s ({len(tasks)} datasets)")
+
+    def liveness(self) -> Tuple[bool, Dict]:
+        """プロセスが応答でき、開始したバックグラウンド更新が止まっていないか"""
+        scheduler = 'running' if self.scheduler.running else 'stopped'
+        alive = self.scheduler.running or not self.background
+        return alive, {
+            'status': 'alive' if alive else 'dead',
+            'timestamp': datetime.now().isoformat(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'scheduler': scheduler
+        }
+
+    def readiness(self) -> Tuple[bool, Dict]:
+        """
+        トラフィックを受けられるか（ウォームアップ完了かつ受け付けの待ち行列に空きがある）
+        上流の障害はフォールバックで応答できるため degraded として報告だけする
+        """
+        with self._lock:
+            warm_up = dict(self._warm_up, failed=list(self._warm_up['failed']))
+            datasets = dict(self._datasets)
+
+        admission = self.admission.stats()
+        upstream = self._upstream()
+        warming = warm_up['state'] == 'running'
+        saturated = admission['waiting'] >= admission['max_queue']
+        ready = not warming and not saturated
+
+        if warming:
+            status = 'starting'
+        elif saturated:
+            status = 'overloaded'
+        elif any(source['status'] in ('failing', 'stale') for source in upstream.values()):
+            status = 'degraded'
+        else:
+            status = 'healthy'
+
+        dataset_status = {}
+        for name, key in datasets.items():
+            info = self.cache.info(key) or {}
+            dataset_status[name] = {
+                'warm': bool(info.get('fresh')),
+                'cache_age_seconds': info.get('age_seconds'),
+                'cache_expires_in': info.get('expires_in'),
+                **self._data_age(self.inputs.get(name, {}), upstream)
+            }
+        warm = sum(1 for state in dataset_status.values() if state['warm'])
+
+        return ready, {
+            'status': status,
+            'ready': ready,
+            'timestamp': datetime.now().isoformat(),
+            # ウォームアップで1つ以上のデータセットを計算できたか（完了前・無効時は None）
+            'japan_data_available': warm_up['completed'] > 0 if warm_up['state'] == 'done' else None,
+            'warm_up': warm_up,
+            'datasets': dataset_status,
+            # ウォームアップ後に期限切れになったキャッシュは次のリクエストで計算し直すため ready には影響しない
+            'cache': dict(self.cache.stats(), warm_datasets=warm, datasets=len(dataset_status),
+                          cold_datasets_affect_readiness=False),
+            'upstream': upstream,
+            'queue': {
+                'admission_active': admission['active'],
+                'admission_waiting': admission['waiting'],
+                'admission_max_queue': admission['max_queue'],
+                'upstream_refreshing': sum(source['refreshing'] for source in upstream.values())
+            }
+        }
+
+    @staticmethod
+    def _data_age(inputs: Dict[str, Sequence[str]], upstream: Dict[str, Dict]) -> Dict:
+        """
+        参照するデータごとに使われるデータソース（取得済みの最初のもの、無ければ None =
+        ローカルストアまたは内蔵データ）と、その中で最も古いデータの最終取得からの経過時間
+        """
+        sources, ages = {}, []
+        for dataset, names in inputs.items():
+            used = next((name for name in names
+                         if name in upstream and upstream[name]['data_age_seconds'] is not None), None)
+            sources[dataset] = used
+            if used is not None:
+                ages.append(upstream[used]['data_age_seconds'])
+        return {'data_age_seconds': max(ages, default=None), 'data_sources': sources}
+
+    def _upstream(self) -> Dict[str, Dict]:
+        """
+        データソースごとの状態（ok / failing / stale / pending）と最終取得からの経過時間
+        バックグラウンド更新の対象の条件だけを見る（リクエストごとの条件の失敗や古い結果は含めない）
+        """
+        result = {}
+        for name, status in self.scheduler.status().items():
+            results = [entry for entry in status['results'].values() if entry['scheduled']]
+            errors = [entry['error'] for entry in results if entry['error']]
+            age = max((entry['age_seconds'] for entry in results), default=None)
+            # 最後に成功した取得からの経過時間（失敗した取得は以前のデータの鮮度を変えない）
+            data_age = max((entry['data_age_seconds'] for entry in results
+                            if entry['rows'] and entry['data_age_seconds'] is not None), default=None)
+            if not results:
+                state = 'pending'
+            elif errors:
+                state = 'failing'
+            elif age > status['refresh_interval'] * STALE_INTERVALS:
+                state = 'stale'
+            else:
+                state = 'ok'
+            result[name] = {
+                'status': state,
+                'age_seconds': age,
+                'data_age_seconds': data_age,
+                'error': errors[0] if errors else None,
+                'refreshing': sum(1 for entry in results if entry['refreshing'])
+            }
+        return result
@@ -0,0 +1,166 @@
+"""
+大気質データのライブ配信（Server-Sent Events）
+Fans out new or changed air-quality measurements per prefecture to many
+subscribers from a single upstream fetch
+"""
+
+from typing import Dict, Iterator, List, Optional
+import itertools
+import logging
+import queue
+import threading
+import time
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+# 最後に受け取ってから poll_interval のこの倍数を過ぎた測定値は最新値から外す
+RETENTION_POLLS = 5
+
+
+class Subscription:
+    """1つの購読（配信待ちの測定値キュー）"""
+
+    def __init__(self, prefecture: str, maxsize: int):
+        self.prefecture = prefecture
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event: Dict):
+        # 遅い購読者のために配信側を止めない（古いイベントから捨てる）
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class AirQualityBroadcaster:
+    """
+    都道府県ごとに1つの取得ループを持ち、前回から新しく増えた・変わった測定値だけを
+    その都道府県の全購読者に配信する
+    """
+
+    def __init__(self, fetcher, poll_interval: float = 60.0, queue_size: int = 100,
+                 retention: Optional[float] = None):
+        self.fetcher = fetcher
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.retention = retention if retention is not None else poll_interval * RETENTION_POLLS
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        # 都道府県 -> (観測地点, 項目) -> (最後に受け取った時刻, 測定値)
+        self._latest: Dict[str, Dict[tuple, tuple]] = {}
+        self._pollers: Dict[str, threading.Event] = {}
+        self._sequence = itertools.count(1)
+
+        # データソースの更新を受け取ったら即座に配信する
+        fetcher.scheduler.add_listener(self._on_source_fetched)
+
+    @staticmethod
+    def _key(row: Dict) -> tuple:
+        # 観測局（不明なら地点）・項目ごとに最新の1件だけを保持する（日時が変われば差分として配信）
+        return (row.get('station_id') or row.get('station') or row.get('location'), row.get('parameter'))
+
+    def subscribe(self, prefecture: str) -> Subscription:
+        subscription = Subscription(prefecture, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(prefecture, []).append(subscription)
+            if prefecture not in self._pollers:
+                stop = threading.Event()
+                self._pollers[prefecture] = stop
+                threading.Thread(
+                    target=self._poll, args=(prefecture, stop), name=f"live-feed-{prefecture}", daemon=True
+                ).start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.prefecture, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                # 購読者がいなくなった都道府県は取得ループを止める
+                self._subscribers.pop(subscription.prefecture, None)
+                self._latest.pop(subscription.prefecture, None)
+                stop = self._pollers.pop(subscription.prefecture, None)
+                if stop is not None:
+                    stop.set()
+
+    def snapshot(self, prefecture: str) -> List[Dict]:
+        with self._lock:
+            return [row for _, row in self._latest.get(prefecture, {}).values()]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, prefecture: str, rows: List[Dict]) -> List[Dict]:
+        """
+        前回からの差分を購読者に配信し、配信した測定値を返す
+        """
+        with self._lock:
+            if prefecture not in self._subscribers:
+                return []
+            latest = self._latest.setdefault(prefecture, {})
+            now = time.monotonic()
+            changed = []
+            for row in rows:
+                key = self._key(row)
+                previous = latest.get(key)
+                if previous is not None and str(row.get('date') or '') < str(previous[1].get('date') or ''):
+                    # 同じ地点・項目の古い測定値（取得結果は新しい順）は配信済みとみなす
+                    latest[key] = (now, previous[1])
+                    continue
+                if previous is None or previous[1] != row:
+                    changed.append(row)
+                latest[key] = (now, row)
+            # 上流から消えた地点・項目は接続時のスナップショットに含めない
+            for key in [key for key, (seen, _) in latest.items() if now - seen > self.retention]:
+                del latest[key]
+            subscribers = list(self._subscribers[prefecture])
+
+        if changed:
+            event = {'id': next(self._sequence), 'prefecture': prefecture, 'data': changed}
+            for subscription in subscribers:
+                subscription.put(event)
+        return changed
+
+    def _poll(self, prefecture: str, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                self.publish(prefecture, self.fetcher.get_air_quality_data(prefecture))
+            except Exception as e:
+                logger.error(f"Live feed poll failed for {prefecture}: {e}")
+            stop.wait(self.poll_interval)
+
+    def _on_source_fetched(self, name: str, params: Dict, rows: List[Dict]):
+        if name == 'openaq' and params.get('location'):
+            self.publish(params['location'], rows)
+
+    def stream(self, prefecture: str, heartbeat: float = 15.0, serializer=None) -> Iterator[str]:
+        """
+        都道府県の購読をServer-Sent Events形式の文字列として逐次返す
+        購読と取得ループは本文を読み始めた時点で開始する（HEAD など本文を読まない応答では開始しない）
+        """
+        dumps = serializer or serialization.dumps_str
+        subscription = self.subscribe(prefecture)
+        try:
+            snapshot = self.snapshot(subscription.prefecture)
+            if snapshot:
+                yield f"event: snapshot\ndata: {dumps(snapshot)}\n\n"
+            while True:
+                try:
+                    event = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: measurements\ndata: {dumps(event['data'])}\n\n"
+        finally:
+            self.unsubscribe(subscription)
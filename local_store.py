@@ -0,0 +1,254 @@
+"""
+取り込んだ環境統計データのローカルストア（SQLite）
+Local SQLite store for ingested environmental statistics
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'japan_environment.db')
+
+SCHEMA = {
+    'energy_mix': """
+        CREATE TABLE IF NOT EXISTS energy_mix (
+            year INTEGER NOT NULL,
+            energy_source TEXT NOT NULL,
+            category TEXT NOT NULL,
+            generation_twh REAL NOT NULL,
+            co2_factor REAL NOT NULL,
+            PRIMARY KEY (year, energy_source)
+        )
+    """,
+    'pollution_baseline': """
+        CREATE TABLE IF NOT EXISTS pollution_baseline (
+            year INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            industrial_index REAL NOT NULL,
+            population INTEGER NOT NULL,
+            PRIMARY KEY (year, location)
+        )
+    """,
+    'stations': """
+        CREATE TABLE IF NOT EXISTS stations (
+            station_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            city TEXT,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            source TEXT
+        )
+    """,
+    'climate_history': """
+        CREATE TABLE IF NOT EXISTS climate_history (
+            date TEXT NOT NULL,
+            location TEXT NOT NULL,
+            temperature_anomaly REAL,
+            average_temperature REAL,
+            precipitation_change REAL,
+            source TEXT,
+            PRIMARY KEY (date, location)
+        )
+    """,
+    'measurements': """
+        CREATE TABLE IF NOT EXISTS measurements (
+            date TEXT NOT NULL,
+            location TEXT NOT NULL,
+            parameter TEXT NOT NULL,
+            value REAL NOT NULL,
+            unit TEXT,
+            source TEXT,
+            quality TEXT,
+            station TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_measurements_date ON measurements (date);
+        CREATE INDEX IF NOT EXISTS idx_measurements_parameter ON measurements (parameter, date);
+    """
+}
+
+# 既存のストアに後から追加した列（テーブル -> [(列名, 定義)]、列が無い場合だけ追加する）
+COLUMN_MIGRATIONS = {
+    'measurements': [
+        ('quality', 'TEXT'),
+        ('station', "TEXT NOT NULL DEFAULT ''")
+    ]
+}
+
+# 後から追加した列を使うインデックス（列の追加後に作り、定義が変わっていれば作り直す）
+# 同じ都市の複数の観測局の測定値を区別するため、一意キーに観測局を含める
+INDEXES = {
+    'idx_measurements_location': (
+        "CREATE UNIQUE INDEX idx_measurements_location ON measurements (location, parameter, date, station)",
+        ['location', 'parameter', 'date', 'station']
+    ),
+    'idx_measurements_station': (
+        "CREATE INDEX idx_measurements_station ON measurements (station, parameter, date)",
+        ['station', 'parameter', 'date']
+    )
+}
+
+MEASUREMENT_COLUMNS = ['date', 'location', 'parameter', 'value', 'unit', 'source', 'quality', 'station']
+CLIMATE_COLUMNS = ['date', 'location', 'temperature_anomaly', 'average_temperature', 'precipitation_change', 'source']
+
+# マイグレーションを適用済みのストア（接続ごとではなくプロセスごとに1回だけ確認する）
+_migrated = set()
+_migration_lock = threading.Lock()
+
+
+class LocalStore:
+    """SQLiteによるローカルストア（スレッドごとに接続を保持）"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get('JAPAN_ENV_STORE', DEFAULT_STORE_PATH)
+        self._local = threading.local()
+
+    def exists(self) -> bool:
+        return self.path == ':memory:' or os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with _migration_lock:
+                if self.path == ':memory:' or self.path not in _migrated:
+                    for statement in SCHEMA.values():
+                        conn.executescript(statement)
+                    self._migrate(conn)
+                    conn.commit()
+                    _migrated.add(self.path)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """
+        既存のストアに不足している列とインデックスを追加する
+        列の有無は PRAGMA table_info で確認し、失敗（ロック中など）はそのまま例外にする
+        """
+        for table, columns in COLUMN_MIGRATIONS.items():
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for name, definition in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+        for name, (statement, columns) in INDEXES.items():
+            existing = [row[2] for row in conn.execute(f"PRAGMA index_info({name})")]
+            if existing == columns:
+                continue
+            if existing:
+                conn.execute(f"DROP INDEX {name}")
+            conn.execute(statement)
+
+    def insert_many(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+        """
+        行をまとめて書き込み（主キーが重複する行は置き換え）
+        """
+        if table not in SCHEMA:
+            raise ValueError(f"unknown table: {table}")
+
+        conn = self._connect()
+        placeholders = ', '.join('?' for _ in columns)
+        sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        with conn:
+            cursor = conn.executemany(sql, rows)
+        return cursor.rowcount
+
+    def query(self, sql: str, params: Sequence = ()) -> List[Dict]:
+        # 未作成のストアを読み取りのためだけに作らない
+        if not self.exists():
+            return []
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def latest_energy_mix(self) -> List[Dict]:
+        """
+        最新年度のエネルギー構成（電源区分ごとの発電量・構成比・加重平均排出係数）
+        """
+        return self.query("""
+            SELECT year, category AS energy_source,
+                   SUM(generation_twh) AS generation_twh,
+                   SUM(generation_twh * co2_factor) / SUM(generation_twh) AS co2_factor,
+                   SUM(generation_twh) * 100.0 / (
+                       SELECT SUM(generation_twh) FROM energy_mix
+                       WHERE year = (SELECT MAX(year) FROM energy_mix)
+                   ) AS generation_percentage
+            FROM energy_mix
+            WHERE year = (SELECT MAX(year) FROM energy_mix)
+            GROUP BY year, category
+            HAVING SUM(generation_twh) > 0
+            ORDER BY generation_twh DESC
+        """)
+
+    def latest_pollution_baseline(self) -> List[Dict]:
+        """
+        最新年度の地域別汚染ベースライン（工業指数と人口）
+        """
+        return self.query("""
+            SELECT year, location, industrial_index, population
+            FROM pollution_baseline
+            WHERE year = (SELECT MAX(year) FROM pollution_baseline)
+            ORDER BY location
+        """)
+
+    def stations(self) -> List[Dict]:
+        """
+        取り込み済みの観測局メタデータ
+        """
+        return self.query("""
+            SELECT station_id, name, city, latitude, longitude, source
+            FROM stations
+        """)
+
+    def insert_measurements(self, rows: List[Dict]) -> int:
+        """
+        大気質の測定値を履歴として保存（観測局が不明な行は station を空文字にする）
+        """
+        return self.insert_many('measurements', MEASUREMENT_COLUMNS, [
+            tuple(row.get(column) for column in MEASUREMENT_COLUMNS[:-1]) + (row.get('station') or '',)
+            for row in rows
+        ])
+
+    def insert_climate(self, rows: List[Dict]) -> int:
+        """
+        気候データを日付・地域ごとの履歴として保存
+        """
+        return self.insert_many('climate_history', CLIMATE_COLUMNS, [
+            tuple(row.get(column) for column in CLIMATE_COLUMNS) for row in rows
+        ])
+
+    def query_measurements(self, where: Sequence[str], params: Sequence, index: Optional[str] = None,
+                           limit: Optional[int] = None) -> List[Dict]:
+        """
+        条件をSQLに渡して測定値を新しい順に検索（index を指定するとそのインデックスを使う）
+        """
+        indexed_by = f" INDEXED BY {index}" if index else ''
+        clause = f" WHERE {' AND '.join(where)}" if where else ''
+        limit_clause = f" LIMIT {int(limit)}" if limit is not None else ''
+        return self.query(
+            f"SELECT {', '.join(MEASUREMENT_COLUMNS)} FROM measurements{indexed_by}{clause} "
+            f"ORDER BY date DESC{limit_clause}",
+            params
+        )
+
+    def recent_measurements(self, station: str, parameter: str, before: str, limit: int) -> List[Dict]:
+        """
+        観測局・項目ごとの before より前の直近の測定値（外れ値と判定されたものを除く）
+        """
+        return self.query_measurements(
+            ['station = ?', 'parameter = ?', 'date < ?', "(quality IS NULL OR quality != 'outlier')"],
+            [station, parameter, before], 'idx_measurements_station', limit
+        )
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,67 @@
+"""
+CPUを使う計算の共有プロセスプール
+A single process pool shared by the scenario simulation and the
+uncertainty bands. Its size is fixed on the server side and the workers
+are started with the 'spawn' method, because forking the threaded Flask
+process can copy a lock held by another thread (scheduler, sqlite) into
+the child and deadlock it
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, List, Optional
+import logging
+import multiprocessing
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# プロセス数（1以下でプールを使わず呼び出し元のプロセスで計算する）
+POOL_WORKERS = int(os.environ.get('JAPAN_ENV_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def size() -> int:
+    """分割の上限として使うプロセス数"""
+    return max(POOL_WORKERS, 1)
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if POOL_WORKERS <= 1:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def map_jobs(fn: Callable, jobs: Iterable) -> List:
+    """
+    jobs をプールで並列に処理する（プールが無効・停止した場合はこのプロセスで順に処理）
+    fn はモジュールの最上位で定義した関数に限る（spawn で子プロセスに渡すため）
+    """
+    global _pool
+    jobs = list(jobs)
+    pool = _get_pool() if len(jobs) > 1 else None
+    if pool is not None:
+        try:
+            return list(pool.map(fn, jobs))
+        except BrokenProcessPool as e:
+            logger.error(f"Process pool failed, running in-process: {e}")
+            with _lock:
+                if _pool is pool:
+                    _pool = None
+    return [fn(job) for job in jobs]
+
+
+def shutdown():
+    """プールを停止（次の呼び出しで作り直す）"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
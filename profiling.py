@@ -0,0 +1,168 @@
+"""
+リクエスト単位のプロファイリング（区間の内訳と遅いリクエストの記録）
+Opt-in per-request span breakdown; a request is profiled when it carries the
+X-Profile header or is picked by the sample rate, and the slowest profiles
+are kept for the admin endpoint. Without an active profile, span() and
+@profiled cost one context-variable lookup
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+PROFILE_HEADER = 'X-Profile'
+DEFAULT_SAMPLE_RATE = float(os.environ.get('JAPAN_ENV_PROFILE_SAMPLE_RATE', '0'))
+DEFAULT_KEEP = 20
+
+_current: ContextVar[Optional['Profile']] = ContextVar('profile', default=None)
+
+
+class _NoSpan:
+    """プロファイル無効時の何もしないコンテキスト"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Profile:
+    """1リクエストの区間の記録"""
+
+    def __init__(self, request_id: int, route: str):
+        self.id = request_id
+        self.route = route
+        self.started_at = datetime.now().isoformat()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.status = None
+        self.spans: List[Dict] = []
+        self._depth = 0
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        record = {'name': name, 'depth': self._depth, 'start_ms': round((start - self.started) * 1000, 3)}
+        self.spans.append(record)
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    def breakdown(self) -> Dict[str, float]:
+        """区間名ごとの合計時間（入れ子の区間は親にも含まれる）"""
+        totals: Dict[str, float] = {}
+        for record in self.spans:
+            totals[record['name']] = round(totals.get(record['name'], 0.0) + record.get('duration_ms', 0.0), 3)
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダーの値（最上位の区間のみ）"""
+        return ', '.join(
+            f"{record['name'].replace(' ', '_')};dur={record.get('duration_ms', 0.0)}"
+            for record in self.spans if record['depth'] == 0
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'route': self.route,
+            'status': self.status,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 3),
+            'breakdown': self.breakdown(),
+            'spans': self.spans
+        }
+
+
+def span(name: str):
+    """
+    現在のリクエストがプロファイル中なら区間を記録する
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NO_SPAN
+    return profile.span(name)
+
+
+def profiled(name: Optional[str] = None):
+    """関数の呼び出しを区間として記録するデコレータ"""
+
+    def decorator(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            with profile.span(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Profiler:
+    """
+    プロファイル対象の判定と、遅いリクエスト上位 keep 件の保持
+    """
+
+    def __init__(self, sample_rate: float = DEFAULT_SAMPLE_RATE, keep: int = DEFAULT_KEEP):
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._slowest: List[tuple] = []  # (duration, id, Profile) の最小ヒープ
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.profiled = 0
+
+    def should_profile(self, headers) -> bool:
+        if headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes'):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, route: str):
+        """プロファイルを開始し、finish() に渡すトークンを返す"""
+        profile = Profile(next(self._ids), route)
+        return profile, _current.set(profile)
+
+    def finish(self, token, status: Optional[int] = None) -> Profile:
+        profile, context_token = token
+        _current.reset(context_token)
+        profile.duration = time.perf_counter() - profile.started
+        profile.status = status
+
+        with self._lock:
+            self.profiled += 1
+            entry = (profile.duration, profile.id, profile)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif profile.duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+        return profile
+
+    def slowest(self) -> List[Dict]:
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [profile.to_dict() for _, _, profile in entries]
+
+    def clear(self):
+        with self._lock:
+            self._slowest = []
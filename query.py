@@ -0,0 +1,345 @@
+"""
+データセット横断のクエリレイヤー
+Combined location / date range / parameter / threshold filters across
+datasets; the most selective index is chosen first and the remaining
+predicates are pushed down into storage
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+from records import (
+    CATEGORY, AIR_QUALITY_SCHEMA, BIODIVERSITY_SCHEMA, CLIMATE_SCHEMA, ENERGY_SCHEMA, POLLUTION_SCHEMA
+)
+
+# データセットごとの列の対応（地域列・項目列・既定の数値列）
+DATASET_FIELDS = {
+    'air-quality': {'location': 'location', 'parameter': 'parameter', 'value': 'value'},
+    'climate': {'location': 'location', 'parameter': None, 'value': 'temperature_anomaly'},
+    'pollution': {'location': 'location', 'parameter': None, 'value': 'industrial_emissions'},
+    'biodiversity': {'location': 'region', 'parameter': None, 'value': 'forest_coverage_percent'},
+    'energy-emissions': {'location': None, 'parameter': 'energy_source', 'value': 'co2_emissions_mt'}
+}
+
+# しきい値で比較できる数値列
+NUMERIC_FIELDS = {
+    dataset: tuple(name for name, kind in schema if kind != CATEGORY)
+    for dataset, schema in [
+        ('air-quality', AIR_QUALITY_SCHEMA), ('climate', CLIMATE_SCHEMA), ('pollution', POLLUTION_SCHEMA),
+        ('biodiversity', BIODIVERSITY_SCHEMA), ('energy-emissions', ENERGY_SCHEMA)
+    ]
+}
+
+COMPARISONS = {'value_gt': '>', 'value_gte': '>=', 'value_lt': '<', 'value_lte': '<='}
+
+# ストア統計とメモリ上のインデックスの有効期間（秒）
+STATISTICS_TTL = 600
+MEMORY_INDEX_TTL = 60
+
+# メモリ上のインデックスの保持数（地域はリクエスト由来のため古いものから破棄する）
+MEMORY_INDEX_CACHE_SIZE = 64
+
+# 1回のクエリで返す最大行数（ストアの検索にはSQLの LIMIT として渡す）
+QUERY_MAX_ROWS = 10_000
+
+
+class QueryFilter:
+    """クエリ条件"""
+
+    __slots__ = ('dataset', 'location', 'parameter', 'date_from', 'date_to', 'field', 'comparisons')
+
+    def __init__(self, dataset: str = 'air-quality', location: Optional[str] = None,
+                 parameter: Optional[str] = None, date_from: Optional[str] = None,
+                 date_to: Optional[str] = None, field: Optional[str] = None, **comparisons):
+        if dataset not in DATASET_FIELDS:
+            raise ValueError(f"unknown dataset: {dataset} (available: {', '.join(DATASET_FIELDS)})")
+        fields = DATASET_FIELDS[dataset]
+        if location and fields['location'] is None:
+            raise ValueError(f"{dataset} has no location column")
+        if parameter and fields['parameter'] is None:
+            raise ValueError(f"{dataset} has no parameter column")
+
+        self.dataset = dataset
+        self.location = location
+        self.parameter = parameter
+        self.date_from = date_from
+        self.date_to = _date_upper_bound(date_to) if date_to else None
+        self.field = field or fields['value']
+        if self.field not in NUMERIC_FIELDS[dataset]:
+            raise ValueError(f"field must be a numeric column of {dataset} "
+                             f"(available: {', '.join(NUMERIC_FIELDS[dataset])})")
+        self.comparisons = [(COMPARISONS[key], float(value)) for key, value in comparisons.items()
+                            if key in COMPARISONS and value is not None]
+
+
+def _date_upper_bound(value: str) -> str:
+    """
+    日付のみの上限は翌日0時未満として扱う（'2024-01-31' は同日中の時刻を含む）
+    """
+    if len(value) == 10:
+        return (datetime.strptime(value, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    return value + '￿'
+
+
+def _matches_value(value, comparisons) -> bool:
+    if value is None:
+        return False
+    for op, threshold in comparisons:
+        if op == '>' and not value > threshold:
+            return False
+        if op == '>=' and not value >= threshold:
+            return False
+        if op == '<' and not value < threshold:
+            return False
+        if op == '<=' and not value <= threshold:
+            return False
+    return True
+
+
+def _same_parameter(a, b) -> bool:
+    return str(a or '').lower().replace('.', '') == str(b or '').lower().replace('.', '')
+
+
+class MemoryIndex:
+    """
+    メモリ上のデータセットの索引（地域・項目のハッシュ索引と日付のソート済み索引）
+    """
+
+    def __init__(self, rows: List[Dict], fields: Dict):
+        self.rows = rows
+        self.by_location: Dict[str, List[int]] = {}
+        self.by_parameter: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            if fields['location']:
+                self.by_location.setdefault(row.get(fields['location']), []).append(i)
+            if fields['parameter']:
+                key = str(row.get(fields['parameter']) or '').lower().replace('.', '')
+                self.by_parameter.setdefault(key, []).append(i)
+        order = sorted(range(len(rows)), key=lambda i: str(rows[i].get('date', '')))
+        self.dates = [str(rows[i].get('date', '')) for i in order]
+        self.date_order = order
+
+    def candidates(self, query: QueryFilter) -> Tuple[str, List[int]]:
+        """
+        各索引の候補数を比べ、最も少ない索引の候補行を返す
+        """
+        options = [('scan', len(self.rows), None)]
+        if query.location:
+            ids = self.by_location.get(query.location, [])
+            options.append(('location', len(ids), ids))
+        if query.parameter:
+            ids = self.by_parameter.get(query.parameter.lower().replace('.', ''), [])
+            options.append(('parameter', len(ids), ids))
+        if query.date_from or query.date_to:
+            lo = bisect_left(self.dates, query.date_from) if query.date_from else 0
+            hi = bisect_left(self.dates, query.date_to) if query.date_to else len(self.dates)
+            options.append(('date', max(hi - lo, 0), None if hi <= lo else (lo, hi)))
+
+        name, _, ids = min(options, key=lambda option: option[1])
+        if name == 'scan':
+            return name, list(range(len(self.rows)))
+        if name == 'date':
+            return name, [] if ids is None else self.date_order[ids[0]:ids[1]]
+        return name, ids
+
+
+class StoreStatistics:
+    """ストアの測定値の分布（地域別・項目別・日別の件数）"""
+
+    def __init__(self, store):
+        self.store = store
+        self.location_counts: Dict[str, int] = {}
+        self.parameter_counts: Dict[str, int] = {}
+        self.day_counts: Dict[str, int] = {}
+        self.days: List[str] = []
+        self.day_prefix: List[int] = [0]
+        self.total = 0
+        self.loaded_at = 0.0
+
+    def refresh(self):
+        self.location_counts = {
+            row['location']: row['n']
+            for row in self.store.query('SELECT location, COUNT(*) AS n FROM measurements GROUP BY location')
+        }
+        self.parameter_counts = {
+            row['parameter']: row['n']
+            for row in self.store.query('SELECT parameter, COUNT(*) AS n FROM measurements GROUP BY parameter')
+        }
+        self.day_counts = {
+            row['day']: row['n']
+            for row in self.store.query('SELECT substr(date, 1, 10) AS day, COUNT(*) AS n FROM measurements GROUP BY day')
+        }
+        self._index_days()
+        self.loaded_at = time.monotonic()
+
+    def add(self, rows: List[Dict]):
+        """
+        保存した行を件数に加える（全体の再集計は STATISTICS_TTL ごと）
+        同じ測定値の置き換えも数えるため件数は多めになるが、索引の選択に使う推定値なので許容する
+        """
+        if not self.loaded_at:
+            return
+        for row in rows:
+            location, parameter, day = row.get('location'), row.get('parameter'), str(row.get('date') or '')[:10]
+            self.location_counts[location] = self.location_counts.get(location, 0) + 1
+            self.parameter_counts[parameter] = self.parameter_counts.get(parameter, 0) + 1
+            self.day_counts[day] = self.day_counts.get(day, 0) + 1
+        self._index_days()
+
+    def _index_days(self):
+        self.days = sorted(self.day_counts)
+        self.day_prefix = [0]
+        for day in self.days:
+            self.day_prefix.append(self.day_prefix[-1] + self.day_counts[day])
+        self.total = self.day_prefix[-1]
+
+    def estimate(self, query: QueryFilter) -> List[Tuple[str, int]]:
+        """索引ごとの推定行数"""
+        estimates = []
+        if query.location:
+            estimates.append(('idx_measurements_location', self.location_counts.get(query.location, 0)))
+        if query.parameter:
+            count = sum(n for name, n in self.parameter_counts.items() if _same_parameter(name, query.parameter))
+            estimates.append(('idx_measurements_parameter', count))
+        if query.date_from or query.date_to:
+            lo = bisect_left(self.days, query.date_from[:10]) if query.date_from else 0
+            hi = bisect_left(self.days, query.date_to[:10]) if query.date_to else len(self.days)
+            estimates.append(('idx_measurements_date', self.day_prefix[max(hi, lo)] - self.day_prefix[lo]))
+        return estimates
+
+
+class QueryPlanner:
+    """クエリを最も選択性の高い索引から実行する"""
+
+    def __init__(self, fetcher, default_locations: Optional[List[str]] = None):
+        self.fetcher = fetcher
+        self.default_locations = default_locations or []
+        self._statistics = StoreStatistics(fetcher.store)
+        self._indexes: "OrderedDict[tuple, Tuple[float, MemoryIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_inserted(self, rows: List[Dict]):
+        """ストアに保存した行を統計に反映する（テーブルは再集計しない）"""
+        with self._lock:
+            self._statistics.add(rows)
+
+    def run(self, query: QueryFilter, limit: int = QUERY_MAX_ROWS) -> Tuple[List[Dict], Dict]:
+        """
+        クエリを実行し、新しい順に最大 limit 行と実行計画を (行, 実行計画) で返す
+        """
+        started = time.perf_counter()
+        plan = {'dataset': query.dataset, 'steps': []}
+        rows = self._run_memory(query, plan)
+
+        if query.dataset == 'air-quality':
+            # メモリ上の行と重複して除かれる分だけ多く取得すれば、結合後の上位 limit 行が揃う
+            stored = self._run_store(query, plan, limit + len(rows))
+            # 同じ測定値はメモリ上（最新）のものを優先
+            seen = {(row.get('location'), row.get('parameter'), row.get('date'), row.get('station') or '')
+                    for row in rows}
+            rows.extend(row for row in stored
+                        if (row['location'], row['parameter'], row['date'], row['station']) not in seen)
+
+        rows.sort(key=lambda row: str(row.get('date', '')), reverse=True)
+        plan['truncated'] = len(rows) > limit
+        rows = rows[:limit]
+        plan['rows'] = len(rows)
+        plan['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return rows, plan
+
+    def _memory_rows(self, query: QueryFilter) -> List[Dict]:
+        if query.dataset == 'air-quality':
+            locations = [query.location] if query.location else self.default_locations
+            rows = []
+            for location in locations:
+                rows.extend(self.fetcher.get_air_quality_data(location))
+            return rows
+        method = {
+            'climate': self.fetcher.get_climate_data,
+            'pollution': self.fetcher.get_pollution_data,
+            'biodiversity': self.fetcher.get_biodiversity_data,
+            'energy-emissions': self.fetcher.get_energy_emissions_data
+        }[query.dataset]
+        return method()
+
+    def _memory_index(self, query: QueryFilter) -> MemoryIndex:
+        key = (query.dataset, query.location if query.dataset == 'air-quality' else None)
+        with self._lock:
+            entry = self._indexes.get(key)
+            if entry is not None and time.monotonic() - entry[0] < MEMORY_INDEX_TTL:
+                self._indexes.move_to_end(key)
+                return entry[1]
+
+        index = MemoryIndex(self._memory_rows(query), DATASET_FIELDS[query.dataset])
+        with self._lock:
+            self._indexes[key] = (time.monotonic(), index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > MEMORY_INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _run_memory(self, query: QueryFilter, plan: Dict) -> List[Dict]:
+        index = self._memory_index(query)
+        fields = DATASET_FIELDS[query.dataset]
+        access, candidates = index.candidates(query)
+
+        rows = []
+        for i in candidates:
+            row = index.rows[i]
+            if query.location and row.get(fields['location']) != query.location:
+                continue
+            if query.parameter and not _same_parameter(row.get(fields['parameter']), query.parameter):
+                continue
+            date = str(row.get('date', ''))
+            if (query.date_from and date < query.date_from) or (query.date_to and date >= query.date_to):
+                continue
+            if query.comparisons and not _matches_value(row.get(query.field), query.comparisons):
+                continue
+            rows.append(dict(row))
+
+        plan['steps'].append({'source': 'memory', 'index': access, 'candidates': len(candidates), 'rows': len(rows)})
+        return rows
+
+    def _run_store(self, query: QueryFilter, plan: Dict, limit: int) -> List[Dict]:
+        if not self.fetcher.store.exists():
+            return []
+
+        with self._lock:
+            if time.monotonic() - self._statistics.loaded_at > STATISTICS_TTL:
+                self._statistics.refresh()
+            estimates = self._statistics.estimate(query)
+            total = self._statistics.total
+            parameter_names = list(self._statistics.parameter_counts)
+
+        # 全条件をSQLに押し下げる
+        where, params = [], []
+        if query.location:
+            where.append('location = ?')
+            params.append(query.location)
+        if query.parameter:
+            # 表記ゆれ（'PM2.5' と 'pm25'）はストア上の表記に展開してインデックスを使う
+            variants = sorted({name for name in parameter_names if _same_parameter(name, query.parameter)}
+                              | {query.parameter})
+            where.append(f"parameter IN ({', '.join('?' for _ in variants)})")
+            params.extend(variants)
+        if query.date_from:
+            where.append('date >= ?')
+            params.append(query.date_from)
+        if query.date_to:
+            where.append('date < ?')
+            params.append(query.date_to)
+        for op, threshold in query.comparisons:
+            where.append(f"value {op} ?")
+            params.append(threshold)
+
+        index, estimated = min(estimates, key=lambda e: e[1]) if estimates else (None, total)
+        rows = self.fetcher.store.query_measurements(where, params, index, limit)
+        plan['steps'].append({
+            'source': 'store', 'index': index or 'scan', 'estimated_rows': estimated,
+            'table_rows': total, 'pushed_down': where, 'limit': limit, 'rows': len(rows)
+        })
+        return rows
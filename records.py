@@ -0,0 +1,178 @@
+"""
+環境データのコンパクトなレコード型（列指向バッチ）
+Struct-of-arrays record batches with dictionary-encoded categorical strings
+(one dictionary per batch), used in place of per-row dicts; rows are
+materialized as dicts only at the API edge
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import math
+import numbers
+import threading
+
+# 列の種類
+CATEGORY = 'category'  # 繰り返しの多い文字列（地域・物質名・単位・出典・日付）
+FLOAT = 'float'
+INT = 'int'
+NUMBER = 'number'  # 整数と小数が混在する数値（元の型のまま返す）
+
+_INT_MISSING = -(2 ** 63)
+_FLOAT_MISSING = float('nan')
+
+
+class StringPool:
+    """
+    カテゴリ文字列の辞書
+    同じ文字列は1つのオブジェクトに集約し、列には整数コードだけを持たせる
+    リクエスト由来の文字列も入るため、プロセス全体では共有せずバッチと同じ寿命にする
+    """
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._strings: List[Optional[str]] = [None]  # コード0は欠損値
+        self._lock = threading.Lock()
+
+    def encode(self, value) -> int:
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    value = str(value)
+                    code = len(self._strings)
+                    self._strings.append(value)
+                    self._codes[value] = code
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        return self._strings[code]
+
+    def __len__(self) -> int:
+        return len(self._strings) - 1
+
+
+class RecordBatch:
+    """
+    列指向のレコードバッチ
+    数値列は array、カテゴリ列はバッチごとの StringPool のコードの array で保持する
+    NUMBER 列は値が整数だったかどうかを別の array に記録する
+    """
+
+    __slots__ = ('schema', 'strings', '_columns', '_integral', '_length')
+
+    def __init__(self, schema: Sequence[Tuple[str, str]], rows: Iterable[Dict] = ()):
+        self.schema = tuple(schema)
+        self.strings = StringPool()
+        self._columns = {
+            name: array('I') if kind == CATEGORY else array('q') if kind == INT else array('d')
+            for name, kind in self.schema
+        }
+        self._integral = {name: array('b') for name, kind in self.schema if kind == NUMBER}
+        self._length = 0
+        self.extend(rows)
+
+    def append(self, row: Dict):
+        for name, kind in self.schema:
+            value = row.get(name)
+            column = self._columns[name]
+            if kind == CATEGORY:
+                column.append(self.strings.encode(value))
+            elif kind == INT:
+                column.append(_INT_MISSING if value is None else int(value))
+            else:
+                column.append(_FLOAT_MISSING if value is None else float(value))
+                if kind == NUMBER:
+                    self._integral[name].append(isinstance(value, numbers.Integral))
+        self._length += 1
+
+    def extend(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def column(self, name: str) -> list:
+        """列の値（欠損はNone）"""
+        kind = dict(self.schema)[name]
+        values = self._columns[name]
+        if kind == CATEGORY:
+            return [self.strings.decode(code) for code in values]
+        if kind == INT:
+            return [None if value == _INT_MISSING else value for value in values]
+        if kind == NUMBER:
+            return [None if math.isnan(value) else int(value) if integral else value
+                    for value, integral in zip(values, self._integral[name])]
+        return [None if math.isnan(value) else value for value in values]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_dicts())
+
+    def to_dicts(self) -> List[Dict]:
+        """
+        JSON応答用に行ごとの辞書へ変換（欠損値の項目は出力しない）
+        """
+        decode = self.strings.decode
+        columns = [(name, kind, self._columns[name], self._integral.get(name)) for name, kind in self.schema]
+        rows = []
+        for i in range(self._length):
+            row = {}
+            for name, kind, values, integral in columns:
+                value = values[i]
+                if kind == CATEGORY:
+                    if value:
+                        row[name] = decode(value)
+                elif kind == INT:
+                    if value != _INT_MISSING:
+                        row[name] = value
+                elif value == value:  # NaNは欠損
+                    row[name] = int(value) if integral is not None and integral[i] else value
+            rows.append(row)
+        return rows
+
+    def nbytes(self) -> int:
+        """列データのバイト数（カテゴリ辞書の文字列は含まない）"""
+        return sum(column.itemsize * len(column)
+                   for column in list(self._columns.values()) + list(self._integral.values()))
+
+
+AIR_QUALITY_SCHEMA = (
+    ('date', CATEGORY), ('location', CATEGORY), ('parameter', CATEGORY),
+    ('value', FLOAT), ('unit', CATEGORY), ('source', CATEGORY)
+)
+
+STATION_READING_SCHEMA = (
+    ('date', CATEGORY), ('station_id', CATEGORY), ('location', CATEGORY),
+    ('latitude', FLOAT), ('longitude', FLOAT), ('parameter', CATEGORY),
+    ('value', FLOAT), ('unit', CATEGORY), ('source', CATEGORY)
+)
+
+CLIMATE_SCHEMA = (
+    ('date', CATEGORY), ('location', CATEGORY), ('temperature_anomaly', FLOAT),
+    ('average_temperature', FLOAT), ('precipitation_change', FLOAT),
+    ('extreme_weather_events', INT), ('source', CATEGORY)
+)
+
+POLLUTION_SCHEMA = (
+    ('date', CATEGORY), ('location', CATEGORY), ('industrial_emissions', FLOAT),
+    ('water_pollution_index', FLOAT), ('soil_contamination_sites', INT),
+    ('waste_generation_tons', FLOAT), ('recycling_rate', FLOAT), ('source', CATEGORY)
+)
+
+BIODIVERSITY_SCHEMA = (
+    ('date', CATEGORY), ('region', CATEGORY), ('forest_coverage_percent', FLOAT),
+    ('deforestation_rate_annual', FLOAT), ('endangered_species_count', INT),
+    ('protected_areas_hectares', FLOAT), ('invasive_species_reports', INT),
+    ('coral_bleaching_percent', NUMBER), ('source', CATEGORY)
+)
+
+ENERGY_SCHEMA = (
+    ('date', CATEGORY), ('energy_source', CATEGORY), ('generation_percentage', FLOAT),
+    ('annual_generation_twh', FLOAT), ('co2_emissions_mt', FLOAT),
+    ('total_co2_emissions_mt', FLOAT), ('renewable_energy_ratio', FLOAT),
+    ('energy_efficiency_improvement', FLOAT), ('carbon_intensity_reduction', FLOAT),
+    ('source', CATEGORY)
+)
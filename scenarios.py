@@ -0,0 +1,278 @@
+"""
+エネルギー構成とCO2排出のシナリオシミュレーション
+Evaluates many target energy mixes at once: each scenario moves linearly
+from the current mix to its target mix by the target year while demand
+grows at the scenario's rate, and emissions, carbon intensity and the
+renewable ratio are computed for all scenarios and years in one vectorized
+pass. Large random (Monte Carlo) runs are split into fixed-size shards with
+their own seeds and computed on the shared process pool, so a seed gives
+the same result whatever the pool size
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import process_pool
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    import random
+
+# シナリオで扱う電源区分（mixes の列の順序）
+ENERGY_SOURCES = ['石炭', '天然ガス', '石油', '原子力', '再生可能エネルギー']
+RENEWABLE_SOURCES = {'再生可能エネルギー'}
+
+# 目標年の排出係数がこれ以下なら電力部門のカーボンニュートラルを達成とみなす（kg-CO2/kWh）
+CARBON_NEUTRAL_INTENSITY = 0.05
+
+MAX_SCENARIOS = 1_000_000
+MAX_TARGET_YEAR = 2100  # 年数に比例して (シナリオ数 × 年数) の配列を確保するため上限を設ける
+MAX_TOP = 1000
+SHARD_SIZE = 50_000  # プロセスプールで分割する単位
+
+
+class ScenarioEngine:
+    """
+    現在のエネルギー構成（energy_source, generation_percentage, co2_factor の行）と
+    総発電量を起点にシナリオを評価する。排出量は TWh × kg-CO2/kWh = Mt-CO2 で計算する
+    """
+
+    def __init__(self, baseline: List[Dict], base_year: int, base_demand_twh: float):
+        by_source = {row['energy_source']: row for row in baseline}
+        self.base_year = base_year
+        self.base_demand_twh = base_demand_twh
+        self.current = [float(by_source.get(source, {}).get('generation_percentage', 0.0)) for source in ENERGY_SOURCES]
+        self.factors = [float(by_source.get(source, {}).get('co2_factor', 0.0)) for source in ENERGY_SOURCES]
+        self.renewable = [1.0 if source in RENEWABLE_SOURCES else 0.0 for source in ENERGY_SOURCES]
+
+        total = sum(self.current)
+        if total <= 0:
+            raise ValueError('baseline energy mix is empty')
+        self.current = [share * 100.0 / total for share in self.current]
+
+    def run(self, mixes, target_year: int = 2050, demand_growth=0.0, top: int = 20,
+            include_trajectories: bool = False) -> Dict:
+        """
+        mixes（シナリオ数 × 電源区分の構成比%）を評価し、要約と排出量の少ない上位 top 件を返す
+        demand_growth はシナリオ共通の値またはシナリオごとの年率
+        """
+        _check_options(self.base_year, target_year, top)
+        return self._summarize(self._evaluate(mixes, target_year, demand_growth), top, include_trajectories)
+
+    def _evaluate(self, mixes, target_year: int, demand_growth) -> Dict:
+        if HAS_NUMPY:
+            return self._run_numpy(np.asarray(mixes, dtype=float), target_year, demand_growth)
+        return self._run_python([list(map(float, mix)) for mix in mixes], target_year, demand_growth)
+
+    def _validate(self, count: int, width: int):
+        if width != len(ENERGY_SOURCES):
+            raise ValueError(f"each mix needs {len(ENERGY_SOURCES)} shares ({', '.join(ENERGY_SOURCES)})")
+        if count == 0:
+            raise ValueError('no scenarios given')
+        if count > MAX_SCENARIOS:
+            raise ValueError(f"at most {MAX_SCENARIOS} scenarios per run")
+
+    def _run_numpy(self, mixes, target_year: int, demand_growth) -> Dict:
+        if mixes.ndim != 2:
+            raise ValueError('mixes must be a matrix of shares')
+        self._validate(mixes.shape[0], mixes.shape[1])
+        totals = mixes.sum(axis=1)
+        if (mixes < 0).any() or (totals <= 0).any():
+            raise ValueError('shares must be non-negative with a positive total')
+        targets = mixes * (100.0 / totals)[:, None]
+
+        years = np.arange(self.base_year, target_year + 1)
+        progress = (years - self.base_year) / (target_year - self.base_year)  # (T,)
+        current = np.asarray(self.current)
+        factors = np.asarray(self.factors)
+        renewable = np.asarray(self.renewable)
+
+        # 構成比は現在から目標へ線形に移るので、係数との積も年ごとに線形になる（S×T×K を作らない）
+        intensity = (current @ factors + ((targets - current) @ factors)[:, None] * progress) / 100.0  # (S, T)
+        renewable_ratio = current @ renewable + ((targets - current) @ renewable)[:, None] * progress
+
+        growth = np.broadcast_to(np.asarray(demand_growth, dtype=float), (targets.shape[0],))
+        demand = self.base_demand_twh * (1.0 + growth)[:, None] ** np.arange(len(years))  # (S, T)
+        emissions = demand * intensity  # Mt-CO2
+
+        return {
+            'targets': targets,
+            'years': years.tolist(),
+            'emissions': emissions,
+            'intensity': intensity,
+            'renewable_ratio': renewable_ratio,
+            'base_emissions': float(self.base_demand_twh * (current @ factors) / 100.0)
+        }
+
+    def _run_python(self, mixes: List[List[float]], target_year: int, demand_growth) -> Dict:
+        self._validate(len(mixes), len(mixes[0]) if mixes else len(ENERGY_SOURCES))
+        years = list(range(self.base_year, target_year + 1))
+        span = target_year - self.base_year
+        growth = demand_growth if isinstance(demand_growth, (list, tuple)) else [demand_growth] * len(mixes)
+        base_intensity = sum(c * f for c, f in zip(self.current, self.factors)) / 100.0
+
+        targets, emissions, intensity, renewable_ratio = [], [], [], []
+        for mix, rate in zip(mixes, growth):
+            total = sum(mix)
+            if min(mix) < 0 or total <= 0:
+                raise ValueError('shares must be non-negative with a positive total')
+            target = [share * 100.0 / total for share in mix]
+            delta_intensity = sum((t - c) * f for t, c, f in zip(target, self.current, self.factors)) / 100.0
+            delta_renewable = sum((t - c) * r for t, c, r in zip(target, self.current, self.renewable))
+            base_renewable = sum(c * r for c, r in zip(self.current, self.renewable))
+
+            row_intensity = [base_intensity + delta_intensity * i / span for i in range(len(years))]
+            targets.append(target)
+            intensity.append(row_intensity)
+            renewable_ratio.append([base_renewable + delta_renewable * i / span for i in range(len(years))])
+            emissions.append([self.base_demand_twh * (1.0 + rate) ** i * value for i, value in enumerate(row_intensity)])
+
+        return {
+            'targets': targets,
+            'years': years,
+            'emissions': emissions,
+            'intensity': intensity,
+            'renewable_ratio': renewable_ratio,
+            'base_emissions': self.base_demand_twh * base_intensity
+        }
+
+    @staticmethod
+    def _summarize(result: Dict, top: int, include_trajectories: bool) -> Dict:
+        if HAS_NUMPY:
+            emissions = np.asarray(result['emissions'])
+            final = emissions[:, -1]
+            cumulative = emissions.sum(axis=1)
+            final_intensity = np.asarray(result['intensity'])[:, -1]
+            final_renewable = np.asarray(result['renewable_ratio'])[:, -1]
+            order = np.argsort(cumulative, kind='stable')[:max(top, 0)].tolist()
+            percentiles = _percentiles(final)
+            neutral = int((final_intensity <= CARBON_NEUTRAL_INTENSITY).sum())
+            final, cumulative = final.tolist(), cumulative.tolist()
+            final_intensity, final_renewable = final_intensity.tolist(), final_renewable.tolist()
+            targets = np.asarray(result['targets'])
+        else:
+            emissions = result['emissions']
+            final = [row[-1] for row in emissions]
+            cumulative = [sum(row) for row in emissions]
+            final_intensity = [row[-1] for row in result['intensity']]
+            final_renewable = [row[-1] for row in result['renewable_ratio']]
+            order = sorted(range(len(final)), key=cumulative.__getitem__)[:max(top, 0)]
+            percentiles = _percentiles(final)
+            neutral = sum(value <= CARBON_NEUTRAL_INTENSITY for value in final_intensity)
+            targets = result['targets']
+
+        base = result['base_emissions']
+        scenarios = []
+        for i in order:
+            scenario = {
+                'index': i,
+                'mix': {source: round(float(share), 2) for source, share in zip(ENERGY_SOURCES, targets[i])},
+                'final_emissions_mt': round(final[i], 2),
+                'cumulative_emissions_mt': round(cumulative[i], 1),
+                'final_intensity_g_per_kwh': round(final_intensity[i] * 1000, 1),
+                'final_renewable_ratio': round(final_renewable[i], 1),
+                'reduction_percent': round((1 - final[i] / base) * 100, 1) if base else None,
+                'carbon_neutral': final_intensity[i] <= CARBON_NEUTRAL_INTENSITY
+            }
+            if include_trajectories:
+                scenario['emissions_mt'] = [round(float(value), 2) for value in emissions[i]]
+            scenarios.append(scenario)
+
+        return {
+            'years': [result['years'][0], result['years'][-1]],
+            'scenario_count': len(final),
+            'base_emissions_mt': round(base, 2),
+            'final_emissions_mt': {name: round(value, 2) for name, value in percentiles.items()},
+            'carbon_neutral_scenarios': neutral,
+            'carbon_neutral_intensity_g_per_kwh': CARBON_NEUTRAL_INTENSITY * 1000,
+            'scenarios': scenarios
+        }
+
+
+def _final_emissions(result: Dict) -> List[float]:
+    """目標年の排出量（シナリオ順）"""
+    if HAS_NUMPY:
+        return np.asarray(result['emissions'])[:, -1].tolist()
+    return [row[-1] for row in result['emissions']]
+
+
+def _percentiles(final) -> Dict[str, float]:
+    """目標年の排出量の百分位（p5 / p50 / p95）"""
+    if HAS_NUMPY:
+        return dict(zip(('p5', 'p50', 'p95'), np.percentile(np.asarray(final, dtype=float), [5, 50, 95]).tolist()))
+    ranked = sorted(final)
+    return {
+        name: ranked[min(int(q * (len(ranked) - 1) + 0.5), len(ranked) - 1)]
+        for name, q in (('p5', 0.05), ('p50', 0.5), ('p95', 0.95))
+    }
+
+
+def _check_options(base_year: int, target_year: int, top: int):
+    if not base_year < target_year <= MAX_TARGET_YEAR:
+        raise ValueError(f"target_year must be after {base_year} and at most {MAX_TARGET_YEAR}")
+    if not 0 <= top <= MAX_TOP:
+        raise ValueError(f"top must be between 0 and {MAX_TOP}")
+
+
+def random_mixes(count: int, seed: int = 0):
+    """電源構成比を単体上から一様に抽出（シナリオ数 × 電源区分、合計100%）"""
+    if HAS_NUMPY:
+        return np.random.default_rng(seed).dirichlet(np.ones(len(ENERGY_SOURCES)), size=count) * 100.0
+    rng = random.Random(seed)
+    mixes = []
+    for _ in range(count):
+        draws = [rng.expovariate(1.0) for _ in ENERGY_SOURCES]
+        total = sum(draws)
+        mixes.append([value * 100.0 / total for value in draws])
+    return mixes
+
+
+def _run_shard(args) -> Tuple[Dict, List[float]]:
+    baseline, base_year, base_demand_twh, count, seed, target_year, demand_growth, top, trajectories = args
+    engine = ScenarioEngine(baseline, base_year, base_demand_twh)
+    result = engine._evaluate(random_mixes(count, seed), target_year, demand_growth)
+    return engine._summarize(result, top, trajectories), _final_emissions(result)
+
+
+def simulate_random(baseline: List[Dict], base_year: int, base_demand_twh: float, count: int,
+                    seed: int = 0, target_year: int = 2050, demand_growth: float = 0.0, top: int = 20,
+                    include_trajectories: bool = False) -> Dict:
+    """
+    ランダムな構成比 count 件を評価（SHARD_SIZE 件ごとに分割し、2つ以上なら共有のプロセスプールで計算）
+    分割とシャードごとのシードは件数と seed だけで決まるため、結果はプロセス数によらない
+    """
+    if count <= 0 or count > MAX_SCENARIOS:
+        raise ValueError(f"samples must be between 1 and {MAX_SCENARIOS}")
+    _check_options(base_year, target_year, top)
+
+    sizes = [min(SHARD_SIZE, count - start) for start in range(0, count, SHARD_SIZE)]
+    jobs = [(baseline, base_year, base_demand_twh, size, seed * 1_000_003 + i, target_year, demand_growth, top,
+             include_trajectories)
+            for i, size in enumerate(sizes)]
+    if len(jobs) == 1:
+        return _run_shard(jobs[0])[0]
+    return _merge(process_pool.map_jobs(_run_shard, jobs), sizes, top)
+
+
+def _merge(parts: Sequence[Tuple[Dict, List[float]]], sizes: Sequence[int], top: int) -> Dict:
+    """シャードごとの要約を1つにまとめる（百分位は全シャードの目標年の排出量から計算する）"""
+    offset, scenarios, final = 0, [], []
+    for (part, part_final), size in zip(parts, sizes):
+        for scenario in part['scenarios']:
+            scenarios.append(dict(scenario, index=scenario['index'] + offset))
+        final.extend(part_final)
+        offset += size
+    scenarios.sort(key=lambda scenario: scenario['cumulative_emissions_mt'])
+
+    summaries = [part for part, _ in parts]
+    merged = dict(summaries[0])
+    merged.update({
+        'scenario_count': sum(sizes),
+        'carbon_neutral_scenarios': sum(part['carbon_neutral_scenarios'] for part in summaries),
+        'final_emissions_mt': {name: round(value, 2) for name, value in _percentiles(final).items()},
+        'scenarios': scenarios[:max(top, 0)],
+        'shards': len(parts)
+    })
+    return merged
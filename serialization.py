@@ -0,0 +1,100 @@
+"""
+JSONシリアライザ（orjsonがあれば高速版、無ければ標準ライブラリ）
+Pluggable JSON serialization used for every Flask response, the SSE feed,
+content hashes and the snapshot bundle. NumPy scalars and arrays are
+serialized natively by orjson and converted by a default hook in the
+stdlib fallback; like the stdlib, any other unknown type is a TypeError
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+import json
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    from flask.json.provider import JSONProvider
+    HAS_FLASK = True
+except ImportError:
+    HAS_FLASK = False
+    JSONProvider = object
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any):
+    """
+    JSONの標準の型以外で応答に含めてよい型の変換
+    それ以外は文字列にせず TypeError にする（想定外の型の混入を隠さない）
+    """
+    if HAS_NUMPY:
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """
+    UTF-8のJSONバイト列に変換（日本語はエスケープしない）
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj, default=_default,
+                                option=_ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+        except TypeError:
+            # 64bitを超える整数などorjsonが扱えない値は標準ライブラリで処理
+            pass
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':'),
+                      default=_default).encode('utf-8')
+
+
+def dumps_str(obj: Any, sort_keys: bool = False) -> str:
+    return dumps(obj, sort_keys).decode('utf-8')
+
+
+def loads(data):
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask の JSON プロバイダ（jsonify と全ルートの応答に使われる）
+    """
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps_str(obj, kwargs.get('sort_keys', False))
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # 文字列を経由せずバイト列のまま応答本体にする
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
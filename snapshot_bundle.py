@@ -0,0 +1,164 @@
+"""
+フロントエンド初回表示用のスナップショットバンドル
+Builds a versioned, gzip-compressed bundle of all Japan datasets on each
+ingestion cycle; the bundle file is immutable and addressed by its content
+hash, and a small manifest points at the current version
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshots')
+
+# バンドルに含める大気質の都道府県（フロントエンドの選択肢）
+BUNDLE_PREFECTURES = ['Tokyo', 'Osaka', 'Nagoya', 'Fukuoka', 'Sapporo']
+
+# データセット名 -> fetcher のメソッド
+BUNDLE_DATASETS = {
+    'environmental-problems': 'get_environmental_problems',
+    'climate': 'get_climate_data',
+    'pollution': 'get_pollution_data',
+    'biodiversity': 'get_biodiversity_data',
+    'energy-emissions': 'get_energy_emissions_data'
+}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class SnapshotBundler:
+    """
+    スナップショットバンドルの作成と管理
+    内容が変わらない限り同じ版を返し、古い版は keep 個だけ残す
+    """
+
+    def __init__(self, fetcher, directory: Optional[str] = None, keep: int = 3):
+        self.fetcher = fetcher
+        self.directory = directory or os.environ.get('JAPAN_ENV_SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR)
+        self.keep = keep
+        self._manifest: Optional[Dict] = None
+        self._lock = threading.Lock()
+        # 起動時・データソースの更新ごと・リクエストからの作成を1つずつ実行する
+        self._build_lock = threading.Lock()
+
+    def start(self):
+        """データソースの更新の1巡ごとにバンドルを作り直す"""
+        self.fetcher.scheduler.add_cycle_listener(self._on_cycle)
+        threading.Thread(target=self._on_cycle, name='snapshot-bundle', daemon=True).start()
+
+    def _on_cycle(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Snapshot bundle build failed: {e}")
+
+    def manifest(self) -> Dict:
+        """現在の版のマニフェスト（無ければ作成）"""
+        with self._lock:
+            manifest = self._manifest
+        if manifest is None:
+            manifest = self._read_manifest() or self.build()
+        return manifest
+
+    def path(self, version: str) -> Optional[str]:
+        """版に対応するバンドルファイル（存在しない版は None）"""
+        if not version.isalnum():
+            return None
+        path = os.path.join(self.directory, f"bundle-{version}.json.gz")
+        return path if os.path.exists(path) else None
+
+    def build(self) -> Dict:
+        """
+        全データセットを1つのバンドルにまとめ、内容が変わっていれば新しい版として書き出す
+        """
+        with self._build_lock:
+            return self._build()
+
+    def _build(self) -> Dict:
+        datasets = {name: getattr(self.fetcher, method)() for name, method in BUNDLE_DATASETS.items()}
+        datasets['air-quality'] = {
+            prefecture: self.fetcher.get_air_quality_data(prefecture) for prefecture in BUNDLE_PREFECTURES
+        }
+
+        # 版は生成時刻を含まない内容だけから決める
+        content = serialization.dumps(datasets, sort_keys=True)
+        version = hashlib.sha256(content).hexdigest()[:16]
+
+        with self._lock:
+            if self._manifest is not None and self._manifest['version'] == version:
+                return self._manifest
+
+        generated_at = datetime.now().isoformat()
+        body = b''.join([b'{"version": "', version.encode(), b'", "generated_at": "',
+                         generated_at.encode(), b'", "datasets": ', content, b'}'])
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"bundle-{version}.json.gz")
+        if not os.path.exists(path):
+            self._write_atomic(path, compressed)
+
+        manifest = {
+            'version': version,
+            'generated_at': generated_at,
+            'url': f"/api/japan/snapshot/{version}",
+            'bytes': len(compressed),
+            'uncompressed_bytes': len(body),
+            'datasets': sorted(datasets)
+        }
+        self._write_atomic(os.path.join(self.directory, MANIFEST_NAME), serialization.dumps(manifest))
+        with self._lock:
+            self._manifest = manifest
+        self._prune(version)
+
+        logger.info(f"Snapshot bundle {version} built ({len(compressed)} bytes)")
+        return manifest
+
+    def _read_manifest(self) -> Optional[Dict]:
+        # 再起動後は前回のバンドルをそのまま使う
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME), encoding='utf-8') as f:
+                manifest = serialization.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if self.path(manifest.get('version', '')) is None:
+            return None
+        with self._lock:
+            self._manifest = manifest
+        return manifest
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        # 書き込みごとに別の一時ファイルを使い、書き終えてから置き換える
+        fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _prune(self, current: str):
+        bundles = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.startswith('bundle-') and name.endswith('.json.gz') and current not in name
+        ]
+        bundles.sort(key=os.path.getmtime, reverse=True)
+        for path in bundles[max(self.keep - 1, 0):]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,92 @@
+"""
+観測局の空間インデックス（緯度経度グリッド）
+Grid-based spatial index for nearest-station and bounding-box queries
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """2地点間の大円距離（km）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    緯度経度を一定間隔のセルに分割した空間インデックス
+    検索は対象範囲に重なるセルだけを走査する
+    """
+
+    def __init__(self, points: Sequence[Dict], cell_size: float = 0.1,
+                 lat_key: str = 'latitude', lon_key: str = 'longitude'):
+        self.cell_size = cell_size
+        self._items: List[Dict] = []
+        self._lats: List[float] = []
+        self._lons: List[float] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+
+        for item in points:
+            try:
+                lat, lon = float(item[lat_key]), float(item[lon_key])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+            index = len(self._items)
+            self._items.append(item)
+            self._lats.append(lat)
+            self._lons.append(lon)
+            self._cells.setdefault(self._cell(lat, lon), []).append(index)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size)))
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        lat_lo, lon_lo = self._cell(min_lat, min_lon)
+        lat_hi, lon_hi = self._cell(max_lat, max_lon)
+
+        # 範囲がセル数より広い場合は空でないセルだけを走査する
+        if (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) > len(self._cells):
+            for (i, j), indices in self._cells.items():
+                if lat_lo <= i <= lat_hi and lon_lo <= j <= lon_hi:
+                    yield from indices
+            return
+
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lon_lo, lon_hi + 1):
+                yield from self._cells.get((i, j), ())
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Dict]:
+        """範囲（南西端・北東端）に含まれる地点"""
+        return [
+            self._items[i] for i in self._candidates(min_lat, min_lon, max_lat, max_lon)
+            if min_lat <= self._lats[i] <= max_lat and min_lon <= self._lons[i] <= max_lon
+        ]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float,
+                      limit: Optional[int] = None) -> List[Tuple[float, Dict]]:
+        """中心から radius_km 以内の地点を (距離km, 地点) の近い順で返す"""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlon = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+
+        matches = []
+        for i in self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            distance = haversine_km(lat, lon, self._lats[i], self._lons[i])
+            if distance <= radius_km:
+                matches.append((distance, i))
+
+        matches.sort()
+        if limit is not None:
+            matches = matches[:limit]
+        return [(round(distance, 3), self._items[i]) for distance, i in matches]
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+政府統計CSVの一括取り込みパイプライン
+Streams large government-statistics CSV (and, with openpyxl, Excel) files
+in chunks, validates and normalizes units, and loads them into the local store
+"""
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+try:
+    import openpyxl
+    HAS_OPENPYXL = True
+except ImportError:
+    HAS_OPENPYXL = False
+
+from itertools import compress, zip_longest
+import argparse
+import csv
+import logging
+import math
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from local_store import LocalStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# 発電量の単位 -> TWh
+GENERATION_UNITS = {
+    'twh': 1.0,
+    'gwh': 1e-3,
+    'mwh': 1e-6,
+    'kwh': 1e-9,
+    '億kwh': 0.1,
+    '百万kwh': 1e-3,
+    '千kwh': 1e-6
+}
+
+# 排出係数の単位 -> kg-CO2/kWh
+CO2_FACTOR_UNITS = {
+    'kg-co2/kwh': 1.0,
+    'kgco2/kwh': 1.0,
+    't-co2/mwh': 1.0,
+    'g-co2/kwh': 1e-3,
+    'gco2/kwh': 1e-3,
+    't-co2/kwh': 1e3
+}
+
+# 人口の単位 -> 人
+POPULATION_UNITS = {
+    '人': 1,
+    '千人': 1000,
+    '万人': 10000
+}
+
+# 電源名 -> 電源区分（フェッチャーのエネルギー構成と同じ区分）
+ENERGY_CATEGORIES = {
+    '石炭': '石炭', 'coal': '石炭',
+    'lng': '天然ガス', '天然ガス': '天然ガス', 'natural gas': '天然ガス', 'gas': '天然ガス',
+    '石油': '石油', '石油等': '石油', 'oil': '石油',
+    '原子力': '原子力', 'nuclear': '原子力',
+    '再生可能エネルギー': '再生可能エネルギー', 'renewable': '再生可能エネルギー',
+    '太陽光': '再生可能エネルギー', 'solar': '再生可能エネルギー',
+    '風力': '再生可能エネルギー', 'wind': '再生可能エネルギー',
+    '水力': '再生可能エネルギー', 'hydro': '再生可能エネルギー',
+    '地熱': '再生可能エネルギー', 'geothermal': '再生可能エネルギー',
+    'バイオマス': '再生可能エネルギー', 'biomass': '再生可能エネルギー'
+}
+
+
+class Column:
+    """取り込み対象の列定義（型・別名・単位・値の範囲）"""
+
+    __slots__ = ('name', 'type', 'aliases', 'unit_aliases', 'units', 'default_unit', 'minimum', 'maximum')
+
+    def __init__(self, name: str, type: type, aliases: Sequence[str] = (), unit_aliases: Sequence[str] = (),
+                 units: Optional[Dict[str, float]] = None, default_unit: Optional[str] = None,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.name = name
+        self.type = type
+        self.aliases = (name,) + tuple(aliases)
+        self.unit_aliases = tuple(unit_aliases)
+        self.units = units
+        self.default_unit = default_unit
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+class IngestSpec:
+    """データセットごとの取り込み仕様"""
+
+    def __init__(self, table: str, columns: List[Column],
+                 derive: Optional[Callable[[Dict[str, list]], Dict[str, list]]] = None):
+        self.table = table
+        self.columns = columns
+        self.derive = derive
+
+
+def _energy_category(columns: Dict[str, list]) -> Dict[str, list]:
+    # 区分が判別できない電源はそのままの名前を区分とする
+    columns['category'] = [
+        ENERGY_CATEGORIES.get(str(source).strip().lower(), source) for source in columns['energy_source']
+    ]
+    return columns
+
+
+SPECS = {
+    'energy_mix': IngestSpec('energy_mix', [
+        Column('year', int, aliases=('年度', '年', 'fiscal_year')),
+        Column('energy_source', str, aliases=('電源', '電源種別', 'source', 'type')),
+        Column('generation_twh', float, aliases=('発電電力量', '発電量', 'generation'),
+               unit_aliases=('発電量単位', '単位', 'generation_unit', 'unit'),
+               units=GENERATION_UNITS, default_unit='twh', minimum=0),
+        Column('co2_factor', float, aliases=('排出係数', 'co2_emission_factor', 'emission_factor'),
+               unit_aliases=('排出係数単位', 'co2_unit'),
+               units=CO2_FACTOR_UNITS, default_unit='kg-co2/kwh', minimum=0, maximum=2.0)
+    ], derive=_energy_category),
+    'pollution_baseline': IngestSpec('pollution_baseline', [
+        Column('year', int, aliases=('年度', '年')),
+        Column('location', str, aliases=('都道府県', '地域', 'prefecture')),
+        Column('industrial_index', float, aliases=('工業指数', '製造業指数'), minimum=0, maximum=200),
+        Column('population', int, aliases=('人口', '総人口'),
+               unit_aliases=('人口単位',), units=POPULATION_UNITS, default_unit='人', minimum=0)
+    ])
+}
+
+
+def _normalize_header(value: str) -> str:
+    return value.strip().lstrip('﻿').lower()
+
+
+def _resolve_columns(header: List[str], spec: IngestSpec) -> Dict[str, Dict[str, Optional[int]]]:
+    """
+    ヘッダから各列の位置と単位列の位置を決定
+    """
+    positions = {_normalize_header(name): i for i, name in enumerate(header)}
+    resolved = {}
+    for column in spec.columns:
+        index = next((positions[a.lower()] for a in column.aliases if a.lower() in positions), None)
+        if index is None:
+            raise ValueError(f"column '{column.name}' not found in header (accepted: {', '.join(column.aliases)})")
+        unit_index = next((positions[a.lower()] for a in column.unit_aliases if a.lower() in positions), None)
+        resolved[column.name] = {'index': index, 'unit_index': unit_index}
+    return resolved
+
+
+def _parse_numbers(values: List[str]) -> List[Optional[float]]:
+    """
+    文字列の列を数値に変換（桁区切りのカンマを除去し、変換できない値はNone）
+    """
+    if HAS_PANDAS:
+        series = pd.to_numeric(pd.Series(values, dtype=object).str.replace(',', '', regex=False), errors='coerce')
+        return [None if math.isnan(v) else v for v in series.tolist()]
+
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(float(value.replace(',', '')))
+        except (AttributeError, ValueError):
+            parsed.append(None)
+    return parsed
+
+
+def _chunked(rows: Iterator[List[str]], chunk_size: int) -> Iterator[tuple]:
+    header = next(rows)
+    chunk = []
+    for row in rows:
+        if not row:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield header, chunk
+            chunk = []
+    if chunk:
+        yield header, chunk
+
+
+def _excel_rows(path: str, sheet: Optional[str] = None) -> Iterator[List[str]]:
+    """
+    Excelシートの行を文字列のリストとして逐次読み込み（read_only モードでシート全体を展開しない）
+    """
+    if not HAS_OPENPYXL:
+        raise ValueError('Excel files require openpyxl (pip install openpyxl)')
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        for values in worksheet.iter_rows(values_only=True):
+            row = ['' if value is None else str(value) for value in values]
+            # 空行（書式だけのセル）は読み飛ばす
+            yield row if any(row) else []
+    finally:
+        workbook.close()
+
+
+def _read_chunks(path: str, encoding: str, chunk_size: int, sheet: Optional[str] = None) -> Iterator[tuple]:
+    """
+    CSV（拡張子が .xlsx/.xlsm の場合はExcel）をヘッダと行のチャンクに分けて逐次読み込み
+    """
+    if path.lower().endswith(EXCEL_EXTENSIONS):
+        yield from _chunked(_excel_rows(path, sheet), chunk_size)
+        return
+
+    with open(path, newline='', encoding=encoding) as f:
+        yield from _chunked(csv.reader(f), chunk_size)
+
+
+def _transform_chunk(rows: List[List[str]], spec: IngestSpec, resolved: Dict) -> tuple:
+    """
+    チャンクを列ごとに型変換・単位正規化・検証し、(書き込む行, 除外した行数) を返す
+    """
+    # 行を列に転置（短い行は空文字で埋める）してから列単位で処理する
+    transposed = list(zip_longest(*rows, fillvalue=''))
+    width = len(transposed)
+    empty = ('',) * len(rows)
+    valid = [True] * len(rows)
+    columns: Dict[str, list] = {}
+
+    for column in spec.columns:
+        index = resolved[column.name]['index']
+        raw = transposed[index] if index < width else empty
+
+        if column.type is str:
+            values = [value.strip() or None for value in raw]
+        else:
+            values = _parse_numbers(raw)
+
+        if column.units is not None:
+            unit_index = resolved[column.name]['unit_index']
+            units = transposed[unit_index] if unit_index is not None and unit_index < width else empty
+            # 単位の表記は数種類しかないため、係数は表記ごとに1回だけ引く
+            factors = {}
+            for unit in set(units):
+                factors[unit] = column.units.get(unit.strip().lower() or column.default_unit)
+            values = [
+                None if value is None or factors[unit] is None else value * factors[unit]
+                for value, unit in zip(values, units)
+            ]
+
+        if column.type is not str:
+            minimum = -math.inf if column.minimum is None else column.minimum
+            maximum = math.inf if column.maximum is None else column.maximum
+            values = [value if value is not None and minimum <= value <= maximum else None for value in values]
+            if column.type is int:
+                values = [None if value is None else int(round(value)) for value in values]
+
+        valid = [ok and value is not None for ok, value in zip(valid, values)]
+        columns[column.name] = values
+
+    if spec.derive is not None:
+        columns = spec.derive(columns)
+
+    names = list(columns)
+    loaded = list(compress(zip(*(columns[name] for name in names)), valid))
+    return names, loaded, len(rows) - len(loaded)
+
+
+def ingest_csv(dataset: str, path: str, store: Optional[LocalStore] = None,
+               encoding: str = 'utf-8-sig', chunk_size: int = DEFAULT_CHUNK_SIZE, sheet: Optional[str] = None) -> Dict:
+    """
+    統計CSV（またはExcelのシート）をチャンク単位で取り込み、スループットを含む結果を返す
+    """
+    if dataset not in SPECS:
+        raise ValueError(f"unknown dataset: {dataset} (available: {', '.join(SPECS)})")
+
+    spec = SPECS[dataset]
+    store = store or LocalStore()
+    started = time.perf_counter()
+    resolved = None
+    report = {
+        'dataset': dataset,
+        'path': path,
+        'bytes': os.path.getsize(path),
+        'rows_read': 0,
+        'rows_loaded': 0,
+        'rows_rejected': 0,
+        'chunks': 0
+    }
+
+    for header, rows in _read_chunks(path, encoding, chunk_size, sheet):
+        if resolved is None:
+            resolved = _resolve_columns(header, spec)
+
+        names, loaded, rejected = _transform_chunk(rows, spec, resolved)
+        if loaded:
+            store.insert_many(spec.table, names, loaded)
+
+        report['chunks'] += 1
+        report['rows_read'] += len(rows)
+        report['rows_loaded'] += len(loaded)
+        report['rows_rejected'] += rejected
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"{dataset}: {report['rows_read']:,} rows read "
+                    f"({report['rows_read'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows_read'] / max(elapsed, 1e-9), 1)
+    report['mb_per_second'] = round(report['bytes'] / 1e6 / max(elapsed, 1e-9), 2)
+
+    if report['rows_rejected']:
+        logger.warning(f"{dataset}: rejected {report['rows_rejected']:,} rows failing validation")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='政府統計CSV/Excelをローカルストアに取り込む')
+    parser.add_argument('dataset', choices=sorted(SPECS), help='取り込むデータセット')
+    parser.add_argument('paths', nargs='+', help='CSV（または .xlsx）ファイルのパス')
+    parser.add_argument('--encoding', default='utf-8-sig', help='文字コード（省庁のCSVは cp932 が多い）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='1チャンクの行数')
+    parser.add_argument('--sheet', default=None, help='Excelのシート名（既定はアクティブシート）')
+    parser.add_argument('--store', default=None, help='ローカルストアのパス')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = LocalStore(args.store)
+
+    for path in args.paths:
+        try:
+            report = ingest_csv(args.dataset, path, store, args.encoding, args.chunk_size, args.sheet)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            print(f"❌ {path}: {e}")
+            return 1
+        print(f"✅ {path}: {report['rows_loaded']:,}/{report['rows_read']:,} rows loaded "
+              f"in {report['seconds']}s ({report['rows_per_second']:,.0f} rows/s, "
+              f"{report['mb_per_second']} MB/s, {report['rows_rejected']:,} rejected)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+テスト共通の設定
+Puts the repository root on sys.path, disables the startup warm-up and
+keeps the app away from the network and the developer's local store
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['JAPAN_ENV_WARMUP'] = '0'
+
+import pytest
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    """テストごとのローカルストア"""
+    path = str(tmp_path / 'japan_environmental.db')
+    monkeypatch.setenv('JAPAN_ENV_STORE', path)
+    monkeypatch.delenv('JAPAN_ENV_DATA_DIR', raising=False)
+    return path
+
+
+@pytest.fixture
+def app(store_path, tmp_path, monkeypatch):
+    """バックグラウンド更新を開始せず、上流に接続しないアプリ"""
+    import japan_environmental_data
+    from app import create_app
+
+    monkeypatch.setattr(japan_environmental_data, 'HAS_REQUESTS', False)
+    monkeypatch.setenv('JAPAN_ENV_SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    return create_app(start_background=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,140 @@
+"""
+レスポンスキャッシュ・受け付け制御・ページング・圧縮
+"""
+
+import threading
+import time
+
+import pytest
+
+from api_layers import MAX_RETRY_AFTER, AdmissionController, Rejected, ResponseCache, paginate
+
+
+def test_response_cache_expiry_and_stale_reads():
+    cache = ResponseCache()
+    cache.set('key', {'value': 1}, ttl=0.05)
+    assert cache.get('key') == {'value': 1}
+    assert cache.info('key')['fresh']
+
+    time.sleep(0.06)
+    assert cache.get('key') is None
+    assert cache.get_stale('key') == {'value': 1}
+    assert not cache.info('key')['fresh']
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', 1, 60)
+    cache.set('b', 2, 60)
+    cache.get('a')
+    cache.set('c', 3, 60)
+    assert cache.get_stale('b') is None
+    assert cache.get_stale('a') == 1
+
+
+def test_rate_limited_client_is_rejected_with_retry_after():
+    admission = AdmissionController(client_rate=1.0, client_burst=1)
+    with admission.admit('10.0.0.1'):
+        pass
+    with pytest.raises(Rejected) as error:
+        with admission.admit('10.0.0.1'):
+            pass
+    assert error.value.reason == 'rate_limited'
+    assert error.value.retry_after_header == '1'
+
+    # 他のクライアントには影響しない
+    with admission.admit('10.0.0.2'):
+        pass
+
+
+def test_zero_client_rate_clamps_retry_after():
+    admission = AdmissionController(client_rate=0.0, client_burst=1)
+    with admission.admit('10.0.0.1'):
+        pass
+    with pytest.raises(Rejected) as error:
+        with admission.admit('10.0.0.1'):
+            pass
+    assert error.value.retry_after == MAX_RETRY_AFTER
+    assert error.value.retry_after_header == str(MAX_RETRY_AFTER)
+
+
+def test_full_queue_is_rejected():
+    admission = AdmissionController(client_rate=100, client_burst=100, max_concurrent=1, max_queue=0)
+    with admission.admit('a'):
+        with pytest.raises(Rejected) as error:
+            with admission.admit('b'):
+                pass
+    assert error.value.reason == 'queue_full'
+    assert admission.stats()['rejected']['queue_full'] == 1
+
+
+def test_queued_request_times_out():
+    admission = AdmissionController(client_rate=100, client_burst=100, max_concurrent=1, max_queue=1,
+                                    queue_timeout=0.05)
+    with admission.admit('a'):
+        with pytest.raises(Rejected) as error:
+            with admission.admit('b'):
+                pass
+    assert error.value.reason == 'queue_timeout'
+
+
+def test_queued_request_runs_when_a_slot_frees():
+    admission = AdmissionController(client_rate=100, client_burst=100, max_concurrent=1, max_queue=1,
+                                    queue_timeout=5.0)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with admission.admit('a'):
+            entered.set()
+            release.wait(5.0)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait(5.0)
+    threading.Timer(0.05, release.set).start()
+    with admission.admit('b'):
+        assert admission.stats()['active'] == 1
+    thread.join()
+    assert admission.stats()['admitted'] == 2
+
+
+def test_paginate():
+    data = list(range(10))
+    assert paginate(data, {}) == (data, None)
+    assert paginate(data, {'limit': '3', 'offset': '8'}) == ([8, 9], {'total': 10, 'limit': 3, 'offset': 8})
+    with pytest.raises(ValueError):
+        paginate(data, {'limit': 'x'})
+
+
+def test_costly_route_returns_429_when_rate_limited(app, client):
+    admission = app.extensions['admission']
+    admission.client_rate, admission.client_burst = 0.0, 1
+    assert client.get('/api/japan/comprehensive-report').status_code == 200
+
+    # 引数の異なるリクエストはキャッシュに無いため受け付け制御の対象になる
+    response = client.get('/api/japan/query?dataset=pollution&value_gt=1')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(MAX_RETRY_AFTER)
+
+
+def test_costly_route_returns_503_when_the_queue_is_full(app, client):
+    admission = app.extensions['admission']
+    admission.max_concurrent, admission.max_queue = 0, 0
+
+    response = client.get('/api/japan/comprehensive-report')
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+
+
+def test_costly_route_serves_stale_data_when_overloaded(app, client):
+    from app import JAPAN_DATASETS
+
+    route = next(route for route in JAPAN_DATASETS if route.path == 'comprehensive-report')
+    app.extensions['response_cache'].set(route.cache_key(route.parse({})), {'cached': True}, ttl=0)
+    admission = app.extensions['admission']
+    admission.max_concurrent, admission.max_queue = 0, 0
+
+    payload = client.get('/api/japan/comprehensive-report').get_json()
+    assert payload['stale'] is True
+    assert payload['report'] == {'cached': True}
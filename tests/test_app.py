@@ -0,0 +1,48 @@
+"""
+/api/japan/* のエンドポイント
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize('path', [
+    '/api/japan/climate',
+    '/api/japan/pollution',
+    '/api/japan/biodiversity',
+    '/api/japan/comprehensive-report'
+])
+def test_simulated_datasets_serialize(client, path):
+    # 日付で固定した乱数の整数（numpy.int64）が JSON に変換できること
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'success'
+
+
+def test_simulated_datasets_are_stable_within_a_day(app):
+    fetcher = app.extensions['japan_data_fetcher']
+    assert fetcher.get_pollution_data() == fetcher.get_pollution_data()
+
+
+def test_every_dataset_route_is_registered(app):
+    from app import JAPAN_DATASETS
+
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert {f"/api/japan/{route.path}" for route in JAPAN_DATASETS} <= rules
+
+
+def test_echo_and_pagination(client):
+    payload = client.get('/api/japan/air-quality?prefecture=Osaka&limit=2&offset=1').get_json()
+    assert payload['prefecture'] == 'Osaka'
+    assert payload['count'] == len(payload['data']) <= 2
+    assert payload['pagination']['offset'] == 1
+
+
+@pytest.mark.parametrize('path', [
+    '/api/japan/climate?samples=many',
+    '/api/japan/air-quality?limit=x',
+    '/api/japan/stations/nearby?lat=north&lon=139.7'
+])
+def test_invalid_parameters_return_400(client, path):
+    response = client.get(path)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
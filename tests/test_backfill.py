@@ -0,0 +1,201 @@
+"""
+履歴のバックフィル
+"""
+
+from datetime import datetime, timedelta
+import threading
+
+import pytest
+
+import data_sources
+from backfill import Checkpoint, backfill, plan_chunks
+from data_sources import (
+    DataSource, HistoryTruncated, HistoryUnsupported, OpenAQSource, SourceRegistry, SourceUnavailable
+)
+from local_store import LocalStore
+
+
+class HistorySource(DataSource):
+    """取得単位ごとに1日1件の測定値を返す OpenAQ の代わり"""
+
+    name = 'openaq'
+    rate_limit = 1000.0
+    burst = 100
+    max_concurrency = 4
+    schema = {'date': str, 'location': str, 'parameter': str, 'value': float}
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch(self, **params):
+        return []
+
+    def fetch_history(self, date_from, date_to, throttle=None, location='Tokyo', parameter='pm25', **params):
+        with self._lock:
+            self.calls.append((location, parameter, date_from))
+            if self.failures:
+                self.failures -= 1
+                raise SourceUnavailable('temporarily unavailable')
+        if throttle is not None:
+            throttle()
+        return [{'date': f"{date_from}T00:00:00Z", 'location': location, 'parameter': parameter, 'value': 10.0,
+                 'station': '1'}]
+
+
+class DenseHistorySource(HistorySource):
+    """max_days 日を超える期間は上限のページ数に収まらない OpenAQ の代わり"""
+
+    def __init__(self, max_days):
+        super().__init__()
+        self.max_days = max_days
+
+    def fetch_history(self, date_from, date_to, throttle=None, location='Tokyo', parameter='pm25', **params):
+        days = (datetime.strptime(date_to, '%Y-%m-%d') - datetime.strptime(date_from, '%Y-%m-%d')).days
+        if days > self.max_days:
+            with self._lock:
+                self.calls.append((location, parameter, date_from))
+            raise HistoryTruncated('too many pages')
+        rows = []
+        for i in range(days):
+            date = (datetime.strptime(date_from, '%Y-%m-%d') + timedelta(days=i)).strftime('%Y-%m-%d')
+            rows.extend(super().fetch_history(date, date, throttle, location, parameter))
+        return rows
+
+
+class NoHistorySource(HistorySource):
+    def fetch_history(self, date_from, date_to, throttle=None, **params):
+        with self._lock:
+            self.calls.append(date_from)
+        raise HistoryUnsupported('openaq does not provide history')
+
+
+def _registry(source):
+    registry = SourceRegistry()
+    registry.register(source)
+    return registry
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalStore(str(tmp_path / 'store.db'))
+
+
+def test_plan_chunks_splits_by_days_location_and_parameter():
+    chunks = plan_chunks('2024-01-01', '2024-01-10', ['Tokyo', 'Osaka'], ['pm25'], chunk_days=7)
+    assert [chunk.id for chunk in chunks] == [
+        'Tokyo|pm25|2024-01-01|2024-01-08', 'Osaka|pm25|2024-01-01|2024-01-08',
+        'Tokyo|pm25|2024-01-08|2024-01-10', 'Osaka|pm25|2024-01-08|2024-01-10'
+    ]
+    with pytest.raises(ValueError):
+        plan_chunks('2024-01-10', '2024-01-01', [None], [None])
+
+
+def test_backfill_writes_rows_and_checkpoints(store, tmp_path):
+    source = HistorySource()
+    chunks = plan_chunks('2024-01-01', '2024-01-15', ['Tokyo', 'Osaka'], ['pm25'], chunk_days=7)
+    checkpoint = Checkpoint(str(tmp_path / 'backfill.checkpoint'))
+
+    report = backfill('air_quality', chunks, store, checkpoint, registry=_registry(source), workers=2)
+    checkpoint.close()
+
+    assert report['completed'] == 4 and report['failed'] == 0 and report['rows'] == 4
+    assert len(store.query_measurements([], [])) == 4
+    with open(tmp_path / 'backfill.checkpoint', encoding='utf-8') as f:
+        assert sorted(line.strip() for line in f) == sorted(chunk.id for chunk in chunks)
+
+
+def test_resume_skips_completed_chunks(store, tmp_path):
+    path = str(tmp_path / 'backfill.checkpoint')
+    chunks = plan_chunks('2024-01-01', '2024-01-22', ['Tokyo'], ['pm25'], chunk_days=7)
+    checkpoint = Checkpoint(path)
+    checkpoint.done(chunks[0].id)
+    checkpoint.close()
+    # 中断時に書きかけの行は一致する取得単位が無いため無視される
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(chunks[1].id[:10])
+
+    source = HistorySource()
+    resumed = Checkpoint(path)
+    report = backfill('air_quality', chunks, store, resumed, registry=_registry(source), workers=1)
+    resumed.close()
+
+    assert report['skipped'] == 1
+    assert report['completed'] == 2
+    assert sorted(date for _, _, date in source.calls) == ['2024-01-08', '2024-01-15']
+
+
+def test_transient_failures_are_retried(store, tmp_path):
+    source = HistorySource(failures=1)
+    chunks = plan_chunks('2024-01-01', '2024-01-08', ['Tokyo'], ['pm25'])
+    checkpoint = Checkpoint(str(tmp_path / 'backfill.checkpoint'))
+
+    report = backfill('air_quality', chunks, store, checkpoint, registry=_registry(source), retries=1)
+    checkpoint.close()
+
+    assert report['completed'] == 1
+    assert len(source.calls) == 2
+
+
+def test_truncated_chunks_are_split(store, tmp_path):
+    source = DenseHistorySource(max_days=2)
+    chunks = plan_chunks('2024-01-01', '2024-01-08', ['Tokyo'], ['pm25'])
+    checkpoint = Checkpoint(str(tmp_path / 'backfill.checkpoint'))
+
+    report = backfill('air_quality', chunks, store, checkpoint, registry=_registry(source))
+    checkpoint.close()
+
+    # 7日 -> 3日 + 4日 -> 1日 + 2日 + 2日 + 2日 に分けて全日分を取得する
+    assert report['completed'] == 1 and report['rows'] == 7
+    assert len(store.query_measurements([], [])) == 7
+    assert checkpoint.completed == {chunks[0].id}
+
+
+def test_chunks_truncated_within_a_day_are_not_checkpointed(store, tmp_path):
+    source = DenseHistorySource(max_days=0)
+    chunks = plan_chunks('2024-01-01', '2024-01-03', ['Tokyo'], ['pm25'])
+    checkpoint = Checkpoint(str(tmp_path / 'backfill.checkpoint'))
+
+    report = backfill('air_quality', chunks, store, checkpoint, registry=_registry(source))
+    checkpoint.close()
+
+    assert report['failed'] == 1 and report['completed'] == 0
+    assert not checkpoint.completed
+    assert store.query_measurements([], []) == []
+
+
+def test_openaq_history_raises_when_the_page_limit_is_hit(monkeypatch):
+    class FullPages:
+        def get(self, url, params=None, timeout=None):
+            response = type('Response', (), {'status_code': 200})()
+            response.json = lambda: {'results': [
+                {'locationId': 1, 'parameter': 'pm25', 'value': 10.0, 'unit': 'µg/m³',
+                 'date': {'utc': '2024-01-01T00:00:00Z'}}
+            ] * params['limit']}
+            return response
+
+    monkeypatch.setattr(data_sources, 'HAS_REQUESTS', True)
+    with pytest.raises(HistoryTruncated, match='exceeds 3 pages'):
+        OpenAQSource(FullPages()).fetch_history('2024-01-01', '2024-01-08', page_size=10, max_pages=3)
+
+
+def test_sources_without_history_fail_fast(store, tmp_path):
+    source = NoHistorySource()
+    chunks = plan_chunks('2024-01-01', '2024-03-01', ['Tokyo'], ['pm25'], chunk_days=1)
+    checkpoint = Checkpoint(str(tmp_path / 'backfill.checkpoint'))
+
+    with pytest.raises(HistoryUnsupported):
+        backfill('air_quality', chunks, store, checkpoint, registry=_registry(source), workers=1, retries=3)
+    checkpoint.close()
+
+    # 再試行せず、残りの取得単位も取り消される
+    assert len(source.calls) < len(chunks)
+    assert not checkpoint.completed
+
+
+def test_unconfigured_source_is_rejected(store, tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'backfill.checkpoint'))
+    with pytest.raises(ValueError, match='not configured'):
+        backfill('climate', plan_chunks('2024-01-01', '2024-01-08', [None], [None]), store, checkpoint,
+                 registry=_registry(HistorySource()))
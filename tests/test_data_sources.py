@@ -0,0 +1,111 @@
+"""
+データソースの登録・レート制限・スケジューラ
+"""
+
+import time
+
+import pytest
+
+from data_sources import (DataSource, HistoryUnsupported, SourceRegistry, SourceScheduler, SourceUnavailable,
+                          TokenBucket)
+
+
+class CountingSource(DataSource):
+    name = 'counting'
+    rate_limit = 100.0
+    burst = 10
+    schema = {'date': str, 'value': float}
+
+    def __init__(self, rows=None, error=None):
+        self.rows = rows if rows is not None else [{'date': '2024-01-01', 'value': '1.5'}]
+        self.error = error
+        self.calls = 0
+
+    def fetch(self, **params):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return [dict(row) for row in self.rows]
+
+
+def _scheduler(source):
+    registry = SourceRegistry()
+    registry.register(source)
+    return SourceScheduler(registry, wait_timeout=5.0)
+
+
+def test_data_source_requires_fetch():
+    class Incomplete(DataSource):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_history_is_unsupported_by_default():
+    with pytest.raises(HistoryUnsupported):
+        CountingSource().fetch_history('2024-01-01', '2024-02-01')
+
+
+def test_token_bucket_waits_after_burst():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert 0 < bucket.try_acquire() <= 0.1
+
+
+def test_token_bucket_without_rate_never_refills():
+    bucket = TokenBucket(rate=0.0, capacity=1)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == float('inf')
+    assert not bucket.acquire(timeout=0.01)
+
+
+def test_conform_casts_and_drops_rows_not_matching_schema():
+    source = CountingSource()
+    rows = source.conform([{'date': '2024-01-01', 'value': '2.5', 'extra': 1}, {'date': '2024-01-02'},
+                           {'date': '2024-01-03', 'value': 'n/a'}])
+    assert rows == [{'date': '2024-01-01', 'value': 2.5, 'extra': 1}]
+
+
+def test_scheduler_caches_conformed_rows_and_notifies_listeners():
+    source = CountingSource()
+    scheduler = _scheduler(source)
+    fetched = []
+    scheduler.add_listener(lambda name, params, rows: fetched.append((name, params, rows)))
+
+    assert scheduler.get('counting', location='Tokyo') == [{'date': '2024-01-01', 'value': 1.5}]
+    assert scheduler.get('counting', location='Tokyo') == [{'date': '2024-01-01', 'value': 1.5}]
+    assert source.calls == 1
+    assert fetched == [('counting', {'location': 'Tokyo'}, [{'date': '2024-01-01', 'value': 1.5}])]
+
+
+def test_scheduler_raises_until_a_fetch_succeeds():
+    scheduler = _scheduler(CountingSource(error=SourceUnavailable('down')))
+    with pytest.raises(SourceUnavailable):
+        scheduler.get('counting')
+    with pytest.raises(SourceUnavailable):
+        scheduler.get('counting')
+
+
+def test_failed_refresh_keeps_previous_rows():
+    source = CountingSource()
+    scheduler = _scheduler(source)
+    scheduler.get('counting')
+
+    source.error = SourceUnavailable('down')
+    with pytest.raises(SourceUnavailable):
+        scheduler.refresh('counting').result(timeout=5.0)
+
+    assert scheduler.get('counting') == [{'date': '2024-01-01', 'value': 1.5}]
+    entry = next(iter(scheduler.status()['counting']['results'].values()))
+    assert entry['error'] == 'down'
+
+
+def test_version_changes_after_refresh():
+    scheduler = _scheduler(CountingSource())
+    scheduler.get('counting')
+    before = scheduler.version()
+    time.sleep(0.01)
+    scheduler.refresh('counting').result(timeout=5.0)
+    assert scheduler.version() != before
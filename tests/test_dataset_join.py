@@ -0,0 +1,73 @@
+"""
+データセットの結合と相関
+"""
+
+import random
+
+import pytest
+
+import dataset_join
+import japan_environmental_data
+from dataset_join import JoinedTable, correlation_matrix, join
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param and not dataset_join.HAS_NUMPY:
+        pytest.skip('numpy is not installed')
+    monkeypatch.setattr(dataset_join, 'HAS_NUMPY', request.param)
+
+
+def test_join_averages_air_quality_and_skips_outliers(backend):
+    pollution = [{'location': '東京都', 'date': '2024-01-01', 'waste_generation_tons': 2000.0}]
+    air_quality = [
+        {'location': 'Tokyo', 'date': '2024-01-01T00:00:00Z', 'parameter': 'PM2.5', 'value': 10.0},
+        {'location': 'Tokyo', 'date': '2024-01-01T01:00:00Z', 'parameter': 'pm25', 'value': 20.0},
+        {'location': 'Tokyo', 'date': '2024-01-01T02:00:00Z', 'parameter': 'pm25', 'value': 500.0,
+         'quality': 'outlier'}
+    ]
+    climate = [{'date': '2024-01-01', 'temperature_anomaly': 1.2}]
+
+    table = join(pollution, {'東京都': 14_000_000}, air_quality, climate)
+
+    assert table.to_dicts() == [{
+        'prefecture': '東京都', 'date': '2024-01-01', 'population': 14_000_000,
+        'waste_generation_tons': 2000.0, 'pm25': 15.0, 'temperature_anomaly': 1.2,
+        'waste_kg_per_capita': pytest.approx(0.1429, abs=1e-4)
+    }]
+
+
+def test_correlation_is_null_below_min_pairs(backend):
+    table = JoinedTable([('東京都', str(i)) for i in range(5)],
+                        {'a': [1.0, 2.0, 3.0, 4.0, 5.0], 'b': [2.0, 4.0, 6.0, 8.0, 10.0]})
+    result = correlation_matrix(table)
+    assert result['matrix'] == [[None, None], [None, None]]
+    assert result['pairs'] == [[5, 5], [5, 5]]
+
+
+def test_correlation_uses_pairwise_complete_rows(backend):
+    rng = random.Random(0)
+    a = [rng.random() for _ in range(40)]
+    b = [None if i % 4 == 0 else 2 * x + 1 for i, x in enumerate(a)]
+    c = [1.0] * 40
+    table = JoinedTable([('東京都', str(i)) for i in range(40)], {'a': a, 'b': b, 'constant': c, 'empty': [None] * 40})
+
+    result = correlation_matrix(table)
+
+    assert result['fields'] == ['a', 'b', 'constant']
+    assert result['matrix'][0][1] == pytest.approx(1.0)
+    assert result['pairs'][0][1] == 30
+    # 定数列は分散0のため相関なし
+    assert result['matrix'][0][2] is None
+
+
+def test_cross_dataset_endpoint(client):
+    payload = client.get('/api/japan/cross-dataset').get_json()
+    assert payload['status'] == 'success'
+    correlation = payload['data']['correlation']
+    fields = correlation['fields']
+    pm25, emissions = fields.index('pm25'), fields.index('industrial_emissions')
+    # 都道府県 × 複数日の行で結合するため、データセット間の相関が計算される
+    assert correlation['pairs'][pm25][emissions] >= correlation['min_pairs']
+    assert correlation['matrix'][pm25][emissions] is not None
+    assert len({row['date'] for row in payload['data']['rows']}) == japan_environmental_data.CROSS_DATASET_DAYS
@@ -0,0 +1,183 @@
+"""
+ヘルスチェック（liveness / readiness）とウォームアップ
+"""
+
+import threading
+import time
+
+import pytest
+
+import health
+from api_layers import AdmissionController, ResponseCache
+from data_sources import DataSource, SourceRegistry, SourceScheduler
+from health import HealthMonitor
+
+
+class FlakySource(DataSource):
+    name = 'flaky'
+    rate_limit = 1000.0
+    burst = 10
+    retry_interval = 0.0
+
+    def __init__(self):
+        self.fail = False
+
+    def fetch(self, **params):
+        if self.fail or params.get('location') == 'nowhere':
+            raise RuntimeError('upstream down')
+        return [{'year': 2024, 'value': 1.0}]
+
+
+@pytest.fixture
+def scheduler():
+    registry = SourceRegistry()
+    registry.register(FlakySource())
+    scheduler = SourceScheduler(registry, wait_timeout=5.0)
+    yield scheduler
+    scheduler.stop()
+
+
+def _monitor(scheduler, **kwargs):
+    return HealthMonitor(scheduler, ResponseCache(), AdmissionController(), **kwargs)
+
+
+def test_liveness_requires_a_running_scheduler_only_when_started(scheduler):
+    assert _monitor(scheduler, background=False).liveness()[0]
+    alive, report = _monitor(scheduler, background=True).liveness()
+    assert not alive
+    assert (report['status'], report['scheduler']) == ('dead', 'stopped')
+
+
+def test_not_ready_while_warming_up(scheduler, monkeypatch):
+    monkeypatch.setattr(health, 'WARMUP_ENABLED', True)
+    monitor = _monitor(scheduler)
+    release = threading.Event()
+
+    def fill():
+        release.wait(5)
+        monitor.cache.set('key', {'data': []}, ttl=60)
+
+    monitor.warm_up({'climate': ('key', fill)})
+    ready, report = monitor.readiness()
+    assert not ready
+    assert report['status'] == 'starting'
+
+    release.set()
+    for _ in range(100):
+        if monitor.readiness()[0]:
+            break
+        time.sleep(0.05)
+    ready, report = monitor.readiness()
+    assert ready
+    assert report['warm_up']['completed'] == 1
+    assert report['datasets']['climate']['warm']
+
+
+def test_failed_warm_up_task_does_not_block_readiness(scheduler, monkeypatch):
+    monkeypatch.setattr(health, 'WARMUP_ENABLED', True)
+    monitor = _monitor(scheduler)
+
+    def broken():
+        raise RuntimeError('boom')
+
+    monitor.warm_up({'climate': ('key', broken)}, background=False)
+    ready, report = monitor.readiness()
+    assert ready
+    assert report['warm_up']['failed'] == ['climate']
+    assert not report['datasets']['climate']['warm']
+    assert report['cache']['cold_datasets_affect_readiness'] is False
+
+
+def test_full_admission_queue_is_not_ready(scheduler):
+    monitor = HealthMonitor(scheduler, ResponseCache(), AdmissionController(max_queue=0), background=False)
+    ready, report = monitor.readiness()
+    assert not ready
+    assert report['status'] == 'overloaded'
+
+
+def test_data_age_reports_the_source_in_use(scheduler):
+    monitor = _monitor(scheduler, background=False,
+                       inputs={'climate': {'climate': ['flaky', 'missing']}})
+    monitor.warm_up({'climate': ('key', lambda: None)}, background=False)
+
+    dataset = monitor.readiness()[1]['datasets']['climate']
+    assert dataset['data_age_seconds'] is None
+    assert dataset['data_sources'] == {'climate': None}
+
+    scheduler.get('flaky')
+    dataset = monitor.readiness()[1]['datasets']['climate']
+    assert dataset['data_sources'] == {'climate': 'flaky'}
+    assert dataset['data_age_seconds'] is not None and dataset['data_age_seconds'] < 5
+
+
+def test_failed_refresh_keeps_the_age_of_the_last_good_data(scheduler, monkeypatch):
+    monitor = _monitor(scheduler, background=False, inputs={'climate': {'climate': ['flaky']}})
+    monitor.warm_up({'climate': ('key', lambda: None)}, background=False)
+
+    clock = [1000.0]
+    monkeypatch.setattr('data_sources.time.time', lambda: clock[0])
+    monkeypatch.setattr('health.time.time', lambda: clock[0])
+    scheduler.get('flaky')
+
+    clock[0] += 600
+    scheduler.registry.get('flaky').fail = True
+    with pytest.raises(RuntimeError):
+        scheduler.refresh('flaky').result(timeout=5)
+
+    report = monitor.readiness()[1]
+    assert report['upstream']['flaky']['status'] == 'failing'
+    assert report['upstream']['flaky']['age_seconds'] == 0
+    assert report['datasets']['climate']['data_age_seconds'] == 600
+    assert report['status'] == 'degraded'
+
+
+def test_ad_hoc_parameters_do_not_affect_source_status(scheduler, monkeypatch):
+    monitor = _monitor(scheduler, background=False, inputs={'climate': {'climate': ['flaky']}})
+    monitor.warm_up({'climate': ('key', lambda: None)}, background=False)
+
+    clock = [1000.0]
+    monkeypatch.setattr('data_sources.time.time', lambda: clock[0])
+    monkeypatch.setattr('health.time.time', lambda: clock[0])
+    scheduler.get('flaky', location='Osaka')
+    clock[0] += 600
+    scheduler.get('flaky')
+    with pytest.raises(RuntimeError):
+        scheduler.get('flaky', location='nowhere')
+
+    report = monitor.readiness()[1]
+    # リクエストで指定された条件の失敗・古い結果はデータソースの状態と経過時間に含めない
+    assert report['upstream']['flaky']['status'] == 'ok'
+    assert report['datasets']['climate']['data_age_seconds'] == 0
+    assert report['status'] == 'healthy'
+
+
+def test_data_availability_follows_the_warm_up(scheduler, monkeypatch):
+    assert _monitor(scheduler).readiness()[1]['japan_data_available'] is None
+
+    monkeypatch.setattr(health, 'WARMUP_ENABLED', True)
+    monitor = _monitor(scheduler)
+
+    def broken():
+        raise RuntimeError('boom')
+
+    monitor.warm_up({'climate': ('key', broken)}, background=False)
+    assert monitor.readiness()[1]['japan_data_available'] is False
+    monitor.warm_up({'climate': ('key', lambda: None)}, background=False)
+    assert monitor.readiness()[1]['japan_data_available'] is True
+
+
+def test_health_endpoints(client, app):
+    assert client.get('/api/health/live').status_code == 200
+
+    # ウォームアップが無効でも readiness の対象データセットは登録される
+    app.extensions['health'].warm_up({'climate': ('key', lambda: None)})
+    response = client.get('/api/health/ready')
+    assert response.status_code == 200
+    dataset = response.get_json()['datasets']['climate']
+    assert not dataset['warm']
+    assert set(dataset['data_sources']) == {'climate'}
+
+    app.extensions['admission'].max_queue = 0
+    response = client.get('/api/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'overloaded'
@@ -0,0 +1,108 @@
+"""
+大気質データのライブ配信
+"""
+
+import threading
+import time
+
+from live_feed import AirQualityBroadcaster, Subscription
+
+
+class FakeScheduler:
+    def add_listener(self, listener):
+        self.listener = listener
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.scheduler = FakeScheduler()
+
+    def get_air_quality_data(self, prefecture):
+        return []
+
+
+def _reading(station, value, date='2024-01-01T00:00:00Z', parameter='pm25'):
+    return {'location': 'Tokyo', 'station': station, 'parameter': parameter, 'value': value, 'date': date}
+
+
+def _broadcaster(**kwargs):
+    return AirQualityBroadcaster(FakeFetcher(), poll_interval=3600.0, **kwargs)
+
+
+def test_publishes_only_new_or_changed_readings():
+    feed = _broadcaster()
+    subscription = feed.subscribe('Tokyo')
+
+    assert len(feed.publish('Tokyo', [_reading('1', 10.0), _reading('2', 80.0)])) == 2
+    assert feed.publish('Tokyo', [_reading('1', 10.0), _reading('2', 80.0)]) == []
+    assert feed.publish('Tokyo', [_reading('1', 12.0, '2024-01-01T01:00:00Z')]) == [
+        _reading('1', 12.0, '2024-01-01T01:00:00Z')
+    ]
+    assert subscription.queue.qsize() == 2
+    feed.unsubscribe(subscription)
+
+
+def test_stations_in_one_city_are_kept_apart():
+    feed = _broadcaster()
+    subscription = feed.subscribe('Tokyo')
+    feed.publish('Tokyo', [_reading('1', 10.0), _reading('2', 80.0)])
+    assert sorted(row['value'] for row in feed.snapshot('Tokyo')) == [10.0, 80.0]
+    feed.unsubscribe(subscription)
+
+
+def test_older_readings_do_not_replace_the_latest():
+    feed = _broadcaster()
+    subscription = feed.subscribe('Tokyo')
+    feed.publish('Tokyo', [_reading('1', 12.0, '2024-01-01T01:00:00Z'), _reading('1', 10.0)])
+    assert feed.snapshot('Tokyo') == [_reading('1', 12.0, '2024-01-01T01:00:00Z')]
+    feed.unsubscribe(subscription)
+
+
+def test_readings_not_seen_within_retention_are_dropped():
+    feed = _broadcaster(retention=0.05)
+    subscription = feed.subscribe('Tokyo')
+    feed.publish('Tokyo', [_reading('1', 10.0)])
+    time.sleep(0.1)
+    feed.publish('Tokyo', [_reading('2', 80.0)])
+    assert feed.snapshot('Tokyo') == [_reading('2', 80.0)]
+    feed.unsubscribe(subscription)
+
+
+def test_slow_subscriber_drops_oldest_events():
+    subscription = Subscription('Tokyo', maxsize=2)
+    for i in range(5):
+        subscription.put({'id': i})
+    assert subscription.dropped == 3
+    assert [subscription.queue.get_nowait()['id'] for _ in range(2)] == [3, 4]
+
+
+def test_unsubscribe_stops_publishing():
+    feed = _broadcaster()
+    subscription = feed.subscribe('Tokyo')
+    feed.unsubscribe(subscription)
+    assert feed.subscriber_count() == 0
+    assert feed.publish('Tokyo', [_reading('1', 10.0)]) == []
+
+
+def test_stream_subscribes_only_once_read():
+    feed = _broadcaster()
+    stream = feed.stream('Tokyo', heartbeat=0.01)
+    assert feed.subscriber_count() == 0
+
+    assert next(stream) == ": keep-alive\n\n"
+    assert feed.subscriber_count() == 1
+    stream.close()
+    assert feed.subscriber_count() == 0
+
+
+def test_stream_endpoint_rejects_unknown_prefectures(client):
+    assert client.get('/api/japan/air-quality/stream?prefecture=X0').status_code == 400
+
+
+def test_head_on_stream_starts_no_poller(client):
+    before = {thread.name for thread in threading.enumerate()}
+    response = client.head('/api/japan/air-quality/stream?prefecture=Osaka')
+    assert response.status_code == 200
+    response.close()
+    started = {thread.name for thread in threading.enumerate()} - before
+    assert not [name for name in started if name.startswith('live-feed-')]
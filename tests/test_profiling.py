@@ -0,0 +1,58 @@
+"""
+リクエスト単位のプロファイリング
+"""
+
+import time
+
+from profiling import PROFILE_HEADER, Profiler, profiled, span
+
+
+@profiled('work')
+def _work():
+    with span('inner'):
+        time.sleep(0.002)
+    return 42
+
+
+def test_spans_are_noops_without_a_profile():
+    assert _work() == 42
+    with span('outside') as record:
+        assert record is None
+
+
+def test_nested_spans_and_server_timing():
+    profiler = Profiler(sample_rate=0)
+    token = profiler.begin('/api/test')
+    _work()
+    profile = profiler.finish(token, 200)
+
+    assert [(record['name'], record['depth']) for record in profile.spans] == [('work', 0), ('inner', 1)]
+    assert profile.breakdown()['work'] >= profile.breakdown()['inner'] > 0
+    assert profile.server_timing().startswith('work;dur=')
+    assert profile.to_dict()['status'] == 200
+
+
+def test_keeps_only_the_slowest_profiles():
+    profiler = Profiler(sample_rate=0, keep=2)
+    for delay in (0.0, 0.01, 0.005):
+        token = profiler.begin(f"/api/{delay}")
+        time.sleep(delay)
+        profiler.finish(token, 200)
+
+    assert profiler.profiled == 3
+    assert [profile['route'] for profile in profiler.slowest()] == ['/api/0.01', '/api/0.005']
+
+
+def test_header_opts_in():
+    profiler = Profiler(sample_rate=0)
+    assert profiler.should_profile({PROFILE_HEADER: '1'})
+    assert not profiler.should_profile({})
+
+
+def test_profiled_request_returns_server_timing(client):
+    response = client.get('/api/japan/climate', headers={PROFILE_HEADER: '1'})
+    assert response.status_code == 200
+    assert 'fetch;dur=' in response.headers['Server-Timing']
+
+    slowest = client.get('/api/admin/profiles').get_json()['slowest']
+    assert slowest[0]['route'] == '/api/japan/climate'
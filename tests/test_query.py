@@ -0,0 +1,129 @@
+"""
+データセット横断のクエリ
+"""
+
+import pytest
+
+import query
+from local_store import LocalStore
+from query import QueryFilter, QueryPlanner
+
+
+class FakeFetcher:
+    """メモリ上の大気質データとローカルストアだけを持つフェッチャー"""
+
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def get_air_quality_data(self, location):
+        return [row for row in self.rows if row['location'] == location]
+
+
+def _row(date, value, location='Tokyo', parameter='pm25', station='1'):
+    return {'date': date, 'location': location, 'parameter': parameter, 'value': value, 'unit': 'µg/m³',
+            'source': 'OpenAQ', 'station': station}
+
+
+@pytest.fixture
+def planner(tmp_path):
+    store = LocalStore(str(tmp_path / 'store.db'))
+    store.insert_measurements([
+        _row('2024-01-01T00:00:00Z', 12.0),
+        _row('2024-01-01T01:00:00Z', 40.0),
+        _row('2024-01-02T00:00:00Z', 55.0),
+        _row('2024-01-01T00:00:00Z', 70.0, location='Osaka'),
+        _row('2024-01-01T00:00:00Z', 30.0, parameter='no2')
+    ])
+    memory = [
+        _row('2024-01-03T00:00:00Z', 60.0),
+        # ストアと同じ測定値はメモリ上のものを優先する
+        _row('2024-01-02T00:00:00Z', 55.0)
+    ]
+    return QueryPlanner(FakeFetcher(store, memory), ['Tokyo'])
+
+
+def test_unknown_dataset_and_columns_are_rejected():
+    with pytest.raises(ValueError, match='unknown dataset'):
+        QueryFilter('weather')
+    with pytest.raises(ValueError, match='no location column'):
+        QueryFilter('energy-emissions', location='Tokyo')
+    with pytest.raises(ValueError, match='no parameter column'):
+        QueryFilter('climate', parameter='pm25')
+
+
+def test_non_numeric_field_is_rejected():
+    with pytest.raises(ValueError, match='numeric column'):
+        QueryFilter('pollution', field='location', value_gt=1)
+
+
+def test_date_only_upper_bound_includes_the_whole_day():
+    assert QueryFilter(date_to='2024-01-31').date_to == '2024-02-01'
+
+
+def test_combines_memory_and_store_rows(planner):
+    rows, plan = planner.run(QueryFilter(location='Tokyo', parameter='PM2.5', value_gt=35))
+
+    assert [(row['date'], row['value']) for row in rows] == [
+        ('2024-01-03T00:00:00Z', 60.0), ('2024-01-02T00:00:00Z', 55.0), ('2024-01-01T01:00:00Z', 40.0)
+    ]
+    store_step = next(step for step in plan['steps'] if step['source'] == 'store')
+    assert 'value > ?' in store_step['pushed_down']
+    assert plan['rows'] == 3
+
+
+def test_chooses_the_most_selective_store_index(planner):
+    _, plan = planner.run(QueryFilter(location='Tokyo', date_from='2024-01-02', date_to='2024-01-02'))
+    store_step = next(step for step in plan['steps'] if step['source'] == 'store')
+    assert store_step['index'] == 'idx_measurements_date'
+    assert store_step['estimated_rows'] == 1
+
+
+def test_stations_in_one_city_are_not_deduplicated(planner):
+    planner.fetcher.store.insert_measurements([_row('2024-01-02T00:00:00Z', 20.0, station='2')])
+    planner.record_inserted([_row('2024-01-02T00:00:00Z', 20.0, station='2')])
+    rows, _ = planner.run(QueryFilter(location='Tokyo', date_from='2024-01-02', date_to='2024-01-02'))
+    assert sorted(row['value'] for row in rows) == [20.0, 55.0]
+
+
+def test_store_statistics_are_updated_without_rescanning(planner, monkeypatch):
+    planner.run(QueryFilter(location='Tokyo'))
+    store = planner.fetcher.store
+    monkeypatch.setattr(store, 'query', lambda *args: pytest.fail('statistics were rescanned'))
+
+    planner.record_inserted([_row('2024-01-05T00:00:00Z', 20.0, location='Kobe')])
+    statistics = planner._statistics
+    assert statistics.location_counts['Kobe'] == 1
+    assert statistics.total == 6
+    assert statistics.estimate(QueryFilter(date_from='2024-01-05'))[0] == ('idx_measurements_date', 1)
+
+
+def test_limit_is_pushed_into_the_store_query(planner):
+    rows, plan = planner.run(QueryFilter(location='Tokyo'), limit=2)
+    assert [row['date'] for row in rows] == ['2024-01-03T00:00:00Z', '2024-01-02T00:00:00Z']
+    assert plan['truncated']
+    store_step = next(step for step in plan['steps'] if step['source'] == 'store')
+    # メモリ上の2行と重複する分を見込んで limit + 2 行だけ読む
+    assert (store_step['limit'], store_step['rows']) == (4, 4)
+
+
+def test_memory_indexes_are_bounded(planner, monkeypatch):
+    monkeypatch.setattr(query, 'MEMORY_INDEX_CACHE_SIZE', 3)
+    for i in range(10):
+        planner.run(QueryFilter(location=f"Unknown{i}"))
+    assert list(planner._indexes) == [('air-quality', f"Unknown{i}") for i in range(7, 10)]
+
+
+def test_simulated_dataset_threshold(client):
+    payload = client.get('/api/japan/query?dataset=pollution&value_gt=50').get_json()
+    assert payload['status'] == 'success'
+    assert payload['data'] and all(row['industrial_emissions'] > 50 for row in payload['data'])
+
+    plan = client.get('/api/japan/query?dataset=pollution&value_gt=50&explain=1').get_json()['data']
+    assert plan['rows'] == payload['count']
+
+
+def test_non_numeric_field_returns_400(client):
+    # 文字列の列と数値のしきい値の比較（TypeError）で500にならない
+    response = client.get('/api/japan/query?dataset=pollution&field=location&value_gt=1')
+    assert response.status_code == 400
@@ -0,0 +1,46 @@
+"""
+列指向のレコードバッチ
+"""
+
+from records import CATEGORY, FLOAT, INT, NUMBER, RecordBatch
+
+SCHEMA = (('date', CATEGORY), ('location', CATEGORY), ('count', INT), ('value', FLOAT), ('share', NUMBER))
+
+
+def test_round_trip_and_missing_values():
+    rows = [
+        {'date': '2024-01-01', 'location': '東京都', 'count': 3, 'value': 1.5, 'share': 12},
+        {'date': '2024-01-01', 'location': '大阪府', 'count': None, 'value': None, 'share': 7.25},
+        {'date': '2024-01-02', 'location': None, 'count': 0, 'value': 0.0, 'share': None}
+    ]
+    batch = RecordBatch(SCHEMA, rows)
+
+    assert len(batch) == 3
+    assert batch.to_dicts() == [
+        {'date': '2024-01-01', 'location': '東京都', 'count': 3, 'value': 1.5, 'share': 12},
+        {'date': '2024-01-01', 'location': '大阪府', 'share': 7.25},
+        {'date': '2024-01-02', 'count': 0, 'value': 0.0}
+    ]
+    assert batch.column('count') == [3, None, 0]
+    assert batch.column('location') == ['東京都', '大阪府', None]
+
+
+def test_number_columns_keep_integer_type():
+    batch = RecordBatch(SCHEMA, [{'share': 40}, {'share': 40.0}])
+    shares = [row['share'] for row in batch]
+    assert [type(share) for share in shares] == [int, float]
+    assert [type(share) for share in batch.column('share')] == [int, float]
+
+
+def test_strings_are_pooled_per_batch():
+    first = RecordBatch(SCHEMA, [{'location': '東京都'}, {'location': '東京都'}, {'location': '大阪府'}])
+    second = RecordBatch(SCHEMA, [{'location': '札幌市'}])
+    assert len(first.strings) == 2
+    assert len(second.strings) == 1
+    assert first.strings.encode('東京都') == first.strings.encode('東京都')
+
+
+def test_nbytes_counts_column_arrays():
+    batch = RecordBatch(SCHEMA, [{'date': '2024-01-01', 'share': 1}] * 10)
+    # CATEGORY 2列(4バイト) + INT(8) + FLOAT(8) + NUMBER(8 + 整数フラグ1)
+    assert batch.nbytes() == 10 * (4 * 2 + 8 + 8 + 8 + 1)
@@ -0,0 +1,146 @@
+"""
+エネルギー構成のシナリオシミュレーション
+"""
+
+import pytest
+
+import process_pool
+import scenarios
+from scenarios import ENERGY_SOURCES, ScenarioEngine, simulate_random
+
+BASELINE = [
+    {'energy_source': '石炭', 'generation_percentage': 30.0, 'co2_factor': 0.94},
+    {'energy_source': '天然ガス', 'generation_percentage': 35.0, 'co2_factor': 0.47},
+    {'energy_source': '石油', 'generation_percentage': 5.0, 'co2_factor': 0.70},
+    {'energy_source': '原子力', 'generation_percentage': 10.0, 'co2_factor': 0.0},
+    {'energy_source': '再生可能エネルギー', 'generation_percentage': 20.0, 'co2_factor': 0.0}
+]
+CURRENT = [30.0, 35.0, 5.0, 10.0, 20.0]
+RENEWABLE_ONLY = [0.0, 0.0, 0.0, 0.0, 100.0]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param and not scenarios.HAS_NUMPY:
+        pytest.skip('numpy is not installed')
+    monkeypatch.setattr(scenarios, 'HAS_NUMPY', request.param)
+
+
+@pytest.fixture
+def engine():
+    return ScenarioEngine(BASELINE, 2025, 1000.0)
+
+
+def test_unchanged_mix_keeps_base_emissions(backend, engine):
+    result = engine.run([CURRENT], 2050)
+    base = 1000.0 * (0.30 * 0.94 + 0.35 * 0.47 + 0.05 * 0.70)
+
+    assert result['base_emissions_mt'] == pytest.approx(base, abs=0.01)
+    assert result['scenarios'][0]['final_emissions_mt'] == pytest.approx(base, abs=0.01)
+    assert result['scenarios'][0]['reduction_percent'] == 0.0
+
+
+def test_scenarios_are_ranked_by_cumulative_emissions(backend, engine):
+    result = engine.run([CURRENT, RENEWABLE_ONLY, [60, 20, 20, 0, 0]], 2050, include_trajectories=True)
+
+    assert [scenario['index'] for scenario in result['scenarios']] == [1, 0, 2]
+    best = result['scenarios'][0]
+    assert best['final_emissions_mt'] == 0.0
+    assert best['carbon_neutral'] and result['carbon_neutral_scenarios'] == 1
+    assert best['final_renewable_ratio'] == 100.0
+    assert len(best['emissions_mt']) == 2050 - 2025 + 1
+
+
+def test_demand_growth_per_scenario(backend, engine):
+    result = engine.run([CURRENT, CURRENT], 2026, demand_growth=[0.0, 0.1])
+    finals = sorted(scenario['final_emissions_mt'] for scenario in result['scenarios'])
+    assert finals[1] == pytest.approx(finals[0] * 1.1, rel=1e-3)
+
+
+def test_shares_are_normalized(backend, engine):
+    result = engine.run([[0, 0, 0, 0, 1]], 2050)
+    assert result['scenarios'][0]['mix']['再生可能エネルギー'] == 100.0
+
+
+@pytest.mark.parametrize('mixes, message', [
+    ([[1, 2, 3]], 'shares'),
+    ([[-1, 0, 0, 0, 2]], 'non-negative'),
+    ([[0, 0, 0, 0, 0]], 'positive total'),
+    ([], 'no scenarios|matrix')
+])
+def test_invalid_mixes(backend, engine, mixes, message):
+    with pytest.raises(ValueError, match=message):
+        engine.run(mixes, 2050)
+
+
+@pytest.mark.parametrize('target_year, top, message', [
+    (2025, 20, 'target_year'),
+    (scenarios.MAX_TARGET_YEAR + 1, 20, 'target_year'),
+    (2050, scenarios.MAX_TOP + 1, 'top'),
+    (2050, -1, 'top')
+])
+def test_run_options_are_bounded(engine, target_year, top, message):
+    with pytest.raises(ValueError, match=message):
+        engine.run([CURRENT], target_year, top=top)
+    with pytest.raises(ValueError, match=message):
+        simulate_random(BASELINE, 2025, 1000.0, 10, target_year=target_year, top=top)
+
+
+def test_sharded_random_run_matches_shard_totals(monkeypatch):
+    # プールを使わずに（このプロセスで）3つに分割して結合する
+    monkeypatch.setattr(process_pool, 'POOL_WORKERS', 1)
+    monkeypatch.setattr(scenarios, 'SHARD_SIZE', 100)
+
+    result = simulate_random(BASELINE, 2025, 1000.0, 300, seed=1, top=5)
+
+    assert result['shards'] == 3
+    assert result['scenario_count'] == 300
+    assert len(result['scenarios']) == 5
+    cumulative = [scenario['cumulative_emissions_mt'] for scenario in result['scenarios']]
+    assert cumulative == sorted(cumulative)
+    assert len({scenario['index'] for scenario in result['scenarios']}) == 5
+
+    # 百分位はシャードの百分位の平均ではなく、全シナリオの目標年の排出量から計算する
+    final = []
+    for i in range(3):
+        final.extend(scenarios._run_shard((BASELINE, 2025, 1000.0, 100, 1 * 1_000_003 + i, 2050, 0.0, 5, False))[1])
+    assert result['final_emissions_mt'] == {
+        name: round(value, 2) for name, value in scenarios._percentiles(final).items()
+    }
+
+
+def test_random_run_does_not_depend_on_pool_size(monkeypatch):
+    monkeypatch.setattr(process_pool, 'POOL_WORKERS', 1)
+    monkeypatch.setattr(scenarios, 'SHARD_SIZE', 100)
+    results = []
+    for workers in (1, 2, 8):
+        monkeypatch.setattr(process_pool, 'size', lambda workers=workers: workers)
+        results.append(simulate_random(BASELINE, 2025, 1000.0, 250, seed=3))
+    assert results[0] == results[1] == results[2]
+
+
+def test_random_run_is_reproducible():
+    first = simulate_random(BASELINE, 2025, 1000.0, 200, seed=7)
+    assert simulate_random(BASELINE, 2025, 1000.0, 200, seed=7) == first
+    with pytest.raises(ValueError):
+        simulate_random(BASELINE, 2025, 1000.0, 0)
+
+
+def test_scenario_endpoint_post(client):
+    response = client.post('/api/japan/energy-scenarios', json={'mixes': [CURRENT, RENEWABLE_ONLY], 'top': 1})
+    payload = response.get_json()
+    assert response.status_code == 200
+    assert payload['data']['sources'] == ENERGY_SOURCES
+    assert [scenario['index'] for scenario in payload['data']['scenarios']] == [1]
+
+
+@pytest.mark.parametrize('query', ['target_year=2030000', 'top=100000000'])
+def test_scenario_endpoint_rejects_unbounded_options(client, query):
+    assert client.get(f"/api/japan/energy-scenarios?{query}").status_code == 400
+
+
+@pytest.mark.parametrize('body', [{'samples': [1]}, {'mixes': [['coal']]}, ['not', 'an', 'object'],
+                                  {'mixes': {'a': 1}}, {'mixes': 5}, {'mixes': [5]}, {'mixes': [{'a': 1}]}])
+def test_scenario_endpoint_rejects_bad_bodies(client, body):
+    # 本文の値の型の誤り（TypeError）で500にならない
+    assert client.post('/api/japan/energy-scenarios', json=body).status_code == 400
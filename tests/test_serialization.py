@@ -0,0 +1,56 @@
+"""
+JSONシリアライザ
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+import json
+
+import pytest
+
+import serialization
+
+
+@pytest.fixture(params=[True, False], ids=['orjson', 'stdlib'])
+def backend(request, monkeypatch):
+    if request.param and not serialization.HAS_ORJSON:
+        pytest.skip('orjson is not installed')
+    monkeypatch.setattr(serialization, 'HAS_ORJSON', request.param)
+
+
+def test_standard_and_extra_types(backend):
+    value = {
+        'name': '東京都',
+        'when': datetime(2024, 1, 2, 3, 4, 5),
+        'day': date(2024, 1, 2),
+        'amount': Decimal('1.5'),
+        'id': UUID('12345678-1234-5678-1234-567812345678'),
+        'tags': frozenset(['pm25']),
+        'big': 2 ** 70
+    }
+    assert json.loads(serialization.dumps(value)) == {
+        'name': '東京都',
+        'when': '2024-01-02T03:04:05',
+        'day': '2024-01-02',
+        'amount': 1.5,
+        'id': '12345678-1234-5678-1234-567812345678',
+        'tags': ['pm25'],
+        'big': 2 ** 70
+    }
+    assert '東京都' in serialization.dumps_str(value)
+
+
+def test_numpy_values(backend):
+    np = pytest.importorskip('numpy')
+    value = {'count': np.int64(3), 'mean': np.float64(1.25), 'series': np.arange(3)}
+    assert json.loads(serialization.dumps(value)) == {'count': 3, 'mean': 1.25, 'series': [0, 1, 2]}
+
+
+def test_unknown_types_are_rejected(backend):
+    with pytest.raises(TypeError):
+        serialization.dumps({'value': object()})
+
+
+def test_sort_keys(backend):
+    assert serialization.dumps({'b': 1, 'a': 2}, sort_keys=True) == b'{"a":2,"b":1}'
@@ -0,0 +1,99 @@
+"""
+初回表示用のスナップショットバンドル
+"""
+
+import gzip
+import json
+import os
+import threading
+
+from snapshot_bundle import BUNDLE_DATASETS, SnapshotBundler
+
+
+def test_unchanged_content_keeps_the_version(app, tmp_path):
+    bundler = SnapshotBundler(app.extensions['japan_data_fetcher'], str(tmp_path / 'bundles'))
+    first = bundler.build()
+    second = bundler.build()
+
+    assert first['version'] == second['version']
+    assert set(first['datasets']) == set(BUNDLE_DATASETS) | {'air-quality'}
+    with open(bundler.path(first['version']), 'rb') as f:
+        bundle = json.loads(gzip.decompress(f.read()))
+    assert bundle['version'] == first['version']
+
+
+def test_manifest_survives_restart(app, tmp_path):
+    fetcher = app.extensions['japan_data_fetcher']
+    manifest = SnapshotBundler(fetcher, str(tmp_path / 'bundles')).build()
+    assert SnapshotBundler(fetcher, str(tmp_path / 'bundles')).manifest() == manifest
+
+
+def test_old_versions_are_pruned(app, tmp_path):
+    directory = tmp_path / 'bundles'
+    bundler = SnapshotBundler(app.extensions['japan_data_fetcher'], str(directory), keep=2)
+    os.makedirs(directory)
+    for i in range(3):
+        path = directory / f"bundle-old{i}.json.gz"
+        path.write_bytes(b'')
+        os.utime(path, (1_700_000_000 + i, 1_700_000_000 + i))
+
+    manifest = bundler.build()
+
+    # 現在の版と、それ以外で最も新しい版だけが残る
+    assert sorted(os.listdir(directory)) == sorted([
+        'manifest.json', 'bundle-old2.json.gz', f"bundle-{manifest['version']}.json.gz"
+    ])
+
+
+def test_concurrent_builds_and_writes_do_not_collide(app, tmp_path):
+    directory = tmp_path / 'bundles'
+    bundler = SnapshotBundler(app.extensions['japan_data_fetcher'], str(directory))
+    errors, manifests = [], []
+
+    def build():
+        try:
+            manifests.append(bundler.build())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len({manifest['version'] for manifest in manifests}) == 1
+    assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+    # ロックの外（作成以外）からの同時の書き込みも別々の一時ファイルを使う
+    target = str(directory / 'shared.bin')
+    writers = [threading.Thread(target=SnapshotBundler._write_atomic, args=(target, bytes([i]) * 100_000))
+               for i in range(8)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    data = (directory / 'shared.bin').read_bytes()
+    assert len(data) == 100_000 and len(set(data)) == 1
+
+
+def test_unknown_or_unsafe_versions_are_not_served(app, tmp_path):
+    bundler = SnapshotBundler(app.extensions['japan_data_fetcher'], str(tmp_path / 'bundles'))
+    assert bundler.path('../manifest') is None
+    assert bundler.path('0123456789abcdef') is None
+
+
+def test_bundle_endpoints(client):
+    manifest = client.get('/api/japan/snapshot/manifest')
+    assert manifest.status_code == 200
+    version = manifest.get_json()['manifest']['version']
+
+    assert client.get('/api/japan/snapshot/manifest', headers={'If-None-Match': f'"{version}"'}).status_code == 304
+
+    bundle = client.get(f"/api/japan/snapshot/{version}")
+    assert bundle.status_code == 200
+    assert 'immutable' in bundle.headers['Cache-Control']
+    assert json.loads(bundle.data)['version'] == version
+
+    assert client.get('/api/japan/snapshot/ffffffffffffffff').status_code == 404
@@ -0,0 +1,89 @@
+"""
+観測局の空間インデックス
+"""
+
+import random
+
+import pytest
+
+from spatial_index import GridIndex, haversine_km
+
+
+def _points(count, seed=0):
+    rng = random.Random(seed)
+    return [{'station_id': str(i), 'latitude': rng.uniform(24.0, 46.0), 'longitude': rng.uniform(123.0, 146.0)}
+            for i in range(count)]
+
+
+def test_haversine_tokyo_osaka():
+    assert haversine_km(35.6812, 139.7671, 34.7025, 135.4959) == pytest.approx(403, abs=2)
+
+
+def test_within_radius_matches_brute_force():
+    points = _points(2000)
+    index = GridIndex(points)
+
+    found = index.within_radius(35.68, 139.76, 150.0)
+
+    expected = sorted(
+        (haversine_km(35.68, 139.76, p['latitude'], p['longitude']), p['station_id']) for p in points
+    )
+    expected = [station_id for distance, station_id in expected if distance <= 150.0]
+    assert [point['station_id'] for _, point in found] == expected
+    assert [distance for distance, _ in found] == sorted(distance for distance, _ in found)
+
+
+def test_within_radius_limit():
+    index = GridIndex(_points(500))
+    assert len(index.within_radius(35.68, 139.76, 1000.0, limit=5)) == 5
+
+
+def test_within_bbox_matches_brute_force():
+    points = _points(2000, seed=1)
+    index = GridIndex(points)
+
+    found = {point['station_id'] for point in index.within_bbox(34.0, 135.0, 36.0, 140.0)}
+
+    assert found == {p['station_id'] for p in points
+                     if 34.0 <= p['latitude'] <= 36.0 and 135.0 <= p['longitude'] <= 140.0}
+
+
+def test_bbox_wider_than_populated_cells():
+    # セル数より広い範囲は空でないセルだけを走査する
+    points = _points(50, seed=2)
+    assert len(GridIndex(points, cell_size=0.01).within_bbox(-90, -180, 90, 180)) == 50
+
+
+def test_invalid_coordinates_are_skipped():
+    index = GridIndex([
+        {'latitude': 35.0, 'longitude': 139.0},
+        {'latitude': None, 'longitude': 139.0},
+        {'latitude': 'x', 'longitude': 139.0},
+        {'latitude': 95.0, 'longitude': 139.0},
+        {'longitude': 139.0}
+    ])
+    assert len(index) == 1
+
+
+def test_nearby_stations_endpoint(client):
+    response = client.get('/api/japan/stations/nearby?lat=35.68&lon=139.76&radius_km=50')
+    assert response.status_code == 200
+    distances = [station['distance_km'] for station in response.get_json()['data']]
+    assert distances and distances == sorted(distances)
+    assert all(distance <= 50 for distance in distances)
+
+
+def test_nearby_stations_requires_coordinates(client):
+    assert client.get('/api/japan/stations/nearby?lat=35.68').status_code == 400
+
+
+def test_station_index_follows_fetched_stations(app):
+    fetcher = app.extensions['japan_data_fetcher']
+    assert not fetcher.find_stations_near(24.34, 124.16, 1.0)
+
+    fetcher._on_source_fetched('openaq_stations', {}, [{
+        'station_id': '9001', 'name': '石垣', 'city': 'Ishigaki', 'latitude': 24.34, 'longitude': 124.16,
+        'latest': [], 'source': 'OpenAQ'
+    }])
+
+    assert [station['station_id'] for station in fetcher.find_stations_near(24.34, 124.16, 1.0)] == ['9001']
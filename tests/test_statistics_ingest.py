@@ -0,0 +1,56 @@
+"""
+統計CSVの取り込み
+"""
+
+import pytest
+
+from local_store import LocalStore
+from statistics_ingest import ingest_csv
+
+
+def _write(path, lines):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_energy_mix_units_categories_and_rejects(tmp_path):
+    path = _write(tmp_path / 'energy.csv', [
+        '年度,電源,発電電力量,単位,排出係数',
+        '2022,LNG,"3,000",億kWh,0.47',
+        '2022,石炭,2500,億kWh,0.94',
+        '2022,太陽光,900,億kWh,0',
+        '2022,石油,-1,億kWh,0.7',
+        '2022,原子力,,億kWh,0'
+    ])
+    store = LocalStore(str(tmp_path / 'store.db'))
+
+    report = ingest_csv('energy_mix', path, store, chunk_size=2)
+
+    assert report['rows_read'] == 5
+    assert report['rows_loaded'] == 3
+    assert report['rows_rejected'] == 2
+    assert report['chunks'] == 3
+    mix = {row['energy_source']: row for row in store.latest_energy_mix()}
+    assert set(mix) == {'天然ガス', '石炭', '再生可能エネルギー'}
+    assert mix['天然ガス']['generation_twh'] == pytest.approx(300.0)
+    assert sum(row['generation_percentage'] for row in mix.values()) == pytest.approx(100.0)
+
+
+def test_population_units(tmp_path):
+    path = _write(tmp_path / 'pollution.csv', [
+        '年度,都道府県,工業指数,人口,人口単位',
+        '2022,東京都,95.5,1404,万人'
+    ])
+    store = LocalStore(str(tmp_path / 'store.db'))
+
+    ingest_csv('pollution_baseline', path, store)
+
+    assert store.latest_pollution_baseline() == [
+        {'year': 2022, 'location': '東京都', 'industrial_index': 95.5, 'population': 14040000}
+    ]
+
+
+def test_missing_column_is_reported(tmp_path):
+    path = _write(tmp_path / 'energy.csv', ['年度,電源', '2022,石炭'])
+    with pytest.raises(ValueError, match='generation_twh'):
+        ingest_csv('energy_mix', path, LocalStore(str(tmp_path / 'store.db')))
@@ -0,0 +1,140 @@
+"""
+包括的レポートのサマリー（主要な発見事項・環境課題）とメモ化
+"""
+
+import threading
+
+import pytest
+
+import japan_environmental_data
+from data_sources import DataSource
+
+REPORT = {
+    'energy_emissions': [
+        {'energy_source': '石炭', 'generation_percentage': 60.0},
+        {'energy_source': '再生可能エネルギー', 'generation_percentage': 20.0},
+        {'energy_source': '原子力', 'generation_percentage': 20.0}
+    ],
+    'air_quality': [
+        {'parameter': 'PM2.5', 'value': 10.0},
+        {'parameter': 'pm25', 'value': 30.0},
+        {'parameter': 'PM2.5', 'value': 400.0, 'quality': 'outlier'},
+        {'parameter': 'NO2', 'value': 80.0}
+    ],
+    'biodiversity': [
+        {'region': '北海道', 'forest_coverage_percent': 71.0, 'endangered_species_count': 45},
+        {'region': '沖縄', 'forest_coverage_percent': 47.0, 'endangered_species_count': 89,
+         'coral_bleaching_percent': 42.0}
+    ],
+    'climate_change': [
+        {'temperature_anomaly': 1.0, 'extreme_weather_events': 2},
+        {'temperature_anomaly': 0.6, 'extreme_weather_events': 0}
+    ],
+    'pollution': [
+        {'location': '東京都', 'water_pollution_index': 25.0, 'recycling_rate': 60.0},
+        {'location': '福岡県', 'water_pollution_index': 12.0, 'recycling_rate': 70.0}
+    ]
+}
+
+
+@pytest.fixture
+def fetcher(app):
+    return app.extensions['japan_data_fetcher']
+
+
+def test_findings_and_concerns_are_derived_from_the_report(fetcher):
+    summary = fetcher._build_summary(REPORT)
+    metrics = summary['metrics']
+
+    assert summary['total_data_points'] == 13
+    assert metrics['renewable_energy_ratio'] == 20.0
+    # 外れ値とされた測定値は PM2.5 の集計に含めない
+    assert metrics['pm25'] == {'min': 10.0, 'max': 30.0, 'avg': 20.0}
+    assert metrics['forest_coverage'] == {'min': 47.0, 'max': 71.0, 'spread': 24.0}
+    assert metrics['endangered_species_total'] == 134
+    assert metrics['temperature_anomaly_avg'] == 0.8
+    assert metrics['extreme_weather_events'] == 2
+    assert metrics['water_pollution_index_max'] == 25.0
+    assert metrics['recycling_rate_avg'] == 65.0
+
+    concerns = ' / '.join(summary['environmental_concerns'])
+    for expected in ('再エネ比率20%', 'PM2.5が環境基準を超過', '沖縄で最多', 'サンゴ白化（沖縄で42.0%）',
+                     '過去2日で2件', '水質汚染（東京都）', '平均リサイクル率65.0%'):
+        assert expected in concerns
+    assert '水質汚染指数が最も高いのは東京都（25.0）' in summary['key_findings']
+
+
+def test_empty_report_has_no_findings(fetcher):
+    summary = fetcher._build_summary({})
+    assert summary == {'total_data_points': 0, 'key_findings': [], 'environmental_concerns': [], 'metrics': {}}
+
+
+def test_summary_is_memoized_per_input_version(fetcher, monkeypatch):
+    calls = []
+    build = fetcher._build_summary
+    monkeypatch.setattr(fetcher, '_build_summary', lambda report: calls.append(1) or build(report))
+
+    first = fetcher._calculate_summary_statistics(REPORT, ('v1',))
+    first['metrics'].clear()  # 返り値はコピーで、メモの内容は変わらない
+    assert fetcher._calculate_summary_statistics(REPORT, ('v1',))['metrics']
+    assert len(calls) == 1
+
+    fetcher._calculate_summary_statistics(REPORT, ('v2',))
+    assert len(calls) == 2
+
+
+def test_memo_is_bounded_and_safe_under_concurrency(fetcher):
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(200):
+                fetcher._calculate_summary_statistics(REPORT, (offset + i % 50,))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(fetcher._summary_cache) <= japan_environmental_data.SUMMARY_CACHE_SIZE
+
+
+class FlakySource(DataSource):
+    name = 'flaky'
+    rate_limit = 1000.0
+    burst = 10
+    retry_interval = 0.0
+
+    def __init__(self):
+        self.fail = False
+
+    def fetch(self, **params):
+        if self.fail:
+            raise RuntimeError('upstream down')
+        return [{'year': 2024, 'value': 1.0}]
+
+
+def test_failed_refresh_keeps_the_input_version(fetcher):
+    source = fetcher.registry.register(FlakySource())
+    fetcher.scheduler.get('flaky')
+    version = fetcher._input_version()
+
+    source.fail = True
+    with pytest.raises(RuntimeError):
+        fetcher.scheduler.refresh('flaky').result(timeout=5)
+    # 上流の障害中は前回のデータを使うため、サマリーのメモも同じ版で再利用される
+    assert fetcher._input_version() == version
+
+    source.fail = False
+    fetcher.scheduler.refresh('flaky').result(timeout=5)
+    assert fetcher._input_version() != version
+
+
+def test_report_endpoint_includes_the_summary(client):
+    report = client.get('/api/japan/comprehensive-report').get_json()['report']
+    assert report['summary']['total_data_points'] > 0
+    assert report['summary']['key_findings']
@@ -0,0 +1,95 @@
+"""
+模擬データの不確実性の幅
+"""
+
+import pytest
+
+import process_pool
+import uncertainty
+from uncertainty import Distribution, summarize
+
+ROWS = [
+    {'temperature': Distribution('normal', 15.0, 2.0), 'share': Distribution('uniform', 10.0, 20.0)},
+    {'species': Distribution('integers', 100, 200, None)}
+]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param and not uncertainty.HAS_NUMPY:
+        pytest.skip('numpy is not installed')
+    monkeypatch.setattr(uncertainty, 'HAS_NUMPY', request.param)
+
+
+def test_bands_match_the_distributions(backend):
+    bands = summarize(ROWS, samples=20000, seed=3)
+
+    temperature = bands[0]['temperature']
+    assert temperature['mean'] == pytest.approx(15.0, abs=0.1)
+    assert temperature['std'] == pytest.approx(2.0, abs=0.1)
+    assert temperature['p5'] < temperature['p25'] < temperature['p50'] < temperature['p75'] < temperature['p95']
+
+    share = bands[0]['share']
+    assert 10.0 <= share['p5'] and share['p95'] <= 20.0
+    assert share['p50'] == pytest.approx(15.0, abs=0.2)
+
+    species = bands[1]['species']
+    assert 100 <= species['p5'] and species['p95'] < 200
+
+
+def test_same_seed_gives_the_same_bands(backend):
+    assert summarize(ROWS, samples=500, seed=1) == summarize(ROWS, samples=500, seed=1)
+    assert summarize(ROWS, samples=500, seed=1) != summarize(ROWS, samples=500, seed=2)
+
+
+def test_sample_count_is_bounded():
+    with pytest.raises(ValueError):
+        summarize(ROWS, samples=0)
+    with pytest.raises(ValueError):
+        summarize(ROWS, samples=uncertainty.MAX_SAMPLES + 1)
+
+
+def test_unknown_distribution_kind(backend):
+    with pytest.raises(ValueError, match='unknown distribution kind'):
+        summarize([{'x': Distribution('poisson', 1.0, 0.0)}], samples=10)
+
+
+def test_pool_path_matches_in_process_blocks(monkeypatch):
+    # ブロックごとにシードを持つため、同じ分割ならプールの経路でも同じ結果になる
+    monkeypatch.setattr(uncertainty, 'BLOCK_VALUES', 1000)
+    expected = summarize(ROWS * 10, samples=1000, seed=5)
+
+    monkeypatch.setattr(uncertainty, 'POOL_THRESHOLD', 0)
+    monkeypatch.setattr(process_pool, 'POOL_WORKERS', 1)
+    assert summarize(ROWS * 10, samples=1000, seed=5) == expected
+
+
+def test_spawn_pool_matches_in_process(monkeypatch):
+    monkeypatch.setattr(uncertainty, 'BLOCK_VALUES', 2000)
+    expected = summarize(ROWS * 4, samples=1000, seed=9)
+
+    monkeypatch.setattr(uncertainty, 'POOL_THRESHOLD', 0)
+    monkeypatch.setattr(process_pool, 'POOL_WORKERS', 2)
+    try:
+        assert summarize(ROWS * 4, samples=1000, seed=9) == expected
+    finally:
+        process_pool.shutdown()
+
+
+def test_band_endpoint(client):
+    payload = client.get('/api/japan/climate?bands=1&samples=500').get_json()
+    assert payload['status'] == 'success'
+    for samples in (0, 200, 100_001):
+        assert client.get(f"/api/japan/climate?bands=1&samples={samples}").status_code == 400
+
+
+def test_bands_go_through_admission_control(app, client):
+    admission = app.extensions['admission']
+    client.get('/api/japan/pollution')
+    assert admission.admitted == 0
+
+    client.get('/api/japan/pollution?bands=1')
+    assert admission.admitted == 1
+    # キャッシュ済みの結果は受け付け制御を通らない
+    client.get('/api/japan/pollution?bands=1')
+    assert admission.admitted == 1
@@ -0,0 +1,170 @@
+"""
+大気質の測定値の検証とローカルストアの測定値の履歴
+"""
+
+import sqlite3
+
+import pytest
+
+import local_store
+import validation
+from data_sources import OpenAQSource, OpenAQStationsSource
+from local_store import LocalStore
+from validation import validate_measurements
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param and not validation.HAS_NUMPY:
+        pytest.skip('numpy is not installed')
+    monkeypatch.setattr(validation, 'HAS_NUMPY', request.param)
+
+
+def _reading(hour, value, station='1', parameter='pm25', unit='µg/m³'):
+    return {'date': f"2024-01-{1 + hour // 24:02d}T{hour % 24:02d}:00:00Z", 'location': 'Tokyo',
+            'station': station, 'parameter': parameter, 'value': value, 'unit': unit}
+
+
+def test_units_are_normalized(backend):
+    rows, report = validate_measurements([
+        _reading(0, 0.05, parameter='pm25', unit='mg/m3'),
+        _reading(0, 10.0, parameter='no2', unit='ppb'),
+        _reading(0, 1.0, parameter='co', unit='ppm'),
+        _reading(0, 5.0, parameter='bc', unit='µg/m³')
+    ], station_key='station')
+
+    values = {row['parameter']: (row['value'], row['unit']) for row in rows}
+    assert values['pm25'] == (50.0, 'µg/m³')
+    assert values['no2'] == (pytest.approx(18.818, abs=1e-3), 'µg/m³')
+    assert values['co'] == (pytest.approx(1.146, abs=1e-3), 'mg/m³')
+    assert values['bc'] == (5.0, 'µg/m³')
+    assert report['converted'] == 3
+
+
+def test_invalid_negative_and_impossible_values_are_dropped(backend):
+    rows, report = validate_measurements([
+        _reading(0, 'n/a'), _reading(1, 3.0, unit='furlongs'), _reading(2, -1.0), _reading(3, 5000.0),
+        _reading(4, 12.0)
+    ], station_key='station')
+    assert [row['value'] for row in rows] == [12.0]
+    assert (report['invalid'], report['negative'], report['out_of_range'], report['output']) == (2, 1, 1, 1)
+
+
+def test_outliers_are_flagged_per_station(backend):
+    # 同じ都市の2つの観測局（10 と 80 µg/m³）を交互に並べ、一方に急な値を入れる
+    rows = []
+    for hour in range(30):
+        rows.append(_reading(hour, 10.0 + hour % 3, station='1'))
+        rows.append(_reading(hour, 80.0 + hour % 3, station='2'))
+    rows.append(_reading(30, 90.0, station='1'))
+
+    flagged, report = validate_measurements(rows, station_key='station')
+    assert report['outliers'] == 1
+    assert [row['value'] for row in flagged if row['quality'] == 'outlier'] == [90.0]
+
+    # 都市単位でまとめると2つの系列が混ざり、急な値が埋もれる
+    _, merged = validate_measurements(rows, station_key='location')
+    assert merged['outliers'] == 0
+
+
+def test_history_seeds_the_window_but_is_not_returned(backend):
+    history = [_reading(hour, 10.0 + hour % 3) for hour in range(24)]
+    rows, report = validate_measurements([_reading(24, 90.0)], station_key='station', history=history)
+    assert [row['quality'] for row in rows] == ['outlier']
+    assert report['input'] == report['output'] == 1
+
+    rows, _ = validate_measurements([_reading(24, 90.0)], station_key='station')
+    assert [row['quality'] for row in rows] == ['ok']
+
+
+def test_numpy_and_python_paths_agree(monkeypatch):
+    if not validation.HAS_NUMPY:
+        pytest.skip('numpy is not installed')
+    rows = [_reading(hour, (hour * 37) % 23 + (60.0 if hour % 17 == 0 else 0.0), station=str(hour % 3))
+            for hour in range(300)]
+    expected = validate_measurements(rows, station_key='station')
+    monkeypatch.setattr(validation, 'HAS_NUMPY', False)
+    assert validate_measurements(rows, station_key='station') == expected
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def get(self, url, params=None, timeout=None):
+        return FakeResponse(self.payload)
+
+
+def test_openaq_rows_carry_the_station_id():
+    session = FakeSession({'results': [
+        {'locationId': 101, 'location': '千代田', 'city': 'Tokyo', 'parameter': 'pm25', 'value': 12.0,
+         'unit': 'µg/m³', 'date': {'utc': '2024-01-01T00:00:00Z'}},
+        {'location': '港', 'city': 'Tokyo', 'parameter': 'pm25', 'value': 14.0, 'unit': 'µg/m³',
+         'date': {'utc': '2024-01-01T00:00:00Z'}}
+    ]})
+    rows = OpenAQSource(session).fetch('Tokyo')
+    assert [row['station'] for row in rows] == ['101', '港']
+
+
+def test_live_station_readings_use_stored_history(tmp_path):
+    store = LocalStore(str(tmp_path / 'store.db'))
+    store.insert_measurements([_reading(hour, 10.0 + hour % 3, station='101') for hour in range(24)]
+                              + [_reading(22, 300.0, station='101', parameter='pm10')])
+    stations = [{'station_id': '101', 'name': '千代田', 'latitude': 35.69, 'longitude': 139.75, 'latest': [
+        {'parameter': 'pm25', 'value': 90.0, 'unit': 'µg/m³', 'date': '2024-01-02T00:00:00Z'}
+    ]}]
+
+    assert OpenAQStationsSource().validate(stations)[0]['latest'][0]['quality'] == 'ok'
+    assert OpenAQStationsSource(store=store).validate(stations)[0]['latest'][0]['quality'] == 'outlier'
+
+
+def test_recent_measurements_skip_outliers_and_later_rows(tmp_path):
+    store = LocalStore(str(tmp_path / 'store.db'))
+    store.insert_measurements([
+        dict(_reading(0, 10.0), quality='ok'), dict(_reading(1, 500.0), quality='outlier'),
+        dict(_reading(2, 11.0), quality='ok'), dict(_reading(3, 12.0), quality='ok'),
+        dict(_reading(1, 20.0, station='2'), quality='ok')
+    ])
+    recent = store.recent_measurements('1', 'pm25', '2024-01-01T03:00:00Z', limit=24)
+    assert [row['value'] for row in recent] == [11.0, 10.0]
+
+
+def test_old_store_is_migrated_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE measurements (date TEXT NOT NULL, location TEXT NOT NULL, parameter TEXT NOT NULL,
+                                   value REAL NOT NULL, unit TEXT, source TEXT);
+        CREATE UNIQUE INDEX idx_measurements_location ON measurements (location, parameter, date);
+        INSERT INTO measurements VALUES ('2024-01-01T00:00:00Z', 'Tokyo', 'pm25', 10.0, 'µg/m³', 'OpenAQ');
+    """)
+    conn.close()
+
+    store = LocalStore(path)
+    # 同じ都市・項目・日時でも観測局が違えば別の行として残る
+    store.insert_measurements([_reading(0, 20.0, station='2')])
+    assert sorted((row['station'], row['value']) for row in store.query_measurements([], [])) == [
+        ('', 10.0), ('2', 20.0)
+    ]
+    assert path in local_store._migrated
+
+    # 同じプロセスの別の接続ではスキーマを確認し直さない
+    monkeypatch.setattr(LocalStore, '_migrate', staticmethod(lambda conn: pytest.fail('migrated twice')))
+    assert len(LocalStore(path).query_measurements([], [])) == 2
+
+
+def test_migration_errors_are_not_swallowed(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'view.db'))
+    conn.execute("CREATE VIEW measurements AS SELECT 1 AS date")
+    with pytest.raises(sqlite3.OperationalError):
+        LocalStore._migrate(conn)
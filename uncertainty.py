@@ -0,0 +1,140 @@
+"""
+模擬データの不確実性（モンテカルロ法による平均と百分位の幅）
+Each simulated metric is described by a Distribution; summarize() draws
+the samples for all (row, metric) pairs of a dataset with one vectorized
+call per distribution kind and reduces them to mean, standard deviation
+and percentile bands. Large grids are split into blocks that run in the
+shared process pool; every block has its own seed so the result does not
+depend on the number of workers
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import math
+import random
+
+import process_pool
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+DEFAULT_SAMPLES = 2000
+MAX_SAMPLES = 100_000
+# APIで指定できる標本数（条件ごとにキャッシュされるため任意の値は受け付けない）
+SAMPLE_CHOICES = (500, DEFAULT_SAMPLES, 10_000, MAX_SAMPLES)
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+
+BLOCK_VALUES = 4_000_000  # 1ブロックで抽出する標本数の上限（指標数 × 標本数）
+POOL_THRESHOLD = 8_000_000  # 全体の標本数がこれを超えたらプロセスプールで処理
+
+
+class Distribution(NamedTuple):
+    """
+    1つの指標の分布
+    kind: 'normal'（a=平均, b=標準偏差）/ 'uniform'（a=下限, b=上限）/ 'integers'（a以上b未満）
+    """
+    kind: str
+    a: float
+    b: float
+    decimals: Optional[int] = 1
+
+    def round(self, value):
+        return value if self.decimals is None else round(value, self.decimals)
+
+
+def summarize(rows: Sequence[Dict[str, Distribution]], samples: int = DEFAULT_SAMPLES,
+              seed: int = 0) -> List[Dict[str, Dict]]:
+    """
+    行ごとの {指標: 分布} から、行ごとの {指標: {'mean', 'std', 'p5', ...}} を返す
+    """
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+
+    flat = [(i, name, dist) for i, row in enumerate(rows) for name, dist in row.items()]
+    per_block = max(1, BLOCK_VALUES // samples)
+    blocks = [[dist for _, _, dist in flat[start:start + per_block]] for start in range(0, len(flat), per_block)]
+    seeds = [seed * 1_000_003 + i for i in range(len(blocks))]
+
+    if len(flat) * samples > POOL_THRESHOLD:
+        results = process_pool.map_jobs(_summarize_job, [(block, samples, block_seed)
+                                                         for block, block_seed in zip(blocks, seeds)])
+    else:
+        results = [_summarize_block(block, samples, block_seed) for block, block_seed in zip(blocks, seeds)]
+
+    bands = [{} for _ in rows]
+    stats = (band for block in results for band in block)
+    for (i, name, _), band in zip(flat, stats):
+        bands[i][name] = band
+    return bands
+
+
+def _summarize_job(args) -> List[Dict]:
+    return _summarize_block(*args)
+
+
+def _summarize_block(distributions: List[Distribution], samples: int, seed: int) -> List[Dict]:
+    if not HAS_NUMPY:
+        rng = random.Random(seed)
+        return [_band(dist, sorted(_draw_python(rng, dist) for _ in range(samples))) for dist in distributions]
+
+    rng = np.random.default_rng(seed)
+    out: List[Optional[Dict]] = [None] * len(distributions)
+    for kind in ('normal', 'uniform', 'integers'):
+        index = [i for i, dist in enumerate(distributions) if dist.kind == kind]
+        if not index:
+            continue
+        a = np.array([distributions[i].a for i in index])[:, None]
+        b = np.array([distributions[i].b for i in index])[:, None]
+        shape = (len(index), samples)
+        if kind == 'normal':
+            draws = rng.normal(a, b, size=shape)
+        elif kind == 'uniform':
+            draws = rng.uniform(a, b, size=shape)
+        else:
+            draws = rng.integers(a.astype(np.int64), b.astype(np.int64), size=shape)
+
+        means = draws.mean(axis=1)
+        stds = draws.std(axis=1)
+        percentiles = np.percentile(draws, BAND_PERCENTILES, axis=1)  # (百分位, 指標)
+        for j, i in enumerate(index):
+            out[i] = _format(distributions[i], float(means[j]), float(stds[j]),
+                             [float(value) for value in percentiles[:, j]])
+
+    unknown = [dist.kind for dist, band in zip(distributions, out) if band is None]
+    if unknown:
+        raise ValueError(f"unknown distribution kind: {unknown[0]}")
+    return out
+
+
+def _draw_python(rng, dist: Distribution) -> float:
+    if dist.kind == 'normal':
+        return rng.gauss(dist.a, dist.b)
+    if dist.kind == 'uniform':
+        return rng.uniform(dist.a, dist.b)
+    if dist.kind == 'integers':
+        return rng.randrange(int(dist.a), int(dist.b))
+    raise ValueError(f"unknown distribution kind: {dist.kind}")
+
+
+def _band(dist: Distribution, values: List[float]) -> Dict:
+    mean = sum(values) / len(values)
+    std = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+    return _format(dist, mean, std, [_percentile(values, q) for q in BAND_PERCENTILES])
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """線形補間の百分位（np.percentile の既定と同じ）"""
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _format(dist: Distribution, mean: float, std: float, percentiles: List[float]) -> Dict:
+    decimals = 2 if dist.decimals is None else dist.decimals + 1
+    band = {'mean': round(mean, decimals), 'std': round(std, decimals)}
+    for q, value in zip(BAND_PERCENTILES, percentiles):
+        band[f"p{q}"] = round(value, decimals)
+    return band
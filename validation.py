@@ -0,0 +1,256 @@
+"""
+大気質の測定値の検証（単位の正規化・範囲外の除外・外れ値の判定）
+Runs between fetch and store: converts each pollutant to one canonical
+unit (mass concentrations directly, ppm/ppb via the molecular weight),
+drops negative, non-finite and
+physically impossible values, and flags readings that deviate from the
+rolling mean of the same station and parameter. The rolling window can be
+seeded with stored history so that small batches (one live reading per
+station) and backfill chunk boundaries still see earlier values. The whole
+batch is processed as NumPy arrays so validation keeps up with backfill rates
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+# 項目ごとの正規の単位（COは環境基準と同じく mg/m³、それ以外は µg/m³）
+CANONICAL_UNITS = {
+    'pm25': 'µg/m³',
+    'pm10': 'µg/m³',
+    'no2': 'µg/m³',
+    'so2': 'µg/m³',
+    'o3': 'µg/m³',
+    'co': 'mg/m³'
+}
+
+# 物理的にありえない値の上限（正規の単位）
+MAX_VALUES = {
+    'pm25': 1000.0,
+    'pm10': 2000.0,
+    'no2': 2000.0,
+    'so2': 2600.0,
+    'o3': 1000.0,
+    'co': 100.0
+}
+
+# ppm/ppb から質量濃度への換算に使う分子量（g/mol）と 25°C・1気圧のモル体積（L/mol）
+MOLECULAR_WEIGHTS = {'no2': 46.01, 'so2': 64.07, 'o3': 48.00, 'co': 28.01}
+MOLAR_VOLUME = 24.45
+
+# 単位の表記の揺れ（小文字にして照合）と、µg/m³ または ppb への係数
+UNIT_ALIASES = {
+    'µg/m³': 'µg/m³', 'μg/m³': 'µg/m³', 'ug/m3': 'µg/m³', 'µg/m3': 'µg/m³', 'μg/m3': 'µg/m³',
+    'mg/m³': 'mg/m³', 'mg/m3': 'mg/m³',
+    'ppm': 'ppm', 'ppb': 'ppb'
+}
+MASS_FACTORS = {'µg/m³': 1.0, 'mg/m³': 1000.0}
+MIXING_RATIO_FACTORS = {'ppb': 1.0, 'ppm': 1000.0}
+
+# 外れ値: 同じ観測局・項目の直前 OUTLIER_WINDOW 件の平均から OUTLIER_Z 標準偏差以上離れた値
+OUTLIER_WINDOW = 24
+OUTLIER_MIN_HISTORY = 6
+OUTLIER_Z = 4.0
+# ほぼ一定の系列で小さな変化を外れ値にしないよう、標準偏差は平均の10%を下限とする
+MIN_RELATIVE_STD = 0.1
+
+REJECT_REASONS = ('invalid', 'negative', 'out_of_range')  # invalid: 換算できない単位・数値でない値
+
+
+def normalize_parameter(parameter) -> str:
+    """汚染物質名を正規化（'PM2.5' と OpenAQ の 'pm25' を同一視）"""
+    return str(parameter or '').lower().replace('.', '').replace('_', '')
+
+
+def unit_factor(parameter: str, unit) -> float:
+    """
+    測定値を正規の単位に換算する係数（換算できない単位は nan、対象外の項目は 1.0）
+    """
+    canonical = CANONICAL_UNITS.get(parameter)
+    if canonical is None:
+        return 1.0
+    unit = UNIT_ALIASES.get(str(unit or '').strip().lower())
+    if unit in MASS_FACTORS:
+        to_micrograms = MASS_FACTORS[unit]
+    elif unit in MIXING_RATIO_FACTORS and parameter in MOLECULAR_WEIGHTS:
+        to_micrograms = MIXING_RATIO_FACTORS[unit] * MOLECULAR_WEIGHTS[parameter] / MOLAR_VOLUME
+    else:
+        return math.nan
+    return to_micrograms / MASS_FACTORS[canonical]
+
+
+def validate_measurements(rows: List[Dict], station_key: str = 'location',
+                          history: Optional[List[Dict]] = None) -> Tuple[List[Dict], Dict]:
+    """
+    測定値を検証し、(残った行, 集計) を返す
+    残った行は値と単位が正規化され、quality に 'ok' または 'outlier' が入る
+    history（同じ観測局・項目のより前の測定値）は外れ値の窓の初期値にだけ使い、結果と集計には含めない
+    """
+    report = {'input': len(rows), 'converted': 0, 'outliers': 0}
+    report.update({reason: 0 for reason in REJECT_REASONS})
+    if not rows:
+        report['output'] = 0
+        return [], report
+
+    # 項目と単位の組み合わせは少ないので、換算係数・上限・正規の単位は組み合わせごとに1回だけ求める
+    rules_by_key = {}
+    parameters, factors, limits, units = [], [], [], []
+    for row in rows:
+        key = (row.get('parameter'), row.get('unit'))
+        rules = rules_by_key.get(key)
+        if rules is None:
+            parameter = normalize_parameter(key[0])
+            rules = rules_by_key[key] = (parameter, unit_factor(parameter, key[1]),
+                                         MAX_VALUES.get(parameter, math.inf), CANONICAL_UNITS.get(parameter))
+        parameters.append(rules[0])
+        factors.append(rules[1])
+        limits.append(rules[2])
+        units.append(rules[3])
+
+    if HAS_NUMPY:
+        kept, values = _check_numpy(rows, parameters, factors, limits, report)
+    else:
+        kept, values = _check_python(rows, parameters, factors, limits, report)
+
+    seed_keys, seed_dates, seed_values = _history_series(history or [], station_key)
+    outliers = _rolling_outliers(
+        seed_keys + [(rows[i].get(station_key), parameters[i]) for i in kept],
+        seed_dates + [str(rows[i].get('date', '')) for i in kept],
+        seed_values + values
+    )[len(seed_values):]
+
+    validated = []
+    for i, value, outlier in zip(kept, values, outliers):
+        item = dict(rows[i], quality='outlier' if outlier else 'ok')
+        if units[i] is not None:
+            item['unit'] = units[i]
+            if factors[i] != 1.0:
+                item['value'] = round(value, 3)
+                report['converted'] += 1
+        validated.append(item)
+    report['outliers'] = sum(outliers)
+    report['output'] = len(validated)
+    return validated, report
+
+
+def _history_series(history: List[Dict], station_key: str):
+    """履歴の行を (系列キー, 日時, 正規の単位の値) に換算（換算できない値は除く）"""
+    keys, dates, values = [], [], []
+    for row in history:
+        parameter = normalize_parameter(row.get('parameter'))
+        value = _as_float(row.get('value')) * unit_factor(parameter, row.get('unit'))
+        if math.isfinite(value):
+            keys.append((row.get(station_key), parameter))
+            dates.append(str(row.get('date', '')))
+            values.append(value)
+    return keys, dates, values
+
+
+def _rolling_outliers(series_keys, dates, values) -> List[bool]:
+    if HAS_NUMPY:
+        return _rolling_outliers_numpy(series_keys, np.array(dates), np.asarray(values, dtype=float)).tolist()
+    return _rolling_outliers_python(series_keys, dates, values)
+
+
+def _check_numpy(rows, parameters, factors, limits, report):
+    values = np.fromiter((_as_float(row.get('value')) for row in rows), dtype=float, count=len(rows))
+    values = values * np.asarray(factors)
+    limits = np.asarray(limits)
+
+    invalid = ~np.isfinite(values)
+    negative = ~invalid & (values < 0)
+    out_of_range = ~invalid & ~negative & (values > limits)
+    report['invalid'] = int(invalid.sum())
+    report['negative'] = int(negative.sum())
+    report['out_of_range'] = int(out_of_range.sum())
+
+    kept = np.flatnonzero(~(invalid | negative | out_of_range))
+    return kept.tolist(), values[kept].tolist()
+
+
+def _rolling_outliers_numpy(series_keys, dates, values):
+    """系列（観測局, 項目）ごとに日時順に並べ、直前の窓の平均・標準偏差からの z スコアで判定"""
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    codes_by_key = {}
+    codes = np.fromiter((codes_by_key.setdefault(key, len(codes_by_key)) for key in series_keys), dtype=np.int64,
+                        count=n)
+    order = np.lexsort((dates, codes))
+    sorted_codes = codes[order]
+    sorted_values = values[order]
+
+    # 系列内の位置と、直前 OUTLIER_WINDOW 件の累積和による窓の統計
+    positions = np.arange(n)
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+    group_start = starts[np.searchsorted(starts, positions, side='right') - 1]
+    window_start = np.maximum(group_start, positions - OUTLIER_WINDOW)
+    counts = positions - window_start
+
+    cumsum = np.r_[0.0, np.cumsum(sorted_values)]
+    cumsum_sq = np.r_[0.0, np.cumsum(sorted_values ** 2)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (cumsum[positions] - cumsum[window_start]) / counts
+        variance = (cumsum_sq[positions] - cumsum_sq[window_start]) / counts - mean ** 2
+        scale = np.maximum(np.sqrt(np.maximum(variance, 0.0)), MIN_RELATIVE_STD * np.abs(mean))
+        z = np.abs(sorted_values - mean) / scale
+    flagged = (counts >= OUTLIER_MIN_HISTORY) & (scale > 0) & (z > OUTLIER_Z)
+
+    outliers = np.zeros(n, dtype=bool)
+    outliers[order] = flagged
+    return outliers
+
+
+def _check_python(rows, parameters, factors, limits, report):
+    kept, values = [], []
+    for i, (row, factor, limit) in enumerate(zip(rows, factors, limits)):
+        value = _as_float(row.get('value')) * factor
+        if not math.isfinite(value):
+            report['invalid'] += 1
+        elif value < 0:
+            report['negative'] += 1
+        elif value > limit:
+            report['out_of_range'] += 1
+        else:
+            kept.append(i)
+            values.append(value)
+    return kept, values
+
+
+def _rolling_outliers_python(series_keys, dates, values) -> List[bool]:
+    outliers = [False] * len(values)
+    windows: Dict[tuple, deque] = {}
+    order = sorted(range(len(values)), key=lambda j: ((str(series_keys[j][0]), series_keys[j][1]), dates[j]))
+    for j in order:
+        window = windows.setdefault(series_keys[j], deque(maxlen=OUTLIER_WINDOW))
+        if len(window) >= OUTLIER_MIN_HISTORY:
+            mean = sum(window) / len(window)
+            std = math.sqrt(max(sum(v * v for v in window) / len(window) - mean * mean, 0.0))
+            scale = max(std, MIN_RELATIVE_STD * abs(mean))
+            outliers[j] = scale > 0 and abs(values[j] - mean) / scale > OUTLIER_Z
+        window.append(values[j])
+    return outliers
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def log_report(name: str, report: Dict):
+    """除外・外れ値があった場合だけ記録"""
+    rejected = {reason: report[reason] for reason in REJECT_REASONS if report[reason]}
+    if rejected or report['outliers']:
+        logger.warning(f"{name}: rejected {rejected or 0}, flagged {report['outliers']} outliers "
+                       f"of {report['input']} measurements")